@@ -0,0 +1,35 @@
+import argparse
+import sys
+import time
+
+from typebarrier import bulk
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Converts each line of a JSON Lines file to a target, '
+                    'reporting the lines which fail.')
+    parser.add_argument('target', help='the target, as module:Target')
+    parser.add_argument('input', help='the JSON Lines file to convert')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='worker processes, one per CPU by default')
+    parser.add_argument('-o', '--output',
+                        help='write the converted lines as normalized JSON')
+    parser.add_argument('--max-errors', type=int, default=100,
+                        help='how many errors to print (default: 100)')
+    args = parser.parse_args()
+
+    target = bulk.load_target(args.target)
+    started = time.perf_counter()
+    report = bulk.convert_file(target, args.input, workers=args.workers,
+                               output=args.output)
+    elapsed = time.perf_counter() - started
+
+    for error in report.errors[:args.max_errors]:
+        print(f'{args.input}:{error.line}: {error.message}', file=sys.stderr)
+    hidden = len(report.errors) - args.max_errors
+    if hidden > 0:
+        print(f'... and {hidden} more errors', file=sys.stderr)
+    print(f'{report.lines} lines, {report.converted} converted, '
+          f'{len(report.errors)} errors in {elapsed:.2f}s')
+    return 1 if report.errors else 0
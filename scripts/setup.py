@@ -6,6 +6,7 @@ setuptools.setup(
     entry_points={
         'console_scripts': [
             "typebarrier-tests = runner:main",
+            "typebarrier-convert = convert:main",
         ],
     }
 )
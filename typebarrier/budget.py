@@ -0,0 +1,112 @@
+"""
+Limits how much work converting one value may do.
+
+Without limits a single hostile payload, such as a list of ten million
+elements or a dictionary nested ten thousand deep, can keep a worker busy
+for as long as it likes. A `Budget` bounds such payloads, and a conversion
+which goes over it raises `BudgetExceeded` as soon as it's noticed.
+
+Generated code keeps the counts in local variables (see `codegen`), while
+the dynamic engine uses a `Spending` set for the duration of the call.
+"""
+import contextvars
+import typing as t
+
+
+ELEMENTS = 'max_elements'
+DEPTH = 'max_depth'
+STRING_BYTES = 'max_string_bytes'
+EXTRA_KEYS = 'max_extra_keys'
+
+
+class Budget(t.NamedTuple):
+    """The most one conversion may do. None means there's no limit."""
+
+    # Elements of lists and items of dictionaries, in total.
+    max_elements: t.Optional[int] = None
+    # Lists and dictionaries nested within each other.
+    max_depth: t.Optional[int] = None
+    # The length of every string or bytes value converted to a string or
+    # bytes type, in total. Strings are measured in characters, which is
+    # cheap, rather than their encoded size.
+    max_string_bytes: t.Optional[int] = None
+    # Keys passed on to `**kwargs`, in total.
+    max_extra_keys: t.Optional[int] = None
+
+
+class BudgetExceeded(Exception):
+    """Raised when a conversion goes over its budget.
+
+    This isn't a TypeError, so it passes straight through the engines'
+    handlers instead of being wrapped in messages describing the value.
+    """
+
+    def __init__(self, limit: str, budget: int) -> None:
+        super().__init__(f'conversion is over budget: {limit} is {budget}')
+        self.limit = limit
+        self.budget = budget
+
+
+class Spending:
+    """Counts what one conversion has used of its budget."""
+
+    __slots__ = ('budget', 'elements', 'depth', 'string_bytes',
+                 'extra_keys')
+
+    def __init__(self, budget: Budget) -> None:
+        self.budget = budget
+        self.elements = 0
+        self.depth = 0
+        self.string_bytes = 0
+        self.extra_keys = 0
+
+    def enter(self, container: t.Any) -> None:
+        """Charges for converting the elements of a list or dictionary.
+
+        Values without a length are left for the caller to reject, or to
+        charge one element at a time with `each`.
+        """
+        budget = self.budget
+        if budget.max_depth is not None and self.depth >= budget.max_depth:
+            raise BudgetExceeded(DEPTH, budget.max_depth)
+        if budget.max_elements is not None:
+            try:
+                self.elements += len(container)
+            except TypeError:
+                pass
+            if self.elements > budget.max_elements:
+                raise BudgetExceeded(ELEMENTS, budget.max_elements)
+        self.depth += 1
+
+    def leave(self) -> None:
+        self.depth -= 1
+
+    def each(self, elements: t.Iterable[t.Any]) -> t.Iterator[t.Any]:
+        """Yields the elements of an iterable without a length, such as a
+        generator, charging for each as it comes."""
+        limit = self.budget.max_elements
+        for element in elements:
+            if limit is not None:
+                self.elements += 1
+                if self.elements > limit:
+                    raise BudgetExceeded(ELEMENTS, limit)
+            yield element
+
+    def spend_string(self, value: t.Union[str, bytes]) -> None:
+        limit = self.budget.max_string_bytes
+        if limit is not None:
+            self.string_bytes += len(value)
+            if self.string_bytes > limit:
+                raise BudgetExceeded(STRING_BYTES, limit)
+
+    def spend_extra_keys(self, count: int) -> None:
+        limit = self.budget.max_extra_keys
+        if limit is not None:
+            self.extra_keys += count
+            if self.extra_keys > limit:
+                raise BudgetExceeded(EXTRA_KEYS, limit)
+
+
+# What the current dynamic conversion has spent, if it has a budget.
+spending: contextvars.ContextVar[t.Optional[Spending]] = (
+    contextvars.ContextVar('typebarrier_spending', default=None))
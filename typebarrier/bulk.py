@@ -0,0 +1,207 @@
+"""
+Converts large JSON Lines files in parallel.
+
+The file is memory-mapped and split into shards of whole lines, which
+worker processes convert with the compiled converter for the target, one
+line at a time. Each worker reports how many lines it saw and the errors it
+found, numbered within its shard, and the numbers are made absolute once
+every shard is done, so nothing needs to scan the file up front.
+
+Converted values can also be written back out as normalized JSON Lines,
+with each shard written to a file of its own and joined in order.
+"""
+import concurrent.futures
+import datetime
+import enum
+import importlib
+import json
+import mmap
+import os
+import shutil
+import tempfile
+import typing as t
+
+from . import budget
+from . import inline
+from . import records
+
+
+# Shards smaller than this aren't worth a process of their own.
+MIN_SHARD_SIZE = 1 << 20
+
+# Each worker gets about this many shards, so that they finish together
+# even when some lines convert more slowly than others.
+SHARDS_PER_WORKER = 4
+
+# JSON Lines files are UTF-8, so lines are decoded as such and parsed with
+# this, skipping `json.loads` working out their encoding every time.
+_DECODER = json.JSONDecoder()
+
+# What a line can raise that's about that line, and so is reported as an
+# error on it rather than stopping its shard: JSON which doesn't parse or
+# is nested too deeply, values which don't convert, and budgets exceeded.
+_LINE_ERRORS = (TypeError, ValueError, RecursionError, budget.BudgetExceeded)
+
+
+class Error(t.NamedTuple):
+    line: int
+    message: str
+
+
+class Report(t.NamedTuple):
+    # How many lines weren't blank.
+    lines: int
+    # How many of those were converted.
+    converted: int
+    errors: t.List[Error]
+
+
+class _Shard(t.NamedTuple):
+    target: t.Any
+    path: str
+    start: int
+    end: int
+    # The file to write normalized lines to, if any.
+    output: t.Optional[str]
+
+
+class _Result(t.NamedTuple):
+    # The number of lines in the shard, blank or not.
+    newlines: int
+    lines: int
+    converted: int
+    # Numbered from 1 within the shard.
+    errors: t.List[Error]
+
+
+def load_target(spec: str) -> t.Any:
+    """Imports a target named like `package.module:Class.Inner`."""
+    module_name, sep, name = spec.partition(':')
+    if not sep or not module_name or not name:
+        raise ValueError(f'expected "module:Target", got "{spec}"')
+    target: t.Any = importlib.import_module(module_name)
+    for part in name.split('.'):
+        target = getattr(target, part)
+    return target
+
+
+def shards(buffer: t.Union[bytes, mmap.mmap],
+           count: int) -> t.List[t.Tuple[int, int]]:
+    """Splits `buffer` into at most `count` ranges of whole lines, of about
+    the same size."""
+    size = len(buffer)
+    step = max(-(-size // max(count, 1)), 1)
+    ranges = []
+    start = 0
+    while start < size:
+        end = buffer.find(b'\n', min(start + step, size) - 1)
+        end = size if end == -1 else end + 1
+        ranges.append((start, end))
+        start = end
+    return ranges
+
+
+def normalize(value: t.Any) -> t.Any:
+    """Returns `value` as plain JSON values: records as objects, enums as
+    their values and dates as ISO strings."""
+    if isinstance(value, enum.Enum):
+        return normalize(value.value)
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, dict):
+        return {str(k): normalize(v) for k, v in value.items()}
+    cls: t.Any = type(value)
+    record = records.record_info(cls)
+    if record is not None:
+        return {f.name: normalize(getattr(value, f.name))
+                for f in record.fields}
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return [normalize(v) for v in value]
+    if hasattr(value, '__dict__'):
+        return {k: normalize(v) for k, v in vars(value).items()}
+    raise TypeError(f'can\'t write "{value}" (type {type(value)}) as JSON.')
+
+
+def _convert_shard(shard: _Shard) -> _Result:
+    convert = inline.convert_value(shard.target)
+    decode = _DECODER.decode
+    newlines = lines = converted = 0
+    errors = []
+    output = open(shard.output, 'w') if shard.output else None
+    try:
+        with open(shard.path, 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            buffer.seek(shard.start)
+            position = shard.start
+            for line in iter(buffer.readline, b''):
+                if position >= shard.end:
+                    break
+                position += len(line)
+                newlines += 1
+                if not line.strip():
+                    continue
+                lines += 1
+                try:
+                    value = convert(decode(line.decode()))
+                except _LINE_ERRORS as e:
+                    errors.append(Error(newlines, str(e)))
+                    continue
+                converted += 1
+                if output is not None:
+                    output.write(json.dumps(normalize(value)))
+                    output.write('\n')
+    finally:
+        if output is not None:
+            output.close()
+    return _Result(newlines, lines, converted, errors)
+
+
+def convert_file(target: t.Any,
+                 path: str,
+                 workers: t.Optional[int] = None,
+                 output: t.Optional[str] = None) -> Report:
+    """Converts each line of the JSON Lines file at `path` to `target`.
+
+    Shards of the file are converted by `workers` processes, one per CPU by
+    default, or in this one if it's 1. Blank lines are skipped. Returns the
+    counts and every error, with the line it was on counting from 1, in
+    order. If `output` is given, the converted lines are written to it as
+    normalized JSON, leaving out lines which failed.
+    """
+    workers = workers or os.cpu_count() or 1
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            ranges = []
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                count = min(workers * SHARDS_PER_WORKER,
+                            len(buffer) // MIN_SHARD_SIZE)
+                ranges = shards(buffer, count)
+
+    with tempfile.TemporaryDirectory() as directory:
+        jobs = [_Shard(target, path, start, end,
+                       os.path.join(directory, str(i)) if output else None)
+                for i, (start, end) in enumerate(ranges)]
+        if workers == 1 or len(jobs) <= 1:
+            results = list(map(_convert_shard, jobs))
+        else:
+            with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+                results = list(pool.map(_convert_shard, jobs))
+
+        if output:
+            with open(output, 'wb') as out:
+                for job in jobs:
+                    assert job.output is not None
+                    with open(job.output, 'rb') as part:
+                        shutil.copyfileobj(part, out)
+
+    errors: t.List[Error] = []
+    offset = 0
+    for result in results:
+        errors.extend(Error(e.line + offset, e.message)
+                      for e in result.errors)
+        offset += result.newlines
+    return Report(sum(r.lines for r in results),
+                  sum(r.converted for r in results), errors)
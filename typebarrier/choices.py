@@ -0,0 +1,72 @@
+"""
+Lookup tables for targets which only allow a fixed set of values.
+
+These are `enum.Enum` subclasses and `typing.Literal[...]` annotations. Each
+table is built once per type so converting a value is a single lookup.
+"""
+import enum
+import functools
+import typing as t
+
+
+class EnumInfo(t.NamedTuple):
+    # Maps each member's value to the member.
+    members: t.Dict[t.Any, enum.Enum]
+    # True if some values can't be found in `members`, because they aren't
+    # hashable, the enum defines `_missing_` or it's a `Flag` which allows
+    # combinations. In that case the enum itself has to be called.
+    needs_call: bool
+
+
+@functools.lru_cache(maxsize=None)
+def enum_info(target: t.Any) -> t.Optional[EnumInfo]:
+    """Returns the lookup table for an Enum subclass, or None."""
+    if not (isinstance(target, type) and issubclass(target, enum.Enum)):
+        return None
+    members: t.Dict[t.Any, enum.Enum] = {}
+    default_missing = enum.Enum.__dict__['_missing_'].__func__
+    needs_call = (issubclass(target, enum.Flag)
+                  or getattr(target._missing_, '__func__', None)
+                  is not default_missing)
+    for member in target.__members__.values():
+        try:
+            members.setdefault(member.value, member)
+        except TypeError:
+            needs_call = True
+    return EnumInfo(members, needs_call)
+
+
+@functools.lru_cache(maxsize=None)
+def literal_values(target: t.Any) -> t.Optional[t.FrozenSet[t.Any]]:
+    """Returns the values allowed by a Literal annotation, or None."""
+    if t.get_origin(target) is not t.Literal:
+        return None
+    return frozenset(t.get_args(target))
+
+
+LiteralKey = t.Tuple[type, t.Any]
+
+
+@functools.lru_cache(maxsize=None)
+def literal_keys(target: t.Any) -> t.Optional[t.FrozenSet[LiteralKey]]:
+    """Returns `(type(v), v)` for each value `v` allowed by a Literal
+    annotation, or None.
+
+    Values are looked up with their types, since `True == 1 == 1.0` would
+    otherwise let `Literal[1]` accept `True` and `1.0`.
+    """
+    if t.get_origin(target) is not t.Literal:
+        return None
+    return frozenset((type(v), v) for v in t.get_args(target))
+
+
+@functools.lru_cache(maxsize=None)
+def literal_table(target: t.Any) -> t.Dict[LiteralKey, t.Any]:
+    """Maps `(type(v), v)` for each value of a Literal annotation to `v`.
+
+    Looking a value up here returns the single instance stored in the
+    annotation, so that equal strings from many inputs share memory.
+    """
+    if t.get_origin(target) is not t.Literal:
+        return {}
+    return {(type(v), v): v for v in t.get_args(target)}
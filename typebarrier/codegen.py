@@ -1,37 +1,141 @@
-import inspect
+import ast
+import collections.abc
+import contextlib
 import typing as t
 
+from . import budget as b
+from . import choices
+from . import introspect
+from . import nodes as n
+from . import plan
+from . import records
+from . import registry
+from . import trusted
+from . import validation
+
 
 T = t.TypeVar('T')
 
+Block = t.List[ast.stmt]
+
+# The parameter holding results so far, if `dedup` is set.
+MEMO = 'memo'
+
+# The local variable listing the problems a validator has found.
+PROBLEMS = 'problems'
+
+# Values of these types are deduplicated by equality rather than identity.
+DEDUP_BY_VALUE = frozenset([str, bytes, int, float, bool])
+
+# The local variables counting what's spent of each limit in a budget.
+_COUNT_VARS = {
+    b.ELEMENTS: 'spent_elements',
+    b.STRING_BYTES: 'spent_string_bytes',
+    b.EXTRA_KEYS: 'spent_extra_keys',
+}
+
+Link = t.Callable[[t.Any],
+                  t.Union[None, t.Callable[[t.Any], t.Any], 'Stub']]
 
-def esq(whatevs: t.Any) -> str:
-    """escape single quotes"""
-    return str(whatevs).replace("'", "\\'")
+# Writes code converting the expression for a value to a target.
+Generate = t.Callable[['CodeGen', t.Any, ast.expr], None]
+
+# Compiles a function from what a `Generate` writes for a target. The string
+# names the kind of branch, so compiled branches can be shared.
+CompileBranch = t.Callable[[str, Generate, t.Any], t.Callable[..., t.Any]]
+
+# The keys and indices leading to a value being validated, as expressions.
+Path = t.Tuple[ast.expr, ...]
 
 
 class CodeGen:
-    """Generates code for a function."""
+    """Generates code for a function, as `ast` nodes.
+
+    Statements are added to the innermost open block. Blocks are opened with
+    the context managers `if_`, `elif_`, `else_`, `try_`, `except_`, `for_`
+    and `function`. Values known at generation time, including every target
+    type, are only ever referenced through closure variables.
+
+    If `trusted_constructors` is set, classes whose `__init__` is verified
+    to only assign its arguments are built without calling it.
+
+    If `intern_literals` is set, values matching a Literal annotation are
+    replaced with the instance stored in the annotation.
+
+    If `single_pass_fields` is set, dictionaries are matched to records with
+    many optional fields by looping over their items once.
+
+    If `optimize` is set, which it is by default, the generated module is
+    rewritten by `typebarrier.optimize` before being compiled.
+
+    If `dedup` is set, each value is converted once per call to each target
+    it's converted to, and later occurrences share the result. Every
+    generated function then takes the results so far as a `memo` parameter.
+
+    If `budget` is given, the generated code counts what it converts in
+    local variables and raises `budget.BudgetExceeded` when it goes over.
+    Nothing is linked then, so the counts cover the whole conversion, and a
+    target nested within itself is generated again at each level down to
+    the budget's `max_depth`, which it must have.
+
+    `link` is called with nested targets whose converters may be shared,
+    such as `List[Volume]`, and with targets nested within themselves. If
+    it returns an already compiled converter, or a `Stub` for one still
+    being compiled, that's called instead of generating the conversion
+    again.
+
+    `link_validator` is called like `link` with targets nested within
+    themselves while generating a validator, and returns a compiled
+    validator for them or a `Stub` for one.
+
+    If `lazy` is set and `compile_branch` is given, the branches converting
+    a dictionary or a sole argument to a class are each replaced by a
+    `Stub`, which compiles the branch with `compile_branch` the first time
+    it's taken. Nothing is compiled for branches never taken. As with
+    `link`, this is turned off by `budget`.
+    """
 
-    def __init__(self) -> None:
+    def __init__(self,
+                 trusted_constructors: bool = False,
+                 intern_literals: bool = False,
+                 single_pass_fields: bool = False,
+                 optimize: bool = True,
+                 dedup: bool = False,
+                 budget: t.Optional[b.Budget] = None,
+                 link: t.Optional[Link] = None,
+                 lazy: bool = False,
+                 compile_branch: t.Optional[CompileBranch] = None,
+                 link_validator: t.Optional[Link] = None) -> None:
+        self.trusted_constructors = trusted_constructors
+        self.intern_literals = intern_literals
+        self.single_pass_fields = single_pass_fields
+        self.optimize = optimize
+        self.dedup = dedup
+        self.budget = budget
+        # How many lists and dictionaries the code being generated is
+        # within, which is all that's needed to check `max_depth`.
+        self.depth = 0
+        # The targets whose conversion is being generated, outermost first.
+        self.converting: t.List[t.Any] = []
+        # Likewise for the targets whose validation is being generated.
+        self.validating: t.List[t.Any] = []
+        self.link = link
+        self.link_validator = link_validator
+        self.lazy = lazy
+        self.compile_branch = compile_branch
         self._vi = 0
         self._cv = 0
-        self._lines: t.List[str] = []
-        self._return_variables: t.List[str] = []
+        self._body: Block = []
+        self._blocks: t.List[Block] = [self._body]
+        self._return_targets: t.List[ast.expr] = []
+        self._return_depths: t.List[int] = []
         self._namespace: t.Dict[str, t.Any] = {}
-        self._indent = 0
-        self._return_indent: t.List[int] = []
-
-    def dedent(self) -> None:
-        self._indent -= 1
-
-    def indent(self) -> None:
-        self._indent += 1
 
     def inject_closure_var(self, var: t.Any) -> str:
         """Adds variable to `namespace` dictionary. Returns key"""
         for k, v in self._namespace.items():
-            if v == var:
+            # Check the type too, otherwise 1 and True would be confused.
+            if type(v) is type(var) and v == var:
                 return k
 
         self._cv += 1
@@ -44,409 +148,1413 @@ class CodeGen:
         self._vi += 1
         return f'v{self._vi}'
 
-    def add_line(self, line: str) -> None:
-        self._lines.append(' ' * self._indent * 4 + line)
-
-    def add_lines(self, lines: t.List[str]) -> None:
-        for line in lines:
-            self.add_line(line)
-
-    def add_return(self, expr: str) -> None:
-        if self._return_variables:
-            self.add_line(f'{self._return_variables[-1]} = {expr}')
+    def add(self, stmt: ast.stmt) -> None:
+        """Adds a statement to the innermost open block."""
+        self._blocks[-1].append(stmt)
+
+    @contextlib.contextmanager
+    def _block(self, body: Block) -> t.Iterator[None]:
+        """Opens `body`, which gets a `pass` if nothing is added to it."""
+        depth = len(self._blocks)
+        self._blocks.append(body)
+        try:
+            yield
+        finally:
+            del self._blocks[depth:]
+            if not body:
+                body.append(n.pass_())
+
+    def _last_if(self) -> ast.If:
+        """Returns the last `if` of the chain just added to this block."""
+        node = self._blocks[-1][-1]
+        assert isinstance(node, ast.If)
+        while len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If):
+            node = node.orelse[0]
+        return node
+
+    def if_(self, test: ast.expr) -> t.ContextManager[None]:
+        node = n.if_(test, [])
+        self.add(node)
+        return self._block(node.body)
+
+    def elif_(self, test: ast.expr) -> t.ContextManager[None]:
+        node = n.if_(test, [])
+        self._last_if().orelse.append(node)
+        return self._block(node.body)
+
+    def else_(self) -> t.ContextManager[None]:
+        return self._block(self._last_if().orelse)
+
+    def try_(self) -> t.ContextManager[None]:
+        node = n.node(ast.Try, body=[], handlers=[], orelse=[],
+                      finalbody=[])
+        self.add(node)
+        return self._block(node.body)
+
+    def except_(self,
+                types: ast.expr,
+                name: t.Optional[str] = None) -> t.ContextManager[None]:
+        node = self._blocks[-1][-1]
+        assert isinstance(node, ast.Try)
+        handler = n.node(ast.ExceptHandler, type=types, name=name, body=[])
+        node.handlers.append(handler)
+        return self._block(handler.body)
+
+    def for_(self,
+             target: ast.expr,
+             iterable: ast.expr) -> t.ContextManager[None]:
+        node = n.node(ast.For, target=n.store(target), iter=iterable,
+                      body=[], orelse=[])
+        self.add(node)
+        return self._block(node.body)
+
+    def function(self,
+                 name: str,
+                 params: t.Sequence[t.Tuple[str, str]],
+                 ) -> t.ContextManager[None]:
+        """Opens `def name(param: annotation, ...)`.
+
+        Each annotation is the name of a closure variable. With `dedup`, a
+        last parameter `memo=None` is added, and a new memo is made if it
+        isn't passed.
+        """
+        names = [p for p, _ in params]
+        annotations: t.List[t.Optional[str]] = [a for _, a in params]
+        if self.dedup:
+            names.append(MEMO)
+            annotations.append(None)
+        args = n.arguments(*names, annotations=annotations,
+                           defaults=[None] if self.dedup else [])
+        node = n.function_def(name, args, [])
+        self.add(node)
+        block = self._block(node.body)
+        if self.dedup:
+            node.body.append(n.if_(n.compare(n.name(MEMO), 'is', None),
+                                   [n.assign(MEMO, n.dict_())]))
+        if self.budget is not None:
+            for limit, count_var in _COUNT_VARS.items():
+                if getattr(self.budget, limit) is not None:
+                    node.body.append(n.assign(count_var, 0))
+        return block
+
+    def add_return(self, expr: ast.expr) -> None:
+        if self._return_targets:
+            self.add(n.assign(self._return_targets[-1], expr))
         else:
-            self.add_line(f'return {expr}')
+            self.add(n.return_(expr))
 
-    def start_inline_func(self, return_var: t.Optional[str]=None) -> str:
+    def start_inline_func(self,
+                          return_target: t.Optional[ast.expr] = None,
+                          ) -> ast.expr:
         """Call this before adding an inline func.
 
-        The variable name used for the return value is returned here.
+        Returns are assigned to `return_target`, or a new variable, which is
+        returned here.
         """
-        self._return_indent.append(self._indent)
-        self._return_variables.append(return_var or self.make_var())
-        return self._return_variables[-1]
+        if return_target is None:
+            return_target = n.name(self.make_var())
+        self._return_depths.append(len(self._blocks))
+        self._return_targets.append(return_target)
+        return return_target
 
     def end_inline_func(self) -> None:
         """Call this after adding inline function code."""
-        assert self._indent >= self._return_indent[-1]
-        self._indent = self._return_indent.pop()
-        del self._return_variables[-1]
+        depth = self._return_depths.pop()
+        assert len(self._blocks) >= depth
+        del self._blocks[depth:]
+        del self._return_targets[-1]
+
+    def module(self) -> ast.Module:
+        """Returns the generated code, ready to be compiled."""
+        return ast.Module(body=self._body, type_ignores=[])
 
     def render(self) -> str:
-        return '\n'.join(self._lines)
+        return ast.unparse(self.module())
 
     @property
     def namespace(self) -> t.Dict[str, t.Any]:
         return self._namespace
 
 
+class Stub:
+    """A branch of generated code, compiled the first time it's taken.
+
+    Generated code calls `stub.convert`. At first that compiles the branch
+    with `build`, then replaces `convert` with the compiled function, so
+    later calls go straight to it. Threads taking the branch at once may
+    each call `build`, which should return the same function every time.
+    """
+
+    def __init__(self, build: t.Callable[[], t.Callable[..., t.Any]]) -> None:
+        self._build = build
+        self.compiled = False
+        self.convert: t.Callable[..., t.Any] = self._compile_and_convert
+
+    def _compile_and_convert(self, *args: t.Any) -> t.Any:
+        self.convert = self._build()
+        self.compiled = True
+        return self.convert(*args)
+
+
+def _is_type(value: ast.expr, target_var_name: str) -> ast.expr:
+    """Returns `issubclass(type(value), target)`."""
+    return n.call('issubclass', n.type_of(value), n.name(target_var_name))
+
+
+def _is_dict(value: ast.expr) -> ast.expr:
+    return n.call('isinstance', value, n.name('dict'))
+
+
+def _errors(*names: str) -> ast.expr:
+    if len(names) == 1:
+        return n.name(names[0])
+    return n.tuple_(*[n.name(name) for name in names])
+
+
+def _cant_convert(value: ast.expr,
+                  target_var_name: str,
+                  cause: t.Optional[ast.expr] = None) -> ast.Raise:
+    return n.type_error('can\'t convert "', value, '" (type ',
+                        n.type_of(value), ') to ', n.name(target_var_name),
+                        '.', cause=cause)
+
+
+def _over_budget(code: CodeGen, limit: str) -> ast.stmt:
+    exceeded_var = code.inject_closure_var(b.BudgetExceeded)
+    return n.raise_(n.call(exceeded_var, limit,
+                           getattr(code.budget, limit)))
+
+
+def _spend(code: CodeGen, limit: str, amount: n.Value) -> None:
+    """Writes code adding `amount` to what's spent of `limit`, if the budget
+    has that limit."""
+    if code.budget is None or getattr(code.budget, limit) is None:
+        return
+    count_var = _COUNT_VARS[limit]
+    code.add(n.add_to(count_var, amount))
+    with code.if_(n.compare(n.name(count_var), '>',
+                            getattr(code.budget, limit))):
+        code.add(_over_budget(code, limit))
+
+
+@contextlib.contextmanager
+def _container(code: CodeGen,
+               arg_var: ast.expr,
+               sized: bool = True) -> t.Iterator[t.Optional[str]]:
+    """Wraps code converting the elements of the list or dictionary
+    `arg_var`, charging them to the budget.
+
+    Depth is known while generating code, so going over `max_depth` costs
+    nothing until it happens. Unless `sized` is set, `arg_var` may be an
+    iterable without a length, like a generator. Then this yields a
+    variable which is true if the loop over it must charge each element
+    with `_spend_each`, and otherwise None.
+    """
+    each_var = None
+    if code.budget is not None:
+        max_depth = code.budget.max_depth
+        if max_depth is not None and code.depth >= max_depth:
+            code.add(_over_budget(code, b.DEPTH))
+        if sized or code.budget.max_elements is None:
+            _spend(code, b.ELEMENTS, n.call('len', arg_var))
+        else:
+            each_var = code.make_var()
+            code.add(n.assign(each_var, n.not_(
+                n.call('hasattr', arg_var, '__len__'))))
+            with code.if_(n.not_(n.name(each_var))):
+                _spend(code, b.ELEMENTS, n.call('len', arg_var))
+    code.depth += 1
+    try:
+        yield each_var
+    finally:
+        code.depth -= 1
+
+
+def _spend_each(code: CodeGen, each_var: t.Optional[str]) -> None:
+    """Writes code charging one element of an iterable without a length,
+    within the loop over it."""
+    if each_var is not None:
+        with code.if_(n.name(each_var)):
+            _spend(code, b.ELEMENTS, 1)
+
+
+def _shared_converter(code: CodeGen,
+                      target: t.Any,
+                      ) -> t.Union[None, t.Callable[[t.Any], t.Any], Stub]:
+    """Returns a compiled converter for a parameterized list or dictionary,
+    or a target nested within itself, if `code.link` has one."""
+    if code.link is None or code.budget is not None:
+        return None
+    if target in code.converting:
+        # Generating it inline again would never end.
+        return code.link(target)
+    p = plan.plan(target)
+    if p.kind not in (plan.LIST, plan.DICT) or p.cls is target:
+        return None
+    return code.link(target)
+
+
+def _convert_into(code: CodeGen,
+                  target: t.Any,
+                  arg_var: ast.expr,
+                  dest: t.Optional[ast.expr] = None) -> ast.expr:
+    """Converts `arg_var`, assigning it to `dest` or a new variable."""
+    shared = _shared_converter(code, target)
+    if shared is not None:
+        result = n.name(code.make_var()) if dest is None else dest
+        converter: ast.expr = n.name(code.inject_closure_var(shared))
+        if isinstance(shared, Stub):
+            converter = n.attr(converter, 'convert')
+        args = [arg_var, n.name(MEMO)] if code.dedup else [arg_var]
+        code.add(n.assign(result, n.call(converter, *args)))
+        return result
+    result = code.start_inline_func(dest)
+    convert_value(code, target, arg_var)
+    code.end_inline_func()
+    return result
+
+
 def convert_dictionary_to_kwargs(code: CodeGen,
                                  target: t.Any,
-                                 arg_var: str) -> None:
+                                 arg_var: ast.expr) -> None:
     """
     Produces code which, given a target, returns a dictionary of
     keyword arguments.
     """
-    sig = inspect.signature(target)
-    var_keyword_param: t.Optional[inspect.Parameter] = None
-
-    check_key_error = False
+    call = plan.call(target)
 
     result_var = code.make_var()
-    code.add_line(f'{result_var} = {{}}')
+    code.add(n.assign(result_var, n.dict_()))
 
-    acceptable_params: t.List[str] = []
+    # Extra keys, if accepted, go straight into the result.
+    extras_var = None if call.extras is None else result_var
+
+    _convert_record_fields(
+        code, target, call.fields, arg_var,
+        {f.name: n.subscript(n.name(result_var), f.name)
+         for f in call.fields.fields},
+        extras_var, call.extras or t.Any)
+    code.add_return(n.name(result_var))
 
-    for p in sig.parameters.values():
-        if p.kind == inspect.Parameter.VAR_KEYWORD:
-            assert var_keyword_param is None
-            var_keyword_param = p
-        elif p.kind == inspect.Parameter.VAR_POSITIONAL:
-            pass  # Can't do anything, just ignore
-        else:
-            acceptable_params.append(p.name)
 
-            if p.default == p.empty:
-                if not check_key_error:
-                    check_key_error = True
-                    code.add_line('try:')
-                    code.indent()
+def convert_list_to_kwargs(code: CodeGen,
+                           target: t.Any,
+                           arg_var: ast.expr) -> None:
+    """
+    Produces code which, given a target, returns a dictionary of keyword
+    arguments from a list of positional ones.
+    """
+    call = plan.call(target)
+    target_var_name = code.inject_closure_var(target)
+    result_var = code.make_var()
+    code.add(n.assign(result_var, n.dict_()))
+    length = n.call('len', arg_var)
+
+    for index, f in enumerate(call.fields.fields[:call.positional]):
+        with code.if_(n.compare(length, '>', index)):
+            _convert_into(code, f.annotation, n.subscript(arg_var, index),
+                          n.subscript(n.name(result_var), f.name))
+        if f.required:
+            with code.else_():
+                code.add(n.type_error(
+                    f'missing a positional argument: {index}'))
+
+    if call.var_positional is not None:
+        rest_var = code.make_var()
+        code.add(n.assign(rest_var, n.list_()))
+        index_var = code.make_var()
+        element_var = code.make_var()
+        with code.for_(n.tuple_(n.name(index_var), n.name(element_var)),
+                       n.call('enumerate',
+                              n.slice_from(arg_var, call.positional))):
+            with code.try_():
+                converted = _convert_into(
+                    code, call.var_positional.annotation, n.name(element_var))
+                code.add(n.call_stmt(n.call(
+                    n.attr(n.name(rest_var), 'append'), converted)))
+            te_var = code.make_var()
+            with code.except_(_errors('TypeError'), te_var):
+                code.add(n.type_error(
+                    'problem converting element ', n.name(index_var),
+                    ' in a list of args for ', n.name(target_var_name),
+                    ' variable length args: ', n.name(te_var)))
+        code.add(n.assign(
+            n.subscript(n.name(result_var), call.var_positional.name),
+            n.name(rest_var)))
+    else:
+        taken = n.call('len', n.name(result_var))
+        with code.if_(n.compare(length, '>', taken)):
+            code.add(n.type_error(
+                n.name(target_var_name), ' takes ', taken,
+                ' positional argument(s) but ', length, ' were given'))
+    code.add_return(n.name(result_var))
+
+
+def convert_with(code: CodeGen,
+                 target: t.Any,
+                 converter: registry.Converter,
+                 arg_var: ast.expr) -> None:
+    """Writes code calling a converter from the registry directly."""
+    target_var_name = code.inject_closure_var(target)
+    converter_var = code.inject_closure_var(converter)
+    value_var = code.make_var()
+    code.add(n.assign(value_var, arg_var))
+    value = n.name(value_var)
+    with code.try_():
+        code.add_return(n.call(converter_var, value))
+    e_var = code.make_var()
+    with code.except_(_errors('TypeError', 'ValueError'), e_var):
+        code.add(_cant_convert(value, target_var_name, n.name(e_var)))
+
+
+def convert_enum(code: CodeGen,
+                 target: t.Any,
+                 info: choices.EnumInfo,
+                 arg_var: ast.expr) -> None:
+    """Writes code finding the member of an Enum by value in a dict."""
+    target_var_name = code.inject_closure_var(target)
+    members_var = code.inject_closure_var(info.members)
+    value_var = code.make_var()
+    code.add(n.assign(value_var, arg_var))
+    value = n.name(value_var)
+    with code.try_():
+        code.add_return(n.subscript(n.name(members_var), value))
+    with code.except_(_errors('KeyError', 'TypeError')):
+        with code.if_(_is_type(value, target_var_name)):
+            code.add_return(value)
+        with code.else_():
+            if info.needs_call:
+                with code.try_():
+                    code.add_return(n.call(target_var_name, value))
+                with code.except_(_errors('ValueError')):
+                    code.add(_cant_convert(value, target_var_name))
             else:
-                code.add_line(f'if \'{p.name}\' in {arg_var}:')
-                code.indent()
-
-            code.start_inline_func(f'{result_var}["{p.name}"]')
-            # Add this arg to the eventual call
-            convert_value(code,
-                          p.annotation,
-                          f'{arg_var}["{p.name}"]')
-            code.end_inline_func()
-            if p.default != p.empty:  # if this was in an if statement
-                code.dedent()
-
-    if check_key_error:
-        # in except clause, resurface any key errors as a TypeError
-        code.dedent()
+                code.add(_cant_convert(value, target_var_name))
+
+
+def convert_literal(code: CodeGen,
+                    target: t.Any,
+                    keys: t.FrozenSet[choices.LiteralKey],
+                    arg_var: ast.expr) -> None:
+    """Writes code checking a value is allowed by a Literal annotation.
+
+    `(type(value), value)` is looked up in `keys`, from
+    `choices.literal_keys`, or with `intern_literals` in a dict returning
+    the value stored in the annotation.
+    """
+    target_var_name = code.inject_closure_var(target)
+    value_var = code.make_var()
+    code.add(n.assign(value_var, arg_var))
+    value = n.name(value_var)
+    key = n.tuple_(n.type_of(value), value)
+    found_var = code.make_var()
+    if code.intern_literals:
+        table_var = code.inject_closure_var(choices.literal_table(target))
+        with code.try_():
+            code.add(n.assign(found_var,
+                              n.subscript(n.name(table_var), key)))
+        errors = _errors('KeyError', 'TypeError')
+    else:
+        keys_var = code.inject_closure_var(keys)
+        with code.try_():
+            code.add(n.assign(found_var,
+                              n.compare(key, 'in', n.name(keys_var))))
+        errors = _errors('TypeError')  # unhashable values never match
+    with code.except_(errors):
+        code.add(_cant_convert(value, target_var_name, n.expr(None)))
+    if code.intern_literals:
+        code.add_return(n.name(found_var))
+    else:
+        with code.if_(n.not_(n.name(found_var))):
+            code.add(_cant_convert(value, target_var_name))
+        code.add_return(value)
+
+
+# With `single_pass_fields`, records with at least this many optional fields
+# are matched by looping over the incoming dictionary once, instead of testing
+# for each optional field.
+SINGLE_PASS_MIN_OPTIONAL_FIELDS = 8
+
+
+def _convert_extra_key(code: CodeGen,
+                       target: t.Any,
+                       arg_var: ast.expr,
+                       key_var: str,
+                       value_expr: ast.expr,
+                       extras_var: str,
+                       extras_annotation: t.Any) -> None:
+    """Writes code converting an extra key's value into `extras_var`."""
+    dest = n.subscript(n.name(extras_var), n.name(key_var))
+    if extras_annotation == t.Any:
+        code.add(n.assign(dest, value_expr))
+        return
+    target_var_name = code.inject_closure_var(target)
+    with code.try_():
+        _convert_into(code, extras_annotation, value_expr, dest)
+    te_var = code.make_var()
+    with code.except_(_errors('TypeError'), te_var):
+        annotation_var = code.inject_closure_var(extras_annotation)
+        code.add(n.type_error(
+            'problem converting argument "', n.name(key_var),
+            '" to annotated variable keyword arg type ',
+            n.name(annotation_var), ' found in ', n.name(target_var_name),
+            '.', cause=n.name(te_var)))
+
+
+def _raise_extra_keys(code: CodeGen,
+                      target: t.Any,
+                      record: records.Record,
+                      arg_var: ast.expr) -> None:
+    target_var_name = code.inject_closure_var(target)
+    names_var = code.inject_closure_var(record.names)
+    k_var = code.make_var()
+    code.add(n.type_error(
+        'the following parameters not accepted for "',
+        n.name(target_var_name), '" : ',
+        n.list_comp(n.name(k_var), k_var, arg_var,
+                    n.compare(n.name(k_var), 'not in', n.name(names_var)))))
+
+
+def _convert_record_fields(code: CodeGen,
+                           target: t.Any,
+                           record: records.Record,
+                           arg_var: ast.expr,
+                           dests: t.Dict[str, ast.expr],
+                           extras_var: t.Optional[str] = None,
+                           extras_annotation: t.Any = t.Any) -> None:
+    """Writes code converting the dictionary `arg_var` to record fields.
+
+    Each converted field is assigned to the expression in `dests`. Missing
+    optional fields are left alone, unless `dests` holds a plain variable
+    for them, in which case it's set to the default.
+
+    Extra keys raise a TypeError, unless `extras_var` is given, in which
+    case they're converted to `extras_annotation` and added to the
+    dictionary it names (as for `**kwargs`).
+
+    No sets are built: the accepted names are a frozenset constant and
+    extra keys are only looked for when the number of matched fields differs
+    from the size of the dictionary.
+    """
+    with _container(code, arg_var):
+        optional = [f for f in record.fields if not f.required]
+        if (code.single_pass_fields
+                and len(optional) >= SINGLE_PASS_MIN_OPTIONAL_FIELDS):
+            _convert_record_fields_in_one_pass(
+                code, target, record, arg_var, dests, extras_var,
+                extras_annotation)
+        else:
+            _convert_record_fields_by_name(
+                code, target, record, arg_var, dests, extras_var,
+                extras_annotation)
+
+
+def _convert_record_fields_by_name(code: CodeGen,
+                                   target: t.Any,
+                                   record: records.Record,
+                                   arg_var: ast.expr,
+                                   dests: t.Dict[str, ast.expr],
+                                   extras_var: t.Optional[str],
+                                   extras_annotation: t.Any) -> None:
+    """Like `_convert_record_fields`, looking up each field in turn."""
+    optional = [f for f in record.fields if not f.required]
+    required = [f for f in record.fields if f.required]
+    count_var = None
+    if optional:
+        count_var = code.make_var()
+        code.add(n.assign(count_var, len(required)))
+
+    with code.try_() if required else contextlib.nullcontext():
+        for f in record.fields:
+            dest = dests[f.name]
+            if f.required:
+                _convert_into(code, f.annotation,
+                              n.subscript(arg_var, f.name), dest)
+                continue
+            assert count_var is not None
+            with code.if_(n.compare(f.name, 'in', arg_var)):
+                code.add(n.add_to(count_var, 1))
+                _convert_into(code, f.annotation,
+                              n.subscript(arg_var, f.name), dest)
+            if isinstance(dest, ast.Name):
+                with code.else_():
+                    default_var = code.inject_closure_var(f.default)
+                    code.add(n.assign(dest, n.name(default_var)))
+    if required:
         ke_var = code.make_var()
-        code.add_line(f'except KeyError as {ke_var}:')
-        code.indent()
-        code.add_line("""raise TypeError(f'missing a required argument: """
-                      f"""{{{ke_var}}}') from {ke_var}""")
-        code.dedent()
-
-    # OK, now that the conversion of normal params is done, have to deal
-    # with kwazy kwargs
-    possible_kwargs = code.make_var()
-    code.add_line(f'{possible_kwargs} = set(('
-                  + ' '.join(f"'{k}'," for k in acceptable_params) + '))')
-
-    extra_dict_keys_var = code.make_var()
-    code.add_line(f'{extra_dict_keys_var} = set({arg_var}.keys()).difference('
-                  f'{possible_kwargs})')
-    if var_keyword_param:
-        if var_keyword_param.annotation != inspect.Parameter.empty:
-            # Ugh, have to do type strong conversion just in case
-            key_var = code.make_var()
-            code.add_line(f'for {key_var} in {extra_dict_keys_var}:')
-            code.indent()  # START FOR LOOP
-            code.add_line('try:')
-            code.indent()  # START TRY
-            code.start_inline_func(f'{result_var}[{key_var}]')
-            convert_value(code,
-                          var_keyword_param.annotation,
-                          f'{arg_var}[{key_var}]')
-            code.end_inline_func()
-            code.dedent()  # END TRY
-            te_var = code.make_var()
-            code.add_line(f'except TypeError as {te_var}:')
-            code.indent()  # START EXCEPT
-            code.add_line('raise TypeError(f\'problem converting argument '
-                          f'"{{{key_var}}}" to annotated variable keyword '
-                          f'are type {esq(var_keyword_param.annotation)} '
-                          f'found in {target}.\')')
-            code.dedent()  # END EXCEPT
-            code.dedent()  # END FOR LOOP
+        with code.except_(_errors('KeyError'), ke_var):
+            code.add(n.type_error('missing a required argument: ',
+                                  n.name(ke_var), cause=n.name(ke_var)))
+
+    # Every accepted key was counted, so anything else in the dictionary
+    # means there are extra keys. Only then are they worked out.
+    count = n.name(count_var) if count_var else n.expr(len(required))
+    with code.if_(n.compare(n.call('len', arg_var), '!=', count)):
+        if extras_var is None:
+            _raise_extra_keys(code, target, record, arg_var)
         else:
-            # simple conversion of extra stuff to the kwarg parameter
-            key_var = code.make_var()
-            code.add_line(f'for {key_var} in {extra_dict_keys_var}:')
-            code.indent()
-            code.add_line(f'{result_var}[{key_var}] = {arg_var}[{key_var}]')
-            code.dedent()
+            _spend(code, b.EXTRA_KEYS, n.minus(n.call('len', arg_var), count))
+            names_var = code.inject_closure_var(record.names)
+            k_var = code.make_var()
+            with code.for_(n.name(k_var), arg_var):
+                with code.if_(n.compare(n.name(k_var), 'not in',
+                                        n.name(names_var))):
+                    _convert_extra_key(
+                        code, target, arg_var, k_var,
+                        n.subscript(arg_var, n.name(k_var)), extras_var,
+                        extras_annotation)
+
+
+def _convert_record_fields_in_one_pass(code: CodeGen,
+                                       target: t.Any,
+                                       record: records.Record,
+                                       arg_var: ast.expr,
+                                       dests: t.Dict[str, ast.expr],
+                                       extras_var: t.Optional[str],
+                                       extras_annotation: t.Any) -> None:
+    """Like `_convert_record_fields`, but loops over the dictionary once.
+
+    Each key is compared to the field names in turn. This beats testing
+    every optional field when most of them are absent, but is slower when
+    most are present.
+    """
+    for f in record.fields:
+        if not f.required and isinstance(dests[f.name], ast.Name):
+            default_var = code.inject_closure_var(f.default)
+            code.add(n.assign(dests[f.name], n.name(default_var)))
+    required = [f.name for f in record.fields if f.required]
+    seen_var = code.make_var()
+    if required:
+        code.add(n.assign(seen_var, 0))
+
+    k_var = code.make_var()
+    v_var = code.make_var()
+    with code.for_(n.tuple_(n.name(k_var), n.name(v_var)),
+                   n.call(n.attr(arg_var, 'items'))):
+        for index, f in enumerate(record.fields):
+            test = n.compare(n.name(k_var), '==', f.name)
+            with code.if_(test) if index == 0 else code.elif_(test):
+                if f.required:
+                    code.add(n.add_to(seen_var, 1))
+                _convert_into(code, f.annotation, n.name(v_var),
+                              dests[f.name])
+        with code.else_():
+            if extras_var is None:
+                _raise_extra_keys(code, target, record, arg_var)
+            else:
+                _spend(code, b.EXTRA_KEYS, 1)
+                _convert_extra_key(code, target, arg_var, k_var,
+                                   n.name(v_var), extras_var,
+                                   extras_annotation)
+
+    if required:
+        required_var = code.inject_closure_var(tuple(required))
+        n_var = code.make_var()
+        with code.if_(n.compare(n.name(seen_var), '!=', len(required))):
+            missing = n.call('next', n.generator(
+                n.name(n_var), n_var, n.name(required_var),
+                n.compare(n.name(n_var), 'not in', arg_var)))
+            code.add(n.type_error('missing a required argument: ',
+                                  n.formatted(missing, 'r')))
+
+
+def _make_named_tuple(code: CodeGen,
+                      target: t.Any,
+                      record: records.Record,
+                      field_vars: t.List[str]) -> None:
+    target_var_name = code.inject_closure_var(target)
+    fields = [n.name(var) for var in field_vars]
+    if record.fast_new:
+        new_var = code.inject_closure_var(tuple.__new__)
+        code.add_return(n.call(new_var, n.name(target_var_name),
+                               n.tuple_(*fields)))
     else:
-        code.add_line(f'if {extra_dict_keys_var}:')
-        code.indent()
-        code.add_line("""raise TypeError(f'the following parameters not """
-                      f"""accepted for "{esq(target)}" : """
-                      f"""{{list({extra_dict_keys_var})}}')""")
-        code.dedent()
-    code.add_return(result_var)
+        code.add_return(n.call(target_var_name, *fields))
 
 
-def convert_list_to_kwargs(code: CodeGen,
-                           target: t.Any,
-                           arg_var: str) -> None:
-    code.add_line('raise NotImplemented()')
-
-
-# The goal of the method below is to be more efficient by not creating a
-# dictionary if possible.
-# def _convert_dictionary_value(code: CodeGen,
-#                               target: t.Any,
-#                               arg_var: str) -> None:
-#     sig = inspect.signature(target)
-#     var_keyword_param: t.Optional[inspect.Parameter] = None
-
-#     check_key_error = False
-
-#     possible_calls: t.List[t.List[str]] = []
-
-#     call_index = code.make_var()
-#     code.add_line(f'{call_index} = 0')
-
-#     for p in sig.parameters.values():
-#         if p.kind == inspect.Parameter.VAR_KEYWORD:
-#             assert var_keyword_param is None
-#             var_keyword_param = p
-#         elif p.kind == inspect.Parameter.VAR_POSITIONAL:
-#             pass  # Can't do anything, just ignore
-#         else:
-#             if p.default == p.empty:
-#                 if not check_key_error:
-#                     check_key_error = True
-#                     code.add_line('try:')
-#                     code.indent()
-#             else:
-#                 code.add_line(f'if \'{p.name}\' not in {arg_var}:')
-#                 code.indent()
-#                 code.add_line(f'{call_index} = {len(possible_calls)}')
-#                 next_call = list(possible_calls[-1])  # make a copy
-#                 possible_calls.append(next_call)
-#                 code.dedent()
-#                 code.add_line('else:')
-#                 code.indent()
-
-#             tmp_var = code.start_inline_func()
-#             # Add this arg to the eventual call
-#             possible_calls[-1].append(tmp_var)
-#             convert_value(code,
-#                           p.annotation,
-#                           f'{arg_var}[\'{p.name}\']')
-#             current_call.append(tmp_var)
-#             code.end_inline_func()
-#             if p.default != p.empty:
-#                 code.dedent()
-
-#     if check_key_error:
-#         # in except clause, resurface any key errors as a TypeError
-#         code.dedent()
-#         ke_var = code.make_var()
-#         code.add_line(f'except KeyError as {ke_var}:')
-#         code.indent()
-#         code.add_line("""raise TypeError(f'missing a required argument: """
-#                       f"""{{{ke_var}}}') from {ke_var}""")
-#         code.dedent()
-
-#     # OK, now that the conversion of normal params is done, have to deal
-#     # with kwazy kwargs
-#     possible_kwargs = code.make_var()
-#     code.add_line(f'{possible_kwargs} = set('
-#         + ','.join(f"'{k}'" for k in sig.parameters.keys()) + ')')
-
-#     extra_dict_keys_var = code.make_var()
-#     code.add_line(f'{extra_dict_keys_var} = set({arg_var}.keys()).
-#                                                   difference('
-#                   f'{possible_kwargs})')
-#     if not var_keyword_param:
-#         code.add_line(f'if {extra_dict_keys_var}:')
-#         code.indent()
-#         code.add_line("""raise TypeError('the following parameters not """
-#                       f"""accepted for "{target}" : """
-#                       f"""{{list({extra_dict_keys_var})}}')""")
-#     else:
-#         if var_keyword_param.annotation != inspect.Parameter.empty:
-#             # Ugh, have to do type strong conversion just in case
-#         else:
-#             # simple conversion of extra stuff to the kwarg parameter
-#             code.add_line()
-
-#             code.add_line(f'if "{p.name}" not in {arg_var}:')
-#             code.indent()
+def convert_typed_dict(code: CodeGen,
+                       target: t.Any,
+                       record: records.Record,
+                       arg_var: ast.expr) -> None:
+    """Writes code converting a dictionary to a TypedDict.
+
+    The result is a plain dictionary filled in directly.
+    """
+    target_var_name = code.inject_closure_var(target)
+    with code.if_(n.not_(_is_dict(arg_var))):
+        code.add(_cant_convert(arg_var, target_var_name))
+    result_var = code.make_var()
+    code.add(n.assign(result_var, n.dict_()))
+    _convert_record_fields(
+        code, target, record, arg_var,
+        {f.name: n.subscript(n.name(result_var), f.name)
+         for f in record.fields})
+    code.add_return(n.name(result_var))
+
+
+def _is_list_or_tuple(value: ast.expr) -> ast.expr:
+    return n.call('isinstance', value,
+                  n.tuple_(n.name('list'), n.name('tuple')))
+
+
+def _wrong_length(code: CodeGen,
+                  target_var_name: str,
+                  arg_var: ast.expr,
+                  count: int) -> None:
+    code.add(n.type_error(n.name(target_var_name),
+                          f' takes {count} positional argument(s) but ',
+                          n.call('len', arg_var), ' were given'))
+
+
+def convert_named_tuple(code: CodeGen,
+                        target: t.Any,
+                        record: records.Record,
+                        arg_var: ast.expr) -> None:
+    """Writes code converting a dictionary or list to a NamedTuple.
+
+    The fields are converted into local variables and then passed
+    positionally.
+    """
+    target_var_name = code.inject_closure_var(target)
+    with code.if_(_is_type(arg_var, target_var_name)):
+        code.add_return(arg_var)
+
+    with code.elif_(_is_dict(arg_var)):
+        field_vars = [code.make_var() for _ in record.fields]
+        _convert_record_fields(
+            code, target, record, arg_var,
+            {f.name: n.name(var) for f, var in zip(record.fields, field_vars)})
+        _make_named_tuple(code, target, record, field_vars)
+
+    with code.elif_(_is_list_or_tuple(arg_var)):
+        required = sum(1 for f in record.fields if f.required)
+        with code.if_(n.not_(n.compare(required, '<=',
+                                       n.call('len', arg_var), '<=',
+                                       len(record.fields)))):
+            _wrong_length(code, target_var_name, arg_var, len(record.fields))
+        field_vars = [code.make_var() for _ in record.fields]
+        with _container(code, arg_var):
+            for index, (f, var) in enumerate(zip(record.fields, field_vars)):
+                element = n.subscript(arg_var, index)
+                if f.required:
+                    _convert_into(code, f.annotation, element, n.name(var))
+                    continue
+                with code.if_(n.compare(n.call('len', arg_var), '>', index)):
+                    _convert_into(code, f.annotation, element, n.name(var))
+                with code.else_():
+                    default_var = code.inject_closure_var(f.default)
+                    code.add(n.assign(var, n.name(default_var)))
+        _make_named_tuple(code, target, record, field_vars)
+
+    with code.else_():
+        code.add(_cant_convert(arg_var, target_var_name))
+
+
+def call_target(code: CodeGen, target: t.Any, arg_var: ast.expr) -> None:
+    """Writes code calling target with arguments converted from arg_var.
+
+    Dictionaries are matched to parameters by name and lists or tuples by
+    position, like `**kwargs` and `*args`. Arguments are converted into local
+    variables and passed positionally, filling in defaults, so no
+    intermediate kwargs dictionary is built.
+    """
+    target_var_name = code.inject_closure_var(target)
+    plan_call = plan.call(target)
+    params = plan_call.fields.fields
+    positional = params[:plan_call.positional]
+    keyword_only = params[plan_call.positional:]
+    var_positional = plan_call.var_positional
+    var_keyword = plan_call.extras
+
+    def call(arg_vars: t.List[str],
+             rest_var: t.Optional[str] = None,
+             extras_var: t.Optional[str] = None) -> ast.expr:
+        args: t.List[ast.expr] = [n.name(var)
+                                  for var in arg_vars[:len(positional)]]
+        if rest_var:
+            args.append(n.starred(n.name(rest_var)))
+        keywords = {p.name: n.name(var)
+                    for p, var in zip(keyword_only,
+                                      arg_vars[len(positional):])}
+        return n.call(target_var_name, *args, keywords=keywords,
+                      double_star=n.name(extras_var) if extras_var else None)
+
+    with code.if_(_is_dict(arg_var)):
+        arg_vars = [code.make_var() for _ in params]
+        extras_var = None
+        if var_keyword is not None:
+            extras_var = code.make_var()
+            code.add(n.assign(extras_var, n.dict_()))
+        _convert_record_fields(
+            code, target, plan_call.fields, arg_var,
+            {p.name: n.name(var) for p, var in zip(params, arg_vars)},
+            extras_var, var_keyword or t.Any)
+        code.add_return(call(arg_vars, extras_var=extras_var))
+
+    with code.elif_(_is_list_or_tuple(arg_var)):
+        required = sum(1 for p in positional if p.required)
+        length = n.call('len', arg_var)
+        wrong_length: ast.expr
+        if var_positional is not None:
+            wrong_length = n.compare(length, '<', required)
+        else:
+            wrong_length = n.not_(n.compare(required, '<=', length, '<=',
+                                            len(positional)))
+        with code.if_(wrong_length):
+            _wrong_length(code, target_var_name, arg_var, len(positional))
+        arg_vars = [code.make_var() for _ in params]
+        with _container(code, arg_var):
+            for index, (p, var) in enumerate(zip(positional, arg_vars)):
+                element = n.subscript(arg_var, index)
+                if p.required:
+                    _convert_into(code, p.annotation, element, n.name(var))
+                    continue
+                with code.if_(n.compare(n.call('len', arg_var), '>', index)):
+                    _convert_into(code, p.annotation, element, n.name(var))
+                with code.else_():
+                    default_var = code.inject_closure_var(p.default)
+                    code.add(n.assign(var, n.name(default_var)))
+            for p, var in zip(keyword_only, arg_vars[len(positional):]):
+                if p.required:
+                    code.add(n.raise_(n.call(
+                        'TypeError',
+                        f'missing a required argument: {p.name!r}')))
+                    break
+                default_var = code.inject_closure_var(p.default)
+                code.add(n.assign(var, n.name(default_var)))
+            rest_var = None
+            if var_positional is not None:
+                rest_var = code.make_var()
+                rest = n.slice_from(arg_var, len(positional))
+                if var_positional.annotation == t.Any:
+                    code.add(n.assign(rest_var, rest))
+                else:
+                    code.add(n.assign(rest_var, n.list_()))
+                    element_var = code.make_var()
+                    with code.for_(n.name(element_var), rest):
+                        converted = _convert_into(
+                            code, var_positional.annotation,
+                            n.name(element_var))
+                        code.add(n.call_stmt(n.call(
+                            n.attr(n.name(rest_var), 'append'), converted)))
+        code.add_return(call(arg_vars, rest_var=rest_var))
+
+    with code.else_():
+        code.add(n.type_error(
+            'can\'t call ', n.name(target_var_name), ' with "', arg_var,
+            '" (type ', n.type_of(arg_var),
+            '); expected a dictionary or list.'))
 
 
 def _convert_dictionary_to_target(code: CodeGen,
                                   target: t.Any,
-                                  arg_var: str) -> None:
+                                  arg_var: ast.expr) -> None:
     # For now this is pretty simple
     # in the future it would be nice to make it more efficient in simple cases;
     kwargs_var = code.start_inline_func()
     convert_dictionary_to_kwargs(code, target, arg_var)
     code.end_inline_func()
+    _construct(code, target, kwargs_var)
+
+
+def _construct(code: CodeGen, target: t.Any, kwargs_var: ast.expr) -> None:
+    """Returns a new instance of target from the kwargs in `kwargs_var`.
+
+    Trusted classes are built with `object.__new__` and have their
+    attributes filled in directly; everything else is simply called.
+    """
     target_var_name = code.inject_closure_var(target)
-    code.add_return(f'{target_var_name}(**{kwargs_var})')
+    info = trusted.trusted_init(target, code.trusted_constructors)
+    if info is None:
+        code.add_return(n.call(target_var_name, double_star=kwargs_var))
+        return
+
+    new_var = code.inject_closure_var(object.__new__)
+    obj_var = code.make_var()
+    code.add(n.assign(obj_var, n.call(new_var, n.name(target_var_name))))
+    obj_dict = n.attr(n.name(obj_var), '__dict__')
+    if not info.slots and all(p == a for p, a in info.fields.items()):
+        # The kwargs are already keyed by attribute name.
+        if info.defaults:
+            defaults_var = code.inject_closure_var(info.defaults)
+            code.add(n.call_stmt(n.call(n.attr(obj_dict, 'update'),
+                                        n.name(defaults_var))))
+        code.add(n.call_stmt(n.call(n.attr(obj_dict, 'update'), kwargs_var)))
+    else:
+        for param, attr in info.fields.items():
+            value: ast.expr
+            if attr in info.defaults:
+                default_var = code.inject_closure_var(info.defaults[attr])
+                value = n.call(n.attr(kwargs_var, 'get'), param,
+                               n.name(default_var))
+            else:
+                value = n.subscript(kwargs_var, param)
+            if attr in info.slots:
+                setter_var = code.inject_closure_var(info.slots[attr].__set__)
+                code.add(n.call_stmt(n.call(setter_var, n.name(obj_var),
+                                            value)))
+            else:
+                code.add(n.assign(n.subscript(obj_dict, attr), value))
+    code.add_return(n.name(obj_var))
 
 
-def convert_list(code: CodeGen, target: t.Any, arg_var: str) -> None:
-    if not issubclass(target, list):
+def convert_list(code: CodeGen, target: t.Any, arg_var: ast.expr) -> None:
+    info = plan.plan(target)
+    if info.kind != plan.LIST:
         raise ValueError(f'"{target}" is not a subclass of list')
-    element_type = t.Any
-    type_args = getattr(target, '__args__', None)
-    if type_args:
-        if len(type_args) != 1:
-            raise NotImplemented(f'do not know how to convert type "{target}"')
-        element_type = type_args[0]
-
-    code.add_line('try:')
-    code.indent()  # START TRY    - this part is just a list comprehension in
-    result_var = code.make_var()  # dynamic.py lol
-    code.add_line(f'{result_var} = []')
-    element_var = code.make_var()
-    code.add_line(f'for {element_var} in {arg_var}:')
-    code.indent()  # START FOR
-    converted_element_var = code.start_inline_func()
-    convert_value(code, element_type, element_var)
-    code.end_inline_func()
-    code.add_line(f'{result_var}.append({converted_element_var})')
-    code.make_var()
-    code.dedent()  # END FOR
-    code.add_return(result_var)
-    code.dedent()  # END TRY BODY
+    element_type, = info.args
+
+    target_var_name = code.inject_closure_var(target)
+    with code.try_(), _container(code, arg_var, sized=False) as each_var:
+        # this part is just a list comprehension in dynamic.py
+        result_var = code.make_var()
+        code.add(n.assign(result_var, n.list_()))
+        element_var = code.make_var()
+        with code.for_(n.name(element_var), arg_var):
+            _spend_each(code, each_var)
+            converted = _convert_into(code, element_type, n.name(element_var))
+            code.add(n.call_stmt(n.call(n.attr(n.name(result_var), 'append'),
+                                        converted)))
+        code.add_return(n.name(result_var))
     te_var = code.make_var()
-    code.add_line(f'except TypeError as {te_var}:')
-    code.indent()
-    code.add_line(f'raise TypeError(f\'can\\\'t convert "{{{esq(arg_var)}}}" '
-                  f'(type {{type({esq(arg_var)})}}) '
-                  f'to {esq(target)}.\') from {te_var}')
+    with code.except_(_errors('TypeError'), te_var):
+        code.add(_cant_convert(arg_var, target_var_name, n.name(te_var)))
 
 
-def convert_dictionary(code: CodeGen, target: t.Any, arg_var: str) -> None:
+def convert_dictionary(code: CodeGen,
+                       target: t.Any,
+                       arg_var: ast.expr) -> None:
     """Writes code needed to convert a dictionary into the given type.
 
-    "target" is known at generation time while arg_var is just a string
-    representing the incoming argument value in the generated code.
+    "target" is known at generation time while arg_var is an expression
+    for the incoming argument value in the generated code.
     """
-    if not issubclass(target, dict):
+    info = plan.plan(target)
+    if info.kind != plan.DICT:
         raise ValueError(f'"{target}" is not a subclass of dict')
-    code.add_line(f'if not isinstance({arg_var}, dict):')
-    code.indent()
-    code.add_line(f'raise TypeError(f\'can\\\'t convert "{{{arg_var}}}" '
-                  f'(type {{type({arg_var})}}) to {esq(target)}\')')
-    code.dedent()
-
-    key_type, value_type = t.Any, t.Any
-    type_args = getattr(target, '__args__', None)
-    if type_args:
-        if len(type_args) != 2:
-            raise NotImplemented(f'do not know how to convert type "{target}"')
-        key_type, value_type = type_args
-
-    code.add_line('try:')
-    code.indent()  # BEGIN TRY BODY
-    result_var = code.make_var()
-    code.add_line(f'{result_var} = {{}}')
-    k_var = code.make_var()
-    v_var = code.make_var()
-    code.add_line(f'for {k_var}, {v_var} in {arg_var}.items():')
-    code.indent()  # BEGIN LOOP BODY
+    target_var_name = code.inject_closure_var(target)
+    with code.if_(n.not_(_is_dict(arg_var))):
+        code.add(n.type_error('can\'t convert "', arg_var, '" (type ',
+                              n.type_of(arg_var), ') to ',
+                              n.name(target_var_name)))
+
+    key_type, value_type = info.args
+
+    with code.try_(), _container(code, arg_var):
+        result_var = code.make_var()
+        code.add(n.assign(result_var, n.dict_()))
+        k_var = code.make_var()
+        v_var = code.make_var()
+        with code.for_(n.tuple_(n.name(k_var), n.name(v_var)),
+                       n.call(n.attr(arg_var, 'items'))):
+            new_k = _convert_into(code, key_type, n.name(k_var))
+            new_v = _convert_into(code, value_type, n.name(v_var))
+            code.add(n.assign(n.subscript(n.name(result_var), new_k), new_v))
+        code.add_return(n.name(result_var))
 
-    new_k_var = code.start_inline_func()
-    convert_value(code, key_type, k_var)
-    code.end_inline_func()
+    te_var = code.make_var()
+    with code.except_(_errors('TypeError'), te_var):
+        code.add(_cant_convert(arg_var, target_var_name, n.name(te_var)))
 
-    new_v_var = code.start_inline_func()
-    convert_value(code, value_type, v_var)
-    code.end_inline_func()
 
-    code.add_line(f'{result_var}[{new_k_var}] = {new_v_var}')
-    code.dedent()  # END FOR LOOP BODY
-    code.add_return(result_var)
-    code.dedent()  # END TRY BODY
+def convert_value(code: CodeGen, target: t.Any, arg_var: ast.expr) -> None:
+    """Writes code needed to convert "arg_var" to arbitrary type "target".
 
-    te_var = code.make_var()
-    code.add_line(f'except TypeError as {te_var}:')
-    code.indent()
-    code.add_line(f'raise TypeError(f\'can\\\'t convert "{{{arg_var}}}" '
-                  f'(type {{type({arg_var})}}) to {esq(target)}.\') '
-                  f'from {te_var}')
-    code.dedent()
+    "target" is known at generation time while arg_var is an expression
+    for the argument value.
+    """
+    if code.budget is not None:
+        max_depth = code.budget.max_depth
+        if max_depth is not None and code.depth > max_depth:
+            # Never reached, since the container this is within goes over
+            # budget first, but it stops generating recursive targets.
+            code.add(_over_budget(code, b.DEPTH))
+            return
+        if max_depth is None and target in code.converting:
+            raise ValueError(f'{target} is nested within itself, so a '
+                             'budget for it needs a max_depth.')
+    code.converting.append(target)
+    try:
+        if code.dedup and target != t.Any:
+            _convert_deduplicated(code, target, arg_var)
+        else:
+            _convert_value(code, target, arg_var)
+    finally:
+        code.converting.pop()
 
 
-def convert_value(code: CodeGen, target: t.Any, arg_var: str) -> None:
-    """Writes code needed to convert "arg_var" to arbitrary type "target".
+def _convert_deduplicated(code: CodeGen,
+                          target: t.Any,
+                          arg_var: ast.expr) -> None:
+    """Writes code converting "arg_var" unless it's in the memo already.
 
-    "target" is known at generation time while arg_var is just a string
-    representing the argument value.
+    Primitive values are looked up by equality, so equal strings share one
+    result. Anything else is looked up by identity. Values aren't always
+    kept alive by the caller's argument, as those yielded by a generator
+    aren't, so each is kept in the memo with its result to stop its id
+    being reused by a later value during the call.
     """
     target_var_name = code.inject_closure_var(target)
-    if target == t.Any:
+    by_value_var = code.inject_closure_var(DEDUP_BY_VALUE)
+    key_var = code.make_var()
+    type_var = code.make_var()
+    code.add(n.assign(type_var, n.type_of(arg_var)))
+    with code.if_(n.compare(n.name(type_var), 'in', n.name(by_value_var))):
+        code.add(n.assign(key_var, n.tuple_(n.name(target_var_name),
+                                            n.name(type_var), arg_var)))
+    with code.else_():
+        code.add(n.assign(key_var, n.tuple_(n.name(target_var_name),
+                                            n.call('id', arg_var))))
+    with code.if_(n.compare(n.name(key_var), 'in', n.name(MEMO))):
+        code.add_return(n.subscript(
+            n.subscript(n.name(MEMO), n.name(key_var)), 1))
+    with code.else_():
+        result = code.start_inline_func()
+        _convert_value(code, target, arg_var)
+        code.end_inline_func()
+        code.add(n.assign(n.subscript(n.name(MEMO), n.name(key_var)),
+                          n.tuple_(arg_var, result)))
+        code.add_return(result)
+
+
+def _convert_value(code: CodeGen, target: t.Any, arg_var: ast.expr) -> None:
+    p = plan.plan(target)
+    if p.kind == plan.ANY:
         code.add_return(arg_var)
         return
-    if inspect.isfunction(target):
-        st = getattr(target, '__supertype__', None)
-        if st:
-            # This is probably a new type?
-            return convert_value(code, st, arg_var)
-        # handle with the function calling code below:
-    elif issubclass(target, dict):
+    elif p.kind == plan.CONVERTER:
+        assert p.converter is not None
+        return convert_with(code, target, p.converter, arg_var)
+    elif p.kind == plan.ENUM:
+        return convert_enum(code, target, p.choices, arg_var)
+    elif p.kind == plan.LITERAL:
+        return convert_literal(code, target, p.choices, arg_var)
+    elif p.kind == plan.TYPED_DICT:
+        assert p.record is not None
+        return convert_typed_dict(code, target, p.record, arg_var)
+    elif p.kind == plan.NAMED_TUPLE:
+        assert p.record is not None
+        return convert_named_tuple(code, target, p.record, arg_var)
+    elif p.kind == plan.NEW_TYPE:
+        return _convert_value(code, p.args[0], arg_var)
+    elif p.kind == plan.UNION:
+        return convert_union(code, target, p.args, arg_var)
+    elif p.kind == plan.DICT:
         return convert_dictionary(code, target, arg_var)
-    elif issubclass(target, list):
+    elif p.kind == plan.LIST:
         return convert_list(code, target, arg_var)
 
-    if not inspect.isfunction(target):
-        code.add_line(f'if issubclass(type({arg_var}), {target_var_name}):')
-        code.indent()
-        code.add_return(arg_var)
-        code.dedent()
-        code.add_line('else:')
-        code.indent()
+    # Dataclasses are handled like any other class, but without calling
+    # `__init__` if trusted.
+    with contextlib.ExitStack() as stack:
+        if p.cls is not None:
+            cls_var = code.inject_closure_var(p.cls)
+            with code.if_(_is_type(arg_var, cls_var)):
+                if issubclass(p.cls, (str, bytes)):
+                    _spend(code, b.STRING_BYTES, n.call('len', arg_var))
+                code.add_return(arg_var)
+            stack.enter_context(code.else_())
+        # Otherwise it's a function or other callable.
+        _convert_by_calling(code, target, p.call, arg_var)
+
+
+def _instance_members(code: CodeGen,
+                      members: t.Tuple[t.Any, ...],
+                      arg_var: ast.expr) -> t.Iterator[t.Any]:
+    """Opens `if`, then `elif`, blocks for each member of a union which
+    takes values of some type as they are, yielding that member inside its
+    block, like `introspect.instance_member`. Ends in an open `else`.
+    """
+    first = True
+    for member in members:
+        info = introspect.describe(member)
+        if info.kind != introspect.CLASS or info.cls is None:
+            continue
+        cls_var = code.inject_closure_var(info.cls)
+        test = _is_type(arg_var, cls_var)
+        with code.if_(test) if first else code.elif_(test):
+            yield member
+        first = False
+    if first:
+        yield None
+        return
+    with code.else_():
+        yield None
 
-    # At this point, see if calling target and passing value as the first
-    # argument will work.
-    try:
-        sig = inspect.signature(target)
-    except ValueError:
-        code.add_line(
-            f"""raise TypeError(f'can\\'t convert "{{{arg_var}}}" """
-            f"""(type {{type({arg_var})}}) to {{{target_var_name}}}.')""")
+
+def convert_union(code: CodeGen,
+                  target: t.Any,
+                  members: t.Tuple[t.Any, ...],
+                  arg_var: ast.expr) -> None:
+    """Writes code converting to a union like `dynamic._resolve_union`.
+
+    A member taking the value as it is is used if there is one. Otherwise
+    each member is tried in turn, until one converts the value.
+    """
+    target_var_name = code.inject_closure_var(target)
+
+    def try_members(remaining: t.Tuple[t.Any, ...]) -> None:
+        if not remaining:
+            code.add(_cant_convert(arg_var, target_var_name))
+            return
+        with code.try_():
+            code.add_return(_convert_into(code, remaining[0], arg_var))
+        with code.except_(_errors('TypeError')):
+            try_members(remaining[1:])
+
+    for member in _instance_members(code, members, arg_var):
+        if member is not None:
+            code.add_return(_convert_into(code, member, arg_var))
+        else:
+            try_members(members)
+
+
+def _convert_by_calling(code: CodeGen,
+                        target: t.Any,
+                        call: t.Optional[plan.Call],
+                        arg_var: ast.expr) -> None:
+    """Writes code calling `target` to convert `arg_var`.
+
+    Dictionaries are passed as keyword arguments, anything else as the sole
+    argument.
+    """
+    target_var_name = code.inject_closure_var(target)
+    if call is None:
+        code.add(_cant_convert(arg_var, target_var_name))
         return
 
     # If the incoming value is a dictionary, we don't attempt to pass it in
     # as the single argument even if that's what the parameter list accepts.
     # Doing so would make things too confusing (what to do in the event of
     # variable keyword arguments?).
-    code.add_line(f'if isinstance({arg_var}, dict):')
-    code.indent()
-    _convert_dictionary_to_target(code, target, arg_var)
-    code.dedent()
-    code.add_line('else:')
-    code.indent()
-
-    params = [param
-              for param in sig.parameters.values()
-              if param.kind not in [inspect.Parameter.VAR_POSITIONAL,
-                                    inspect.Parameter.VAR_KEYWORD]]
+    with code.if_(_is_dict(arg_var)):
+        _convert_branch(code, 'dict branch', _convert_dictionary_to_target,
+                        target, arg_var)
+    with code.else_():
+        if len(call.fields.fields) == 1 and call.sole != t.Any:
+            _convert_branch(code, 'sole branch', _convert_sole_argument,
+                            target, arg_var)
+        else:
+            _convert_sole_argument(code, target, arg_var)
+
+
+def _convert_branch(code: CodeGen,
+                    kind: str,
+                    generate: Generate,
+                    target: t.Any,
+                    arg_var: ast.expr) -> None:
+    """Writes what `generate` does, or with `lazy` a call to a `Stub`
+    compiling it when first taken."""
+    compile_branch = code.compile_branch
+    if not code.lazy or compile_branch is None or code.budget is not None:
+        generate(code, target, arg_var)
+        return
+    stub = Stub(lambda: compile_branch(kind, generate, target))
+    stub_var = code.inject_closure_var(stub)
+    args = [arg_var, n.name(MEMO)] if code.dedup else [arg_var]
+    code.add_return(n.call(n.attr(n.name(stub_var), 'convert'), *args))
+
+
+def _convert_sole_argument(code: CodeGen,
+                           target: t.Any,
+                           arg_var: ast.expr) -> None:
+    target_var_name = code.inject_closure_var(target)
+    call = plan.call(target)
+    params = call.fields.fields
     if len(params) < 1:
-        code.add_line(f"""raise TypeError(f'{esq(target)} does not accept """
-                      """any parameters, cannot convert from value """
-                      f"""{{{arg_var}}}.')""")
+        code.add(n.type_error(n.name(target_var_name),
+                              ' does not accept any parameters, cannot '
+                              'convert from value ', arg_var, '.'))
         return
     elif len(params) > 1:
-        code.add_line(f"""raise TypeError(f'{esq(target)} accepts """
-                      f"""{len(params)} parameters, cannot create from value"""
-                      f""" "{{{arg_var}}}".')""")
+        code.add(n.type_error(n.name(target_var_name),
+                              f' accepts {len(params)} parameters, cannot '
+                              'create from value "', arg_var, '".'))
+        return
+    if call.sole == t.Any:
+        return_value = arg_var
+    else:
+        with code.try_():
+            return_value = _convert_into(code, call.sole, arg_var)
+        var_name = code.make_var()
+        with code.except_(_errors('TypeError'), var_name):
+            annotation_var = code.inject_closure_var(call.sole)
+            code.add(n.type_error(
+                'sole argument to ', n.name(target_var_name),
+                ' accepts type ', n.name(annotation_var),
+                '; cannot be satisified with value ', arg_var, '.',
+                cause=n.name(var_name)))
+    if trusted.trusted_init(target, code.trusted_constructors):
+        kwargs_var = code.make_var()
+        code.add(n.assign(kwargs_var,
+                          n.dict_([(params[0].name, return_value)])))
+        _construct(code, target, n.name(kwargs_var))
+    else:
+        code.add_return(n.call(target_var_name, return_value))
+
+
+def validate(code: CodeGen, target: t.Any, arg_var: ast.expr) -> None:
+    """Writes code returning the `validation.Problem`s which would stop
+    "arg_var" converting to "target", without converting it."""
+    code.add(n.assign(PROBLEMS, n.list_()))
+    validate_value(code, target, arg_var, ())
+    code.add(n.return_(n.name(PROBLEMS)))
+
+
+def _add_problem(code: CodeGen,
+                 make: t.Callable[..., validation.Problem],
+                 path: Path,
+                 *args: n.Value) -> None:
+    """Writes code appending `make(path, *args)` to the problems."""
+    make_var = code.inject_closure_var(make)
+    code.add(n.call_stmt(n.call(n.attr(n.name(PROBLEMS), 'append'),
+                                n.call(make_var, n.tuple_(*path), *args))))
+
+
+def _wrong_type(code: CodeGen,
+                target: t.Any,
+                arg_var: ast.expr,
+                path: Path) -> None:
+    target_var_name = code.inject_closure_var(target)
+    _add_problem(code, validation.wrong_type, path, n.name(target_var_name),
+                 arg_var)
+
+
+def validate_value(code: CodeGen,
+                   target: t.Any,
+                   arg_var: ast.expr,
+                   path: Path) -> None:
+    """Writes code adding whatever would stop "arg_var" converting to
+    "target" to the problems, following the same rules as `convert_value`.
+    """
+    if target in code.validating and code.link_validator is not None:
+        # Generating it inline again would never end.
+        _validate_linked(code, code.link_validator(target), arg_var, path)
         return
-    param = params[0]
-    if param.annotation:
-        if param.annotation != target:  # avoid infinitie recursion
-            code.add_line('try:')
-            code.indent()
-            return_value = code.start_inline_func()
-            convert_value(code, param.annotation, arg_var)
-            code.end_inline_func()
-            code.dedent()
-            var_name = code.make_var()
-            code.add_line(f'except TypeError as {var_name}:')
-            code.indent()
-            code.add_line(f"""raise TypeError(f'sole argument to {esq(target)} accepts type {esq(param.annotation)}; cannot be satisified with value {{{arg_var}}}.') from {var_name}""")  # NOQA
-            code.dedent()
-            code.add_return(f'{target_var_name}({return_value})')
+    code.validating.append(target)
+    try:
+        _validate_value(code, target, arg_var, path)
+    finally:
+        code.validating.pop()
+
+
+def _validate_linked(code: CodeGen,
+                     validator: t.Union[None, t.Callable[[t.Any], t.Any],
+                                        Stub],
+                     arg_var: ast.expr,
+                     path: Path) -> None:
+    """Writes code adding the problems a compiled validator finds, under
+    `path`."""
+    validator_var: ast.expr = n.name(code.inject_closure_var(validator))
+    if isinstance(validator, Stub):
+        validator_var = n.attr(validator_var, 'convert')
+    within_var = code.inject_closure_var(validation.within)
+    code.add(n.call_stmt(n.call(
+        n.attr(n.name(PROBLEMS), 'extend'),
+        n.call(within_var, n.tuple_(*path), n.call(validator_var, arg_var)))))
+
+
+def _validate_value(code: CodeGen,
+                    target: t.Any,
+                    arg_var: ast.expr,
+                    path: Path) -> None:
+    p = plan.plan(target)
+    if p.kind == plan.ANY:
+        return
+    elif p.kind in (plan.CONVERTER, plan.ENUM, plan.LITERAL):
+        # These are checked by converting, which for enums and literals
+        # only looks the value up.
+        with code.try_():
+            _convert_into(code, target, arg_var)
+        with code.except_(_errors('TypeError')):
+            _wrong_type(code, target, arg_var, path)
+        return
+    elif p.kind == plan.TYPED_DICT:
+        assert p.record is not None
+        with code.if_(n.not_(_is_dict(arg_var))):
+            _wrong_type(code, target, arg_var, path)
+        with code.else_():
+            _validate_fields(code, target, p.record, None, arg_var, path)
+        return
+    elif p.kind == plan.NEW_TYPE:
+        return validate_value(code, p.args[0], arg_var, path)
+    elif p.kind == plan.UNION:
+        return _validate_union(code, target, p.args, arg_var, path)
+    elif p.kind == plan.DICT:
+        return _validate_dictionary(code, target, arg_var, path)
+    elif p.kind == plan.LIST:
+        return _validate_list(code, target, arg_var, path)
+    elif p.cls is None:
+        return _validate_by_calling(code, target, p, arg_var, path)
+
+    cls_var = code.inject_closure_var(p.cls)
+    with code.if_(n.not_(_is_type(arg_var, cls_var))):
+        _validate_by_calling(code, target, p, arg_var, path)
+
+
+def _validate_union(code: CodeGen,
+                    target: t.Any,
+                    members: t.Tuple[t.Any, ...],
+                    arg_var: ast.expr,
+                    path: Path) -> None:
+    """Writes code checking a union, which is valid if any member is."""
+    start_var = code.make_var()
+
+    def try_members(remaining: t.Tuple[t.Any, ...]) -> None:
+        if not remaining:
+            _wrong_type(code, target, arg_var, path)
+            return
+        validate_value(code, remaining[0], arg_var, path)
+        with code.if_(n.compare(n.call('len', n.name(PROBLEMS)), '>',
+                                n.name(start_var))):
+            code.add(n.assign(n.slice_from(n.name(PROBLEMS),
+                                           n.name(start_var)), n.list_()))
+            try_members(remaining[1:])
+
+    for member in _instance_members(code, members, arg_var):
+        if member is not None:
+            validate_value(code, member, arg_var, path)
+        else:
+            code.add(n.assign(start_var, n.call('len', n.name(PROBLEMS))))
+            try_members(members)
+
+
+def _validate_fields(code: CodeGen,
+                     target: t.Any,
+                     record: records.Record,
+                     extras: t.Any,
+                     arg_var: ast.expr,
+                     path: Path) -> None:
+    """Writes code checking the fields of a record in a dictionary.
+
+    `extras` is the annotation of keys which aren't fields, or None if they
+    aren't accepted.
+    """
+    def validate_field(annotation: t.Any, key: ast.expr, path: Path) -> None:
+        field_var = code.make_var()
+        code.add(n.assign(field_var, n.subscript(arg_var, key)))
+        validate_value(code, annotation, n.name(field_var), path)
+
+    for f in record.fields:
+        field_path = path + (n.expr(f.name),)
+        if f.required:
+            with code.if_(n.compare(f.name, 'not in', arg_var)):
+                _add_problem(code, validation.missing, field_path)
+            if f.annotation != t.Any:
+                with code.else_():
+                    validate_field(f.annotation, n.expr(f.name), field_path)
+        elif f.annotation != t.Any:
+            with code.if_(n.compare(f.name, 'in', arg_var)):
+                validate_field(f.annotation, n.expr(f.name), field_path)
+
+    if extras == t.Any:
+        return
+    names_var = code.inject_closure_var(record.names)
+    key = n.name(code.make_var())
+    key_path = path + (key,)
+    with code.for_(key, arg_var):
+        with code.if_(n.compare(key, 'not in', n.name(names_var))):
+            if extras is None:
+                target_var_name = code.inject_closure_var(target)
+                _add_problem(code, validation.not_accepted, key_path,
+                             n.name(target_var_name))
+            else:
+                validate_field(extras, key, key_path)
+
+
+def _validate_elements(code: CodeGen,
+                       target: t.Any,
+                       record: records.Record,
+                       arg_var: ast.expr,
+                       path: Path) -> None:
+    """Writes code checking a list or tuple against a NamedTuple's fields."""
+    target_var_name = code.inject_closure_var(target)
+    required = sum(1 for f in record.fields if f.required)
+    with code.if_(n.not_(n.compare(required, '<=', n.call('len', arg_var),
+                                   '<=', len(record.fields)))):
+        _add_problem(code, validation.wrong_length, path,
+                     n.name(target_var_name), len(record.fields), arg_var)
+    with code.else_():
+        for index, f in enumerate(record.fields):
+            if f.annotation == t.Any:
+                continue
+            element = n.subscript(arg_var, index)
+            element_path = path + (n.expr(index),)
+            if f.required:
+                validate_value(code, f.annotation, element, element_path)
+                continue
+            with code.if_(n.compare(n.call('len', arg_var), '>', index)):
+                validate_value(code, f.annotation, element, element_path)
+
+
+def _validate_dictionary(code: CodeGen,
+                         target: t.Any,
+                         arg_var: ast.expr,
+                         path: Path) -> None:
+    key_type, value_type = plan.plan(target).args
+    with code.if_(n.not_(_is_dict(arg_var))):
+        _wrong_type(code, target, arg_var, path)
+    if key_type == t.Any and value_type == t.Any:
+        return
+    with code.else_():
+        k_var = code.make_var()
+        v_var = code.make_var()
+        item_path = path + (n.name(k_var),)
+        with code.for_(n.tuple_(n.name(k_var), n.name(v_var)),
+                       n.call(n.attr(arg_var, 'items'))):
+            validate_value(code, key_type, n.name(k_var), item_path)
+            validate_value(code, value_type, n.name(v_var), item_path)
+
+
+def _validate_list(code: CodeGen,
+                   target: t.Any,
+                   arg_var: ast.expr,
+                   path: Path) -> None:
+    element_type, = plan.plan(target).args
+    iterable_var = code.inject_closure_var(collections.abc.Iterable)
+    with code.if_(n.not_(n.call('isinstance', arg_var,
+                                n.name(iterable_var)))):
+        _wrong_type(code, target, arg_var, path)
+    if element_type == t.Any:
+        return
+    with code.else_():
+        index_var = code.make_var()
+        element_var = code.make_var()
+        with code.for_(n.tuple_(n.name(index_var), n.name(element_var)),
+                       n.call('enumerate', arg_var)):
+            validate_value(code, element_type, n.name(element_var),
+                           path + (n.name(index_var),))
+
+
+def _validate_by_calling(code: CodeGen,
+                         target: t.Any,
+                         p: plan.Plan,
+                         arg_var: ast.expr,
+                         path: Path) -> None:
+    """Writes code checking what `_convert_by_calling` would pass to
+    `target`: a dictionary as keyword arguments, or else the sole argument.
+    """
+    if p.kind == plan.NAMED_TUPLE and p.record is not None:
+        with code.if_(_is_dict(arg_var)):
+            _validate_fields(code, target, p.record, None, arg_var, path)
+        with code.elif_(_is_list_or_tuple(arg_var)):
+            _validate_elements(code, target, p.record, arg_var, path)
+        with code.else_():
+            _wrong_type(code, target, arg_var, path)
+        return
+
+    call = p.call
+    if call is None:
+        _wrong_type(code, target, arg_var, path)
+        return
+    with code.if_(_is_dict(arg_var)):
+        if p.record is not None:
+            _validate_fields(code, target, p.record, None, arg_var, path)
+        else:
+            _validate_fields(code, target, call.fields, call.extras, arg_var,
+                             path)
+    with code.else_():
+        if len(call.fields.fields) != 1:
+            _wrong_type(code, target, arg_var, path)
+        elif call.sole != t.Any:
+            validate_value(code, call.sole, arg_var, path)
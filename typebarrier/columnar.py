@@ -0,0 +1,214 @@
+"""
+Converts columnar input, such as `{"id": [...], "size": [...]}`, to rows.
+
+Zipping columns back into a dictionary per row and converting those builds
+a dictionary for every row only to throw it away. `convert_rows` instead
+checks each column once against the annotation of its field, looking only
+at the set of types in the column, and then builds each row straight from
+the columns, passing them positionally where it can. Columns which fail
+the check are converted element by element with the compiled converter
+for their annotation.
+
+`convert_columns` stops short of building rows and returns the converted
+columns, optionally as `array.array`s for integer and float columns.
+"""
+import array
+import collections.abc
+import itertools
+import typing as t
+
+from . import inline
+from . import introspect
+from . import plan
+from . import records
+
+
+# The typecodes of `array.array`s for columns of these types.
+ARRAY_TYPECODES = {int: 'q', float: 'd'}
+
+
+class _Layout(t.NamedTuple):
+    """How a row is built from columns."""
+
+    # The fields matched with columns, in the order the target takes them.
+    fields: t.Tuple[records.Field, ...]
+    # How many of `fields` can be passed positionally.
+    positional: int
+    # The annotation of columns which aren't fields, or None if there can't
+    # be any.
+    extras: t.Any
+
+
+def _row_type(target: t.Any) -> t.Any:
+    """Returns the row type for a target like `List[Volume]`, which is also
+    accepted."""
+    p = plan.plan(target)
+    if p.kind == plan.LIST:
+        return p.args[0]
+    return target
+
+
+def _layout(target: t.Any) -> _Layout:
+    p = plan.plan(target)
+    if p.kind in (plan.TYPED_DICT, plan.NAMED_TUPLE) and p.record is not None:
+        return _Layout(p.record.fields, len(p.record.fields), None)
+    if p.kind in (plan.INSTANCE, plan.CALL) and p.call is not None:
+        return _Layout(p.call.fields.fields, p.call.positional,
+                       p.call.extras)
+    raise TypeError(f'can\'t convert columns to {target}.')
+
+
+def _kept(annotation: t.Any, value_type: type) -> bool:
+    """Returns True if values of `value_type` convert to `annotation` as
+    they are."""
+    p = plan.plan(annotation)
+    if p.kind == plan.ANY:
+        return True
+    elif p.kind == plan.NEW_TYPE:
+        return _kept(p.args[0], value_type)
+    elif p.kind == plan.UNION:
+        member = introspect.instance_member(p.args, value_type)
+        return member is not None and _kept(member, value_type)
+    return (p.kind == plan.INSTANCE and p.cls is not None
+            and issubclass(value_type, p.cls))
+
+
+def _convert_column(target: t.Any,
+                    name: str,
+                    annotation: t.Any,
+                    column: t.Sequence[t.Any]) -> t.Sequence[t.Any]:
+    """Converts a column to `annotation`, returning it as it is if every
+    value is kept as it is."""
+    value_types = set(map(type, column))
+    if all(_kept(annotation, value_type) for value_type in value_types):
+        return column
+    convert = inline.convert_value(annotation)
+    result = []
+    for index, value in enumerate(column):
+        try:
+            result.append(convert(value))
+        except TypeError as te:
+            raise TypeError(f'problem converting row {index} of column '
+                            f'"{name}" for {target}: {te}') from te
+    return result
+
+
+def _is_column(value: t.Any) -> bool:
+    return (isinstance(value, collections.abc.Sequence)
+            and not isinstance(value, (str, bytes)))
+
+
+def _checked_columns(target: t.Any,
+                     layout: _Layout,
+                     value: t.Any) -> t.Tuple[t.Dict[str, t.Sequence], int]:
+    """Checks `value` has a column for each required field, all of the
+    same length, and converts them. Returns the columns and their length.
+    """
+    if not isinstance(value, dict):
+        raise TypeError(f'can\'t convert "{value}" (type {type(value)}) '
+                        f'to columns of {target}.')
+    names = frozenset(f.name for f in layout.fields)
+    extra_keys = [k for k in value if k not in names]
+    if extra_keys and layout.extras is None:
+        raise TypeError('the following parameters not accepted for '
+                        f'"{target}" : {extra_keys}')
+    for f in layout.fields:
+        if f.required and f.name not in value:
+            raise TypeError(f'missing a required argument: {f.name}')
+    not_columns = [k for k, column in value.items() if not _is_column(column)]
+    if not_columns:
+        raise TypeError(f'expected a list for each column of {target}; '
+                        f'these aren\'t: {not_columns}')
+    lengths = {k: len(column) for k, column in value.items()}
+    if len(set(lengths.values())) > 1:
+        raise TypeError(f'columns for {target} have different lengths: '
+                        f'{lengths}')
+
+    annotations = {f.name: f.annotation for f in layout.fields}
+    columns = {k: _convert_column(target, k,
+                                  annotations.get(k, layout.extras), column)
+               for k, column in value.items()}
+    return columns, next(iter(lengths.values()), 0)
+
+
+def convert_columns(target: t.Any,
+                    value: t.Dict[str, t.Sequence[t.Any]],
+                    arrays: bool = False) -> t.Dict[str, t.Sequence[t.Any]]:
+    """Converts each column of `value` to the annotation of the field of
+    `target` it's for, without building any rows. Columns needing no
+    conversion are returned as they are, not copied.
+
+    Raises TypeError like `dynamic.convert_value` would for a row, or if
+    the columns differ in length. If `arrays` is set, columns of integers
+    or floats are returned as `array.array`s, unless an integer doesn't fit
+    in 64 bits.
+    """
+    target = _row_type(target)
+    layout = _layout(target)
+    columns, _ = _checked_columns(target, layout, value)
+    if not arrays:
+        return columns
+
+    annotations = {f.name: f.annotation for f in layout.fields}
+    for name, column in columns.items():
+        p = plan.plan(annotations.get(name, layout.extras))
+        while p.kind == plan.NEW_TYPE:
+            p = plan.plan(p.args[0])
+        if p.kind != plan.INSTANCE or p.cls not in ARRAY_TYPECODES:
+            continue
+        typecode = ARRAY_TYPECODES[p.cls]
+        try:
+            columns[name] = array.array(typecode, column)
+        except OverflowError:
+            pass  # Integers too big for 64 bits stay in a list.
+    return columns
+
+
+def convert_rows(target: t.Any,
+                 value: t.Dict[str, t.Sequence[t.Any]]) -> t.List[t.Any]:
+    """Converts columns to a list of `target`, or of its elements if it's a
+    list type like `List[Volume]`.
+
+    Each row is built from the columns directly, without a dictionary per
+    row unless it has keyword-only fields or extra keys. Raises TypeError
+    like `dynamic.convert_value` would for a row, or if the columns differ
+    in length.
+    """
+    target = _row_type(target)
+    layout = _layout(target)
+    columns, length = _checked_columns(target, layout, value)
+    if not columns:
+        return []
+
+    p = plan.plan(target)
+    if p.kind == plan.TYPED_DICT:
+        names = list(columns)
+        return [dict(zip(names, row)) for row in zip(*columns.values())]
+
+    # Positional fields up to the last one given, with the defaults of any
+    # missing before it.
+    given = [i for i, f in enumerate(layout.fields[:layout.positional])
+             if f.name in columns]
+    count = given[-1] + 1 if given else 0
+    positional = [columns[f.name] if f.name in columns
+                  else itertools.repeat(f.default, length)
+                  for f in layout.fields[:count]]
+    passed = {f.name for f in layout.fields[:count]}
+    keyword_names = [k for k in columns if k not in passed]
+
+    if p.kind == plan.NAMED_TUPLE and p.record is not None:
+        defaults = tuple(f.default for f in layout.fields[count:])
+        if p.record.fast_new:
+            new = tuple.__new__
+            return [new(target, row + defaults)
+                    for row in zip(*positional)]
+        return [target(*row, *defaults) for row in zip(*positional)]
+
+    if not keyword_names:
+        return list(map(target, *positional))
+    rows: t.Iterable[t.Tuple[t.Any, ...]] = itertools.repeat((), length)
+    if positional:
+        rows = zip(*positional)
+    keywords = [columns[k] for k in keyword_names]
+    return [target(*args, **dict(zip(keyword_names, kwargs)))
+            for args, kwargs in zip(rows, zip(*keywords))]
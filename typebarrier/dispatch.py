@@ -0,0 +1,63 @@
+"""
+Routes RPC style messages to one of many annotated handler functions.
+
+A message looks like `{"method": "create_volume", "params": {...}}`, where
+the params are a dictionary of keyword arguments or a list of positional
+ones. Each handler gets a converter compiled by `inline.compile_call`, but
+only the first time its method is called, so building a dispatcher for
+hundreds of handlers costs almost nothing up front.
+"""
+import typing as t
+
+from . import inline
+
+
+class Dispatcher:
+    """Calls the handler named in a message with its converted params.
+
+    Any options are passed to `inline.compile_call` for each handler.
+    """
+
+    def __init__(self,
+                 handlers: t.Mapping[str, t.Callable],
+                 method_key: str = 'method',
+                 params_key: str = 'params',
+                 **options: t.Any) -> None:
+        self._handlers = dict(handlers)
+        self._method_key = method_key
+        self._params_key = params_key
+        self._options = options
+        # Compiled calls by method name. Like inline's cache this is read
+        # without locking; compile_call already makes sure each handler is
+        # compiled once.
+        self._calls: t.Dict[str, inline.Converter] = {}
+
+    def _compile(self, method: str) -> inline.Converter:
+        try:
+            handler = self._handlers[method]
+        except (KeyError, TypeError):
+            raise LookupError(f'no handler for method "{method}"') from None
+        call = inline.compile_call(handler, **self._options)
+        self._calls[method] = call
+        return call
+
+    def call(self, method: str, params: t.Any) -> t.Any:
+        """Calls the handler for `method` with `params` converted."""
+        try:
+            call = self._calls[method]
+        except (KeyError, TypeError):
+            call = self._compile(method)
+        return call(params)
+
+    def __call__(self, message: t.Any) -> t.Any:
+        """Calls the handler named in a message.
+
+        Messages without params call the handler with no arguments.
+        """
+        try:
+            method = message[self._method_key]
+        except (KeyError, TypeError):
+            raise TypeError(f'can\'t dispatch "{message}" (type '
+                            f'{type(message)}); expected a dictionary with a '
+                            f'"{self._method_key}" key.') from None
+        return self.call(method, message.get(self._params_key, ()))
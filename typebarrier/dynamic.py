@@ -4,94 +4,76 @@ Dynamically converts JSON-like arguments to the given types.
 This also serves as the reference behavior for the other modules, which in
 theory should be faster.
 """
-import inspect
+import collections.abc
 import typing as t
 
+from . import budget
+from . import choices
+from . import introspect
+from . import plan
+from . import records
+from . import registry
+from . import validation
+
 
 TwDict = t.Dict[str, t.Any]
 
 
 def convert_dictionary_to_kwargs(target: t.Any, value: dict) -> t.Any:
-    """Go from list to a kwargs dictionary."""
-    sig = inspect.signature(target)
+    """Go from a dictionary to a kwargs dictionary."""
+    call = plan.call(target)
     result = {}
-    var_keyword_param: t.Optional[inspect.Parameter] = None
-
-    for p in sig.parameters.values():
-        if p.kind == inspect.Parameter.VAR_KEYWORD:
-            assert var_keyword_param is None
-            var_keyword_param = p
-        elif p.kind == inspect.Parameter.VAR_POSITIONAL:
-            pass  # Can't do anything, just ignore
-        else:
-            if p.name not in value:
-                if p.default == p.empty:
-                    raise TypeError(f'missing a required argument: {p.name}')
-                # Otherwise just let the default arg do its thang
-            else:
-                result[p.name] = convert_value(p.annotation, value[p.name])
-
-    extra_dict_keys = set(value.keys()).difference(
-        set(sig.parameters.keys()))
-    if extra_dict_keys:
-        if var_keyword_param:
-            if var_keyword_param.annotation != inspect.Parameter.empty:
-                for key in extra_dict_keys:
-                    try:
-                        result[key] = convert_value(
-                            var_keyword_param.annotation, value[key])
-                    except TypeError as te:
-                        raise TypeError(f'problem converting argument "{key}" '
-                                        'to annotated variable keyword arg '
-                                        f'type {var_keyword_param.annotation} '
-                                        f'found in {target}.')
-            else:
-                for key in extra_dict_keys:
-                    result[key] = value[key]
-        else:
-            raise TypeError('the following parameters not accepted for '
-                            f'"{target}" : {list(extra_dict_keys)}')
+    for f in call.fields.fields:
+        if f.name in value:
+            result[f.name] = convert_value(f.annotation, value[f.name])
+        elif f.required:
+            raise TypeError(f'missing a required argument: {f.name}')
+    if len(result) == len(value):
+        return result
+
+    names = call.fields.names
+    extra_dict_keys = [k for k in value if k not in names]
+    if call.extras is None:
+        raise TypeError('the following parameters not accepted for '
+                        f'"{target}" : {extra_dict_keys}')
+    spending = budget.spending.get()
+    if spending is not None:
+        spending.spend_extra_keys(len(extra_dict_keys))
+    for key in extra_dict_keys:
+        try:
+            result[key] = convert_value(call.extras, value[key])
+        except TypeError as te:
+            raise TypeError(f'problem converting argument "{key}" '
+                            'to annotated variable keyword arg '
+                            f'type {call.extras} found in {target}.')
     return result
 
 
 def convert_list_to_kwargs(target: t.Any, value: t.List) -> t.Any:
     """Go from list to a kwargs dictionary."""
-    sig = inspect.signature(target)
+    call = plan.call(target)
     result = {}
-    var_positional_param: t.Optional[t.Tuple[inspect.Parameter, int]] = None
-
-    for index, p in enumerate(sig.parameters.values()):
-        if p.kind == inspect.Parameter.VAR_KEYWORD:
-            pass  # Can't do anything, just ignore
-        elif p.kind == inspect.Parameter.VAR_POSITIONAL:
-            assert var_positional_param is None
-            var_positional_param = p, index
-        else:
-            if len(value) <= index:
-                if p.default == inspect.Parameter.empty:
-                    raise TypeError(f'missing a positional argument: {index}')
-            else:
-                result[p.name] = convert_value(p.annotation, value[index])
-
-    if var_positional_param:
-        param, index = var_positional_param
-
-        if param.annotation != inspect.Parameter.empty:
-            var_arg = []
-            for index, element in enumerate(value[index:]):
-                try:
-                    var_arg.append(convert_value(param.annotation, element))
-                except TypeError as te:
-                    raise TypeError(f'problem converting element {index} in a '
-                                    f'list of args for {target} variable '
-                                    f'length args: {te}')
+    for index, f in enumerate(call.fields.fields[:call.positional]):
+        if len(value) <= index:
+            if f.required:
+                raise TypeError(f'missing a positional argument: {index}')
         else:
-            var_arg = value[index:]
-        result[param.name] = var_arg
-    else:
-        if len(value) > len(result):
-            raise TypeError(f'{target} takes {len(result)} positional '
-                            f'argument(s) but {len(value)} were given')
+            result[f.name] = convert_value(f.annotation, value[index])
+
+    if call.var_positional is not None:
+        var_arg = []
+        for index, element in enumerate(value[call.positional:]):
+            try:
+                var_arg.append(
+                    convert_value(call.var_positional.annotation, element))
+            except TypeError as te:
+                raise TypeError(f'problem converting element {index} in a '
+                                f'list of args for {target} variable '
+                                f'length args: {te}')
+        result[call.var_positional.name] = var_arg
+    elif len(value) > len(result):
+        raise TypeError(f'{target} takes {len(result)} positional '
+                        f'argument(s) but {len(value)} were given')
     return result
 
 
@@ -99,14 +81,10 @@ T = t.TypeVar('T')
 
 
 def convert_list(target: type, value: t.List) -> t.List[T]:
-    if not issubclass(target, list):
+    info = plan.plan(target)
+    if info.kind != plan.LIST:
         raise ValueError(f'"{target}" is not a subclass of list')
-    element_type = t.Any
-    type_args = getattr(target, '__args__', None)
-    if type_args:
-        if len(type_args) != 1:
-            raise NotImplemented(f'do not know how to convert type "{target}"')
-        element_type = type_args[0]
+    element_type, = info.args
     try:
         return [convert_value(element_type, e) for e in value]
     except TypeError as te:
@@ -115,17 +93,13 @@ def convert_list(target: type, value: t.List) -> t.List[T]:
 
 
 def convert_dictionary(target: t.Any, value: t.Dict) -> t.Any:
-    if not issubclass(target, dict):
+    info = plan.plan(target)
+    if info.kind != plan.DICT:
         raise ValueError(f'"{target}" is not a subclass of dict')
     if not isinstance(value, dict):
         raise TypeError(f'can\'t convert "{value}" '
                         f'(type {type(value)}) to {target}')
-    key_type, value_type = t.Any, t.Any
-    type_args = getattr(target, '__args__', None)
-    if type_args:
-        if len(type_args) != 2:
-            raise NotImplemented(f'do not know how to convert type "{target}"')
-        key_type, value_type = type_args
+    key_type, value_type = info.args
     try:
         return {convert_value(key_type, k): convert_value(value_type, v)
                 for k, v in value.items()}
@@ -134,6 +108,269 @@ def convert_dictionary(target: t.Any, value: t.Dict) -> t.Any:
                         f'to {target}.') from te
 
 
+def convert_record_fields(target: t.Any,
+                          record: records.Record,
+                          value: t.Any) -> t.Dict[str, t.Any]:
+    """Converts a dictionary to the fields of a record type like a dataclass.
+
+    Returns a dictionary of converted field values.
+    """
+    if not isinstance(value, dict):
+        raise TypeError(f'can\'t convert "{value}" (type {type(value)}) '
+                        f'to {target}.')
+    result = {}
+    for f in record.fields:
+        if f.name in value:
+            result[f.name] = convert_value(f.annotation, value[f.name])
+        elif f.required:
+            raise TypeError(f'missing a required argument: \'{f.name}\'')
+    if len(result) != len(value):
+        extra_keys = [k for k in value if k not in record.names]
+        raise TypeError('the following parameters not accepted for '
+                        f'"{target}" : {extra_keys}')
+    return result
+
+
+def convert_list_to_named_tuple(target: t.Any,
+                                record: records.Record,
+                                value: t.Union[list, tuple]) -> t.Any:
+    """Converts each element of a list to the field at the same position."""
+    required = sum(1 for f in record.fields if f.required)
+    if not required <= len(value) <= len(record.fields):
+        raise TypeError(f'{target} takes {len(record.fields)} positional '
+                        f'argument(s) but {len(value)} were given')
+    result = {f.name: convert_value(f.annotation, element)
+              for f, element in zip(record.fields, value)}
+    return record.make(target, result)
+
+
+def convert_with(target: t.Any,
+                 converter: registry.Converter,
+                 value: t.Any) -> t.Any:
+    """Calls a converter from the registry."""
+    try:
+        return converter(value)
+    except (TypeError, ValueError) as e:
+        raise TypeError(f'can\'t convert "{value}" (type {type(value)}) '
+                        f'to {target}.') from e
+
+
+def convert_enum(target: t.Any,
+                 info: choices.EnumInfo,
+                 value: t.Any) -> t.Any:
+    """Finds the member of the enum `target` with the given value."""
+    try:
+        return info.members[value]
+    except (KeyError, TypeError):
+        pass
+    if isinstance(value, target):
+        return value
+    if info.needs_call:
+        try:
+            return target(value)
+        except ValueError:
+            pass
+    raise TypeError(f'can\'t convert "{value}" (type {type(value)}) '
+                    f'to {target}.')
+
+
+def convert_literal(target: t.Any,
+                    keys: t.FrozenSet[choices.LiteralKey],
+                    value: t.Any) -> t.Any:
+    """Checks value is one of those allowed by the Literal `target`, whose
+    `choices.literal_keys` are `keys`."""
+    try:
+        if (type(value), value) in keys:
+            return value
+    except TypeError:
+        pass  # not hashable, so can't be one of the values
+    raise TypeError(f'can\'t convert "{value}" (type {type(value)}) '
+                    f'to {target}.')
+
+
+Handler = t.Callable[[t.Any, t.Any], t.Any]
+
+# Maps (target, type of value) to the function which converts such values.
+# Everything about how to convert a value depends on only these two things,
+# so after the first value of a given type the decision tree below is skipped
+# entirely. Entries are written once and never change, so this is safe to
+# share between threads without a lock.
+_handlers: t.Dict[t.Tuple[t.Any, type], Handler] = {}
+
+
+def clear_cache() -> None:
+    """Forgets the handlers chosen for each target and value type."""
+    _handlers.clear()
+    _checkers.clear()
+    introspect.clear_cache()
+    plan.clear_cache()
+
+
+registry.default.on_change(clear_cache)
+
+
+def _return_value(target: t.Any, value: t.Any) -> t.Any:
+    return value
+
+
+def _return_string(target: t.Any, value: t.Any) -> t.Any:
+    spending = budget.spending.get()
+    if spending is not None:
+        spending.spend_string(value)
+    return value
+
+
+def _charged(handler: Handler) -> Handler:
+    """Wraps a handler converting the elements of a list or dictionary, so
+    they're charged to the budget if there is one."""
+    def charged(target: t.Any, value: t.Any) -> t.Any:
+        spending = budget.spending.get()
+        if spending is None:
+            return handler(target, value)
+        spending.enter(value)
+        try:
+            return handler(target, value)
+        finally:
+            spending.leave()
+    return charged
+
+
+def _charged_each(handler: Handler) -> Handler:
+    """Like `_charged`, for iterables without a length, whose elements are
+    charged one at a time as the handler takes them."""
+    def charged(target: t.Any, value: t.Any) -> t.Any:
+        spending = budget.spending.get()
+        if spending is None:
+            return handler(target, value)
+        spending.enter(value)
+        try:
+            return handler(target, spending.each(value))
+        finally:
+            spending.leave()
+    return charged
+
+
+def _cannot_convert(target: t.Any, value: t.Any) -> t.Any:
+    raise TypeError(f'can\'t convert "{value}" (type {type(value)}) '
+                    f'to {target}.')
+
+
+def _convert_dictionary_to_target(target: t.Any, value: dict) -> t.Any:
+    return target(**convert_dictionary_to_kwargs(target, value))
+
+
+def _resolve_union(members: t.Tuple[t.Any, ...],
+                   value_type: type) -> Handler:
+    """Works out how to convert values of `value_type` to a union.
+
+    A member which takes such values as they are is used if there is one.
+    Otherwise each member is tried in turn, until one converts the value.
+    """
+    member = introspect.instance_member(members, value_type)
+    if member is not None:
+        return lambda target, value: convert_value(member, value)
+
+    def convert_union(target: t.Any, value: t.Any) -> t.Any:
+        for member in members:
+            try:
+                return convert_value(member, value)
+            except TypeError:
+                pass
+        raise TypeError(f'can\'t convert "{value}" (type {type(value)}) '
+                        f'to {target}.')
+    return convert_union
+
+
+def _resolve_call(call: t.Optional[plan.Call], value_type: type) -> Handler:
+    """Works out how to call a target with values of `value_type`."""
+    if call is None:
+        return _cannot_convert
+
+    # If the incoming value is a dictionary, we don't attempt to pass it in
+    # as the single argument even if that's what the parameter list accepts.
+    # Doing so would make things too confusing (what to do in the event of
+    # variable keyword arguments?).
+    if issubclass(value_type, dict):
+        return _charged(_convert_dictionary_to_target)
+
+    params = len(call.fields.fields)
+    if params < 1:
+        def no_params(target: t.Any, value: t.Any) -> t.Any:
+            raise TypeError(f'{target} does not accept any parameters, '
+                            f'cannot convert from value "{value}".')
+        return no_params
+    elif params > 1:
+        def many_params(target: t.Any, value: t.Any) -> t.Any:
+            raise TypeError(f'{target} accepts {params} parameters, '
+                            f'cannot create from value "{value}".')
+        return many_params
+    annotation = call.sole
+    if annotation == t.Any:
+        return lambda target, value: target(value)
+
+    def single_arg(target: t.Any, value: t.Any) -> t.Any:
+        try:
+            arg = convert_value(annotation, value)
+        except TypeError as te:
+            raise TypeError(f'sole argument to {target} accepts type '
+                            f'{annotation}; cannot be '
+                            f'satisified with value {value}.') from te
+        return target(arg)
+    return single_arg
+
+
+def _resolve_handler(target: t.Any, value_type: type) -> Handler:
+    """Works out how to convert values of `value_type` to `target`, by
+    following its plan."""
+    p = plan.plan(target)
+    if p.kind == plan.ANY:
+        return _return_value
+    elif p.kind == plan.CONVERTER:
+        converter = p.converter
+        assert converter is not None
+        return lambda target, value: convert_with(target, converter, value)
+    elif p.kind == plan.ENUM:
+        enum_info = p.choices
+        return lambda target, value: convert_enum(target, enum_info, value)
+    elif p.kind == plan.LITERAL:
+        literal_keys = p.choices
+        return lambda target, value: convert_literal(
+            target, literal_keys, value)
+
+    record = p.record
+    if p.kind == plan.TYPED_DICT:
+        assert record is not None
+        return _charged(lambda target, value: convert_record_fields(
+            target, record, value))
+    elif p.kind == plan.NEW_TYPE:
+        st, = p.args
+        return lambda target, value: convert_value(st, value)
+    elif p.kind == plan.UNION:
+        return _resolve_union(p.args, value_type)
+    elif p.kind == plan.DICT:
+        return _charged(convert_dictionary)
+    elif p.kind == plan.LIST:
+        if not issubclass(value_type, collections.abc.Sized):
+            return _charged_each(convert_list)
+        return _charged(convert_list)
+    elif p.cls is not None and issubclass(value_type, p.cls):
+        # The given type is a subtype of the type we need.
+        if issubclass(p.cls, (str, bytes)):
+            return _return_string
+        return _return_value
+    elif record is not None and issubclass(value_type, dict):
+        return _charged(lambda target, value: record.make(
+            target, convert_record_fields(target, record, value)))
+    elif p.kind == plan.NAMED_TUPLE:
+        assert record is not None
+        if not issubclass(value_type, (list, tuple)):
+            return _cannot_convert
+        return _charged(lambda target, value: convert_list_to_named_tuple(
+            target, record, value))
+    # Otherwise see if calling target with the value will work.
+    return _resolve_call(p.call, value_type)
+
+
 def convert_value(target: t.Any, value: t.Any) -> t.Any:
     """Given a callable target, apply value.
 
@@ -144,57 +381,240 @@ def convert_value(target: t.Any, value: t.Any) -> t.Any:
     In any case, lists and dictionaries and lists are passed as *args and
     **kwargs, except that for each item the types given by the annotations is
     checked and errors may be raised.
+
+    How to convert each type of value to each target is worked out once and
+    remembered, so later values only cost a dict lookup before the actual
+    conversion.
     """
-    if target == t.Any:
-        return value
-    if inspect.isfunction(target):
-        st = getattr(target, '__supertype__', None)
-        if st:
-            # This is probably a new type?
-            return convert_value(st, value)
-        # handle with the function calling code below:
-    elif issubclass(target, dict):
-        return convert_dictionary(target, value)
-    elif issubclass(target, list):
-        return convert_list(target, value)
-    elif issubclass(type(value), target):
-        # The given type is a subtype of the type we need.
-        return value
+    key = (target, type(value))
+    try:
+        handler = _handlers[key]
+    except KeyError:
+        handler = _handlers[key] = _resolve_handler(target, type(value))
+    return handler(target, value)
 
-    # At this point, see if calling target and passing value as the first
-    # argument will work.
+
+def convert_within(target: t.Any,
+                   value: t.Any,
+                   limits: budget.Budget) -> t.Any:
+    """Like `convert_value`, but raises `budget.BudgetExceeded` as soon as
+    the conversion goes over `limits`."""
+    token = budget.spending.set(budget.Spending(limits))
     try:
-        sig = inspect.signature(target)
-    except ValueError:
-        raise TypeError(f'can\'t convert "{value}" (type {type(value)}) '
-                        f'to {target}.')
+        return convert_value(target, value)
+    finally:
+        budget.spending.reset(token)
 
-    # If the incoming value is a dictionary, we don't attempt to pass it in
-    # as the single argument even if that's what the parameter list accepts.
-    # Doing so would make things too confusing (what to do in the event of
-    # variable keyword arguments?).
-    if isinstance(value, dict):
-        kwargs = convert_dictionary_to_kwargs(target, value)
-        return target(**kwargs)
-
-    params = [param
-              for param in sig.parameters.values()
-              if param.kind not in [inspect.Parameter.VAR_POSITIONAL,
-                                    inspect.Parameter.VAR_KEYWORD]]
-    if len(params) < 1:
-        raise TypeError(f'{target} does not accept any parameters, cannot '
-                        f'convert from value "{value}".')
-    elif len(params) > 1:
-        raise TypeError(f'{target} accepts {len(params)} parameters, '
-                        f'cannot create from value "{value}".')
-    param = params[0]
-    if param.annotation:
-        if param.annotation != target:
-            try:
-                arg = convert_value(param.annotation, value)
-            except TypeError as te:
-                raise TypeError(f'sole argument to {target} accepts type '
-                                f'{param.annotation}; cannot be satisified '
-                                f'with value {value}.') from te
-            return target(arg)
-    return target(value)
+
+# Checks a value against a target, appending problems to the list. The path
+# is a list which checkers append to and pop from as they go down, so that
+# nothing is allocated unless a problem is found.
+Checker = t.Callable[[t.Any, t.Any, t.List[t.Any], t.List[validation.Problem]],
+                     None]
+
+# Like `_handlers`, for `validate`.
+_checkers: t.Dict[t.Tuple[t.Any, type], Checker] = {}
+
+
+def _check(target: t.Any,
+           value: t.Any,
+           path: t.List[t.Any],
+           problems: t.List[validation.Problem]) -> None:
+    key = (target, type(value))
+    try:
+        checker = _checkers[key]
+    except KeyError:
+        checker = _checkers[key] = _resolve_checker(target, type(value))
+    checker(target, value, path, problems)
+
+
+def _check_within(target: t.Any,
+                  value: t.Any,
+                  path: t.List[t.Any],
+                  key: t.Any,
+                  problems: t.List[validation.Problem]) -> None:
+    path.append(key)
+    _check(target, value, path, problems)
+    path.pop()
+
+
+def _check_nothing(target: t.Any,
+                   value: t.Any,
+                   path: t.List[t.Any],
+                   problems: t.List[validation.Problem]) -> None:
+    pass
+
+
+def _check_wrong_type(target: t.Any,
+                      value: t.Any,
+                      path: t.List[t.Any],
+                      problems: t.List[validation.Problem]) -> None:
+    problems.append(validation.wrong_type(tuple(path), target, value))
+
+
+def _checked_by_converting(handler: Handler) -> Checker:
+    def check(target: t.Any,
+              value: t.Any,
+              path: t.List[t.Any],
+              problems: t.List[validation.Problem]) -> None:
+        try:
+            handler(target, value)
+        except TypeError:
+            _check_wrong_type(target, value, path, problems)
+    return check
+
+
+def _fields_checker(record: records.Record, extras: t.Any) -> Checker:
+    """Returns a checker for the fields of a record in a dictionary.
+
+    `extras` is the annotation of keys which aren't fields, or None if they
+    aren't accepted.
+    """
+    names = record.names
+
+    def check(target: t.Any,
+              value: t.Any,
+              path: t.List[t.Any],
+              problems: t.List[validation.Problem]) -> None:
+        for f in record.fields:
+            if f.name in value:
+                _check_within(f.annotation, value[f.name], path, f.name,
+                              problems)
+            elif f.required:
+                problems.append(validation.missing((*path, f.name)))
+        if extras == t.Any:
+            return
+        for key in value:
+            if key in names:
+                continue
+            if extras is None:
+                problems.append(validation.not_accepted((*path, key), target))
+            else:
+                _check_within(extras, value[key], path, key, problems)
+    return check
+
+
+def _elements_checker(record: records.Record) -> Checker:
+    """Returns a checker for a list or tuple of a NamedTuple's fields."""
+    required = sum(1 for f in record.fields if f.required)
+    count = len(record.fields)
+
+    def check(target: t.Any,
+              value: t.Any,
+              path: t.List[t.Any],
+              problems: t.List[validation.Problem]) -> None:
+        if not required <= len(value) <= count:
+            problems.append(validation.wrong_length(
+                tuple(path), target, count, value))
+            return
+        for index, (f, element) in enumerate(zip(record.fields, value)):
+            _check_within(f.annotation, element, path, index, problems)
+    return check
+
+
+def _check_dictionary(target: t.Any,
+                      value: t.Any,
+                      path: t.List[t.Any],
+                      problems: t.List[validation.Problem]) -> None:
+    key_type, value_type = plan.plan(target).args
+    for k, v in value.items():
+        _check_within(key_type, k, path, k, problems)
+        _check_within(value_type, v, path, k, problems)
+
+
+def _check_list(target: t.Any,
+                value: t.Any,
+                path: t.List[t.Any],
+                problems: t.List[validation.Problem]) -> None:
+    element_type, = plan.plan(target).args
+    for index, element in enumerate(value):
+        _check_within(element_type, element, path, index, problems)
+
+
+def _union_checker(members: t.Tuple[t.Any, ...],
+                   value_type: type) -> Checker:
+    """Returns a checker for a union, which is valid if any member is."""
+    member = introspect.instance_member(members, value_type)
+    if member is not None:
+        return lambda target, value, path, problems: _check(
+            member, value, path, problems)
+
+    def check(target: t.Any,
+              value: t.Any,
+              path: t.List[t.Any],
+              problems: t.List[validation.Problem]) -> None:
+        start = len(problems)
+        for member in members:
+            _check(member, value, path, problems)
+            if len(problems) == start:
+                return
+            del problems[start:]
+        _check_wrong_type(target, value, path, problems)
+    return check
+
+
+def _resolve_checker(target: t.Any, value_type: type) -> Checker:
+    """Works out how to check values of `value_type` against `target`,
+    following the same plan as `_resolve_handler`."""
+    p = plan.plan(target)
+    if p.kind == plan.ANY:
+        return _check_nothing
+    elif p.kind in (plan.CONVERTER, plan.ENUM, plan.LITERAL):
+        # These are checked by converting, which for enums and literals
+        # only looks the value up.
+        return _checked_by_converting(_resolve_handler(target, value_type))
+
+    record = p.record
+    if p.kind == plan.TYPED_DICT:
+        assert record is not None
+        if not issubclass(value_type, dict):
+            return _check_wrong_type
+        return _fields_checker(record, None)
+    elif p.kind == plan.NEW_TYPE:
+        st, = p.args
+        return lambda target, value, path, problems: _check(
+            st, value, path, problems)
+    elif p.kind == plan.UNION:
+        return _union_checker(p.args, value_type)
+    elif p.kind == plan.DICT:
+        if not issubclass(value_type, dict):
+            return _check_wrong_type
+        return _check_dictionary
+    elif p.kind == plan.LIST:
+        if not issubclass(value_type, collections.abc.Iterable):
+            return _check_wrong_type
+        return _check_list
+    elif p.cls is not None and issubclass(value_type, p.cls):
+        return _check_nothing
+    elif record is not None and issubclass(value_type, dict):
+        return _fields_checker(record, None)
+    elif p.kind == plan.NAMED_TUPLE:
+        assert record is not None
+        if not issubclass(value_type, (list, tuple)):
+            return _check_wrong_type
+        return _elements_checker(record)
+
+    call = p.call
+    if call is None:
+        return _check_wrong_type
+    if issubclass(value_type, dict):
+        return _fields_checker(call.fields, call.extras)
+    if len(call.fields.fields) != 1:
+        return _check_wrong_type
+    annotation = call.sole
+    if annotation == t.Any:
+        return _check_nothing
+    return lambda target, value, path, problems: _check(
+        annotation, value, path, problems)
+
+
+def validate(target: t.Any, value: t.Any) -> t.List[validation.Problem]:
+    """Checks that `value` could be converted to `target`, without
+    converting it.
+
+    Returns every problem found, so an empty list means `value` is valid.
+    See `typebarrier.validation`.
+    """
+    problems: t.List[validation.Problem] = []
+    _check(target, value, [], problems)
+    return problems
@@ -1,39 +1,172 @@
 import ast
+import functools
 import textwrap
+import threading
 import typing as t
 
 from . import codegen as cg
 from . import dynamic as d  # NOQA
+from . import introspect
+from . import nodes
+from . import optimize
+from . import plan
+from . import registry
+from . import validation
 
 T = t.TypeVar('T')
 
+Converter = t.Callable[[t.Any], t.Any]
 
-def convert_dictionary_to_kwargs(target: type) -> t.Callable[[t.Any], dict]:
-    code = cg.CodeGen()
+Validator = t.Callable[[t.Any], t.List[validation.Problem]]
+
+# Compiled converters are cached here, keyed by what was compiled and for
+# which target. Reads never take a lock: a dict lookup is atomic, and an entry
+# is only ever written once, fully built. Compiling holds `_lock`, so that
+# concurrent first calls for the same target compile it exactly once. It's
+# reentrant because compiling a target compiles the targets nested in it, and
+# there's just the one so that two threads compiling targets nested in each
+# other can't each wait for the other's.
+_converters: t.Dict[t.Tuple[t.Any, ...], t.Any] = {}
+_lock = threading.RLock()
+
+# The keys each thread is compiling right now, so that a target nested
+# within itself calls a `codegen.Stub` for its converter, filled in once it's
+# compiled, rather than waiting on its own lock.
+_building = threading.local()
+
+
+def _building_keys() -> t.Set[t.Tuple[t.Any, ...]]:
+    keys = getattr(_building, 'keys', None)
+    if keys is None:
+        keys = _building.keys = set()
+    return t.cast(t.Set[t.Tuple[t.Any, ...]], keys)
+
+
+def _compile_once(key: t.Tuple[t.Any, ...],
+                  build: t.Callable[[], t.Any]) -> t.Any:
+    """Returns the cached result for `key`, calling `build` at most once."""
+    result = _converters.get(key)
+    if result is not None:
+        return result
+
+    with _lock:
+        # Another thread may have finished compiling while we waited.
+        result = _converters.get(key)
+        if result is None:
+            building = _building_keys()
+            building.add(key)
+            try:
+                result = build()
+            finally:
+                building.discard(key)
+            _converters[key] = result
+    return result
+
+
+def clear_cache() -> None:
+    """Forgets every compiled converter."""
+    with _lock:
+        _converters.clear()
+    plan.clear_cache()
+
+
+registry.default.on_change(clear_cache)
+
+
+def _compile(generate: t.Callable[[cg.CodeGen, t.Any, ast.expr], None],
+             target: t.Any,
+             options: t.Dict[str, t.Any]) -> t.Any:
+    """Generates a function with `generate` and compiles it.
+
+    Nested lists and dictionaries are converted by calling the shared
+    converters from `convert_value`, compiling them first if needed.
+    """
+    code = cg.CodeGen(link=functools.partial(_link, options=options),
+                      compile_branch=functools.partial(_compile_branch,
+                                                       options=options),
+                      link_validator=_link_validator,
+                      **options)
     function_name = code.make_var()
     t_any_var_name = code.inject_closure_var(t.Any)
-    target_var_name = code.inject_closure_var(target)
-    code.add_line(f'def {function_name}(value: {t_any_var_name}) '
-                  f'-> {target_var_name}:')
-    code.indent()
-    cg.convert_dictionary_to_kwargs(code, target, 'value')
-
-    a = ast.parse(code.render())
-    compiled_code = compile(a, filename='<generated code>', mode='exec')
+    with code.function(function_name, [('value', t_any_var_name)]):
+        generate(code, target, nodes.name('value'))
+
+    module = code.module()
+    if code.optimize:
+        module = optimize.optimize(module, code.namespace)
+    compiled_code = compile(module, filename='<generated code>', mode='exec')
     exec(compiled_code, code.namespace)
     return code.namespace[function_name]
 
 
+def _options_key(options: t.Dict[str, t.Any]) -> t.Tuple[t.Any, ...]:
+    return tuple(sorted(options.items()))
+
+
+def _compile_branch(kind: str,
+                    generate: cg.Generate,
+                    target: t.Any,
+                    options: t.Dict[str, t.Any]) -> t.Callable[..., t.Any]:
+    """Compiles a branch for a `codegen.Stub`, once per target and options
+    however many stubs there are for it."""
+    return t.cast(t.Callable[..., t.Any], _compile_once(
+        (kind, target, _options_key(options)),
+        lambda: _compile(generate, target, options)))
+
+
+def _link(target: t.Any,
+          options: t.Dict[str, t.Any]) -> t.Union[Converter, cg.Stub]:
+    if ('value', target, _options_key(options)) in _building_keys():
+        return cg.Stub(lambda: convert_value(target, **options))
+    return convert_value(target, **options)
+
+
+def _link_validator(target: t.Any) -> t.Union[Validator, cg.Stub]:
+    if ('validate', target, ()) in _building_keys():
+        return cg.Stub(lambda: validate(target))
+    return validate(target)
+
+
+def _compile_dictionary_to_kwargs(target: type,
+                                  options: t.Dict[str, t.Any],
+                                  ) -> t.Callable[[t.Any], dict]:
+    return t.cast(t.Callable[[t.Any], dict],
+                  _compile(cg.convert_dictionary_to_kwargs, target, options))
+
+
+def convert_dictionary_to_kwargs(target: type,
+                                 **options: t.Any,
+                                 ) -> t.Callable[[t.Any], dict]:
+    """Returns a function converting a dictionary to kwargs for `target`.
+
+    The function is compiled once per target and shared between threads.
+    See `convert_value` for the options.
+    """
+    return _compile_once(
+        ('kwargs', target, _options_key(options)),
+        lambda: _compile_dictionary_to_kwargs(target, options))
+
+
+def convert_list_to_kwargs(target: type,
+                           **options: t.Any,
+                           ) -> t.Callable[[t.Any], dict]:
+    """Returns a function converting a list of positional arguments to
+    kwargs for `target`, like `dynamic.convert_list_to_kwargs`.
+
+    See `convert_value` for the options.
+    """
+    return _compile_once(
+        ('list kwargs', target, _options_key(options)),
+        lambda: t.cast(t.Callable[[t.Any], dict], _compile(
+            cg.convert_list_to_kwargs, target, options)))
+
+
 def convert_list(target: type,
                  ) -> t.Callable[[t.List], t.List[T]]:
-    if not issubclass(target, list):
-        raise ValueError('"{target}" is not a subclass of list')
-    element_type = t.Any
-    type_args = getattr(target, '__args__', None)
-    if type_args:
-        if len(type_args) != 1:
-            raise NotImplemented(f'do not know how to convert type "{target}"')
-        element_type = type_args[0]  # NOQA
+    info = introspect.describe(target)
+    if info.kind != introspect.LIST:
+        raise ValueError(f'"{target}" is not a subclass of list')
+    element_type, = info.args  # NOQA
 
     # exec(textwrap.dedent("""
     #     print('hi')
@@ -73,17 +206,111 @@ def convert_list(target: type,
     return f
 
 
-def convert_value(target: type) -> t.Callable[[t.Any], t.Any]:
-    code = cg.CodeGen()
-    function_name = code.make_var()
-    t_any_var_name = code.inject_closure_var(t.Any)
-    target_var_name = code.inject_closure_var(target)
-    code.add_line(f'def {function_name}(value: {t_any_var_name}) '
-                  f'-> {target_var_name}:')
-    code.indent()
-    cg.convert_value(code, target, 'value')
-
-    a = ast.parse(code.render())
-    compiled_code = compile(a, filename='<generated code>', mode='exec')
-    exec(compiled_code, code.namespace)
-    return code.namespace[function_name]
+def _compile_value(target: type, options: t.Dict[str, t.Any]) -> Converter:
+    return t.cast(Converter, _compile(cg.convert_value, target, options))
+
+
+def convert_value(target: type, **options: t.Any) -> Converter:
+    """Returns a function converting JSON-like values to `target`.
+
+    The function is compiled once per target and set of options, and shared
+    between threads. The options are those of `codegen.CodeGen`:
+
+    If `trusted_constructors` is set, classes whose `__init__` only assigns
+    its arguments to `self` are built without calling `__init__` (see
+    `typebarrier.trusted`). Classes decorated with
+    `trusted.trusted_constructor` are built that way regardless.
+
+    If `intern_literals` is set, strings matching a `Literal` annotation are
+    replaced by the instance in the annotation, so that repeated values
+    share memory.
+
+    If `single_pass_fields` is set, dictionaries for targets with many
+    optional fields are matched by looping over their items once rather than
+    looking up every field. This is faster when most fields are absent.
+
+    If `dedup` is set, values occurring more than once in one call are
+    converted once: later occurrences of the same object, or of an equal
+    string or number, share the first result. This saves time and memory
+    for documents which repeat themselves.
+
+    If `budget` is a `budget.Budget`, the converter raises
+    `budget.BudgetExceeded` as soon as a value needs more work than it
+    allows, counting as it goes.
+
+    If `lazy` is set, the code converting a dictionary or a sole argument
+    to each class is only compiled the first time a value needs it, which
+    makes compiling converters for large schemas much cheaper when only
+    part of each is used. An unsupported annotation then raises when the
+    branch is first taken, rather than here.
+
+    `optimize` is on by default; turning it off skips the peephole passes in
+    `typebarrier.optimize`, which is only useful for debugging them.
+    """
+    return _compile_once(
+        ('value', target, _options_key(options)),
+        lambda: _compile_value(target, options))
+
+
+def compile_generated(name: t.Hashable,
+                      generate: cg.Generate,
+                      target: t.Any,
+                      **options: t.Any) -> t.Callable[..., t.Any]:
+    """Returns a function taking a value, compiled from the code `generate`
+    writes for `target`, for modules generating code of their own.
+
+    Like `convert_value`, it's compiled once per `name`, target and options
+    and shared between threads, so `name` must tell apart every generator,
+    and include anything `generate` depends on besides the target. Nested
+    conversions are linked to `convert_value` with the same options.
+    """
+    return t.cast(t.Callable[..., t.Any], _compile_once(
+        ('generated', name, target, _options_key(options)),
+        lambda: _compile(generate, target, options)))
+
+
+def _compile_validator(target: t.Any) -> Validator:
+    return t.cast(Validator, _compile(cg.validate, target, {}))
+
+
+def validate(target: t.Any) -> Validator:
+    """Returns a function checking that values could be converted to
+    `target`, without converting them.
+
+    Like `dynamic.validate`, the function returns every problem found, so an
+    empty list means the value is valid. It's compiled once per target and
+    shared between threads.
+    """
+    return _compile_once(('validate', target, ()),
+                         lambda: _compile_validator(target))
+
+
+def _compile_call(target: t.Callable,
+                  options: t.Dict[str, t.Any]) -> Converter:
+    return t.cast(Converter, _compile(cg.call_target, target, options))
+
+
+def compile_call(target: t.Callable, **options: t.Any) -> Converter:
+    """Returns a function which converts arguments and calls `target`.
+
+    The returned function takes a dictionary, whose items are passed like
+    `**kwargs`, or a list or tuple, whose elements are passed like `*args`.
+    Each argument is converted to the type in its annotation and `target`
+    is then called directly, with no signature introspection after the
+    first compile. See `convert_value` for the options.
+    """
+    return _compile_once(('call', target, _options_key(options)),
+                         lambda: _compile_call(target, options))
+
+
+def barrier(func: t.Callable) -> Converter:
+    """Decorator replacing `func` with its `compile_call` function.
+
+        @barrier
+        def create_volume(name: str, size: int) -> Volume:
+            ...
+
+        create_volume({'name': 'data', 'size': 20})
+        create_volume(['data', 20])
+    """
+    return functools.update_wrapper(compile_call(func), func)
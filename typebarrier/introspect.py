@@ -0,0 +1,137 @@
+"""
+Works out what kind of annotation a target is, once per target.
+
+Every engine needs the same few facts about a target: whether it's `Any`, a
+NewType, a union, a list or dictionary and of what, or a class whose
+instances are accepted as they are. Reading these from the private
+attributes of `typing` broke as Python changed: NewType became a class,
+and `List[int]` isn't a class at all. `describe` uses `typing.get_origin`
+and `typing.get_args` instead, so that `List[int]`, `list[int]` and
+subclasses of `list` look alike, as do `Optional[int]` and `int | None`.
+
+`signature` likewise resolves forward references with
+`typing.get_type_hints`. Both are cached, so each target is only analyzed
+once however many engines use it.
+"""
+import functools
+import inspect
+import types
+import typing as t
+
+
+ANY = 'any'
+NEW_TYPE = 'new type'
+UNION = 'union'
+LIST = 'list'
+DICT = 'dict'
+# A class, or a parameterized generic other than a list or dictionary.
+CLASS = 'class'
+# Anything else, such as a function, which can only be called.
+CALLABLE = 'callable'
+
+# `int | None` on Python 3.10 and later.
+_UNION_TYPES = tuple(u for u in (t.Union, getattr(types, 'UnionType', None))
+                     if u is not None)
+
+
+class TypeInfo(t.NamedTuple):
+    kind: str
+    # The class whose instances are accepted: the list or dictionary class,
+    # or for CLASS the target itself or the origin of a generic.
+    cls: t.Optional[type] = None
+    # The element type of a list, key and value types of a dictionary,
+    # members of a union or supertype of a NewType.
+    args: t.Tuple[t.Any, ...] = ()
+
+
+@functools.lru_cache(maxsize=None)
+def describe(target: t.Any) -> TypeInfo:
+    """Returns what kind of annotation `target` is.
+
+    Raises NotImplementedError for lists and dictionaries with the wrong
+    number of type arguments.
+    """
+    if target is t.Any:
+        return TypeInfo(ANY)
+    supertype = getattr(target, '__supertype__', None)
+    if supertype is not None:
+        return TypeInfo(NEW_TYPE, args=(supertype,))
+
+    origin = t.get_origin(target)
+    if origin in _UNION_TYPES:
+        return TypeInfo(UNION, args=t.get_args(target))
+    cls = origin if origin is not None else target
+    if not isinstance(cls, type):
+        return TypeInfo(CALLABLE)
+
+    args = t.get_args(target) if origin is not None else ()
+    if issubclass(cls, list):
+        if len(args) > 1:
+            raise NotImplementedError(
+                f'do not know how to convert type "{target}"')
+        return TypeInfo(LIST, cls, args or (t.Any,))
+    if issubclass(cls, dict):
+        if args and len(args) != 2:
+            raise NotImplementedError(
+                f'do not know how to convert type "{target}"')
+        return TypeInfo(DICT, cls, args or (t.Any, t.Any))
+    return TypeInfo(CLASS, cls)
+
+
+def _resolve(name: str, annotation: t.Any, func: t.Any) -> t.Any:
+    """Resolves the annotation of one parameter, or returns it as it is if
+    that fails."""
+    holder = types.SimpleNamespace(__annotations__={name: annotation})
+    globalns = getattr(inspect.unwrap(func), '__globals__', None)
+    try:
+        return t.get_type_hints(holder, globalns, include_extras=True)[name]
+    except Exception:
+        return annotation
+
+
+@functools.lru_cache(maxsize=None)
+def signature(target: t.Any) -> inspect.Signature:
+    """Returns the signature of `target`, with forward references resolved
+    where possible, including those within annotations like
+    `List['Node']`.
+
+    Raises ValueError if `target` has no signature.
+    """
+    try:
+        sig = inspect.signature(target)
+    except TypeError as e:
+        raise ValueError(f'no signature found for {target}') from e
+    func = target.__init__ if inspect.isclass(target) else target
+    try:
+        hints = t.get_type_hints(func, include_extras=True)
+    except Exception:
+        # One annotation which can't be resolved shouldn't stop the rest.
+        hints = {p.name: _resolve(p.name, p.annotation, func)
+                 for p in sig.parameters.values()
+                 if p.annotation is not inspect.Parameter.empty}
+    return sig.replace(parameters=[
+        p.replace(annotation=hints[p.name])
+        if p.annotation is not inspect.Parameter.empty and p.name in hints
+        else p
+        for p in sig.parameters.values()])
+
+
+def instance_member(members: t.Tuple[t.Any, ...],
+                    value_type: type) -> t.Any:
+    """Returns the first member of a union which takes values of
+    `value_type` as they are, or None.
+
+    A value is converted to such a member even if an earlier member could
+    convert it, so that `Union[float, int]` keeps integers as they are.
+    """
+    for member in members:
+        info = describe(member)
+        if (info.kind == CLASS and info.cls is not None
+                and issubclass(value_type, info.cls)):
+            return member
+    return None
+
+
+def clear_cache() -> None:
+    describe.cache_clear()
+    signature.cache_clear()
@@ -0,0 +1,334 @@
+"""
+Converts values like `dynamic`, but without recursing for nested values.
+
+Each conversion which needs nested values converted is a generator. It
+yields `(target, value)` for every nested value and is sent back the
+result, or has the error thrown into it. A loop in `_run` keeps the
+unfinished generators on a list, so however deep the input, the Python and
+C stacks stay the same size and `RecursionError` can't happen.
+
+The decisions and error messages are the same as `dynamic`'s, which remains
+the reference behavior.
+"""
+import reprlib
+import typing as t
+
+from . import dynamic
+from . import introspect
+from . import plan
+from . import records
+from . import registry
+
+
+# Yields (target, value) to convert, is sent the result, returns its own.
+Steps = t.Generator[t.Tuple[t.Any, t.Any], t.Any, t.Any]
+
+Handler = t.Callable[[t.Any, t.Any], t.Any]
+
+
+def _show(value: t.Any) -> str:
+    """Formats a value for a message, even if it's too deep for `str`."""
+    try:
+        return f'{value}'
+    except RecursionError:
+        return reprlib.repr(value)
+
+
+def _cant_convert(target: t.Any, value: t.Any) -> TypeError:
+    return TypeError(f'can\'t convert "{_show(value)}" (type {type(value)}) '
+                     f'to {target}.')
+
+
+def _convert_dictionary_to_kwargs(target: t.Any, value: dict) -> Steps:
+    call = plan.call(target)
+    result = {}
+    for f in call.fields.fields:
+        if f.name in value:
+            result[f.name] = yield f.annotation, value[f.name]
+        elif f.required:
+            raise TypeError(f'missing a required argument: {f.name}')
+    if len(result) == len(value):
+        return result
+
+    names = call.fields.names
+    extra_dict_keys = [k for k in value if k not in names]
+    if call.extras is None:
+        raise TypeError('the following parameters not accepted for '
+                        f'"{target}" : {extra_dict_keys}')
+    for key in extra_dict_keys:
+        try:
+            result[key] = yield call.extras, value[key]
+        except TypeError:
+            raise TypeError(f'problem converting argument "{key}" '
+                            'to annotated variable keyword arg '
+                            f'type {call.extras} found in {target}.')
+    return result
+
+
+def _convert_list(target: type, value: t.List) -> Steps:
+    info = plan.plan(target)
+    if info.kind != plan.LIST:
+        raise ValueError(f'"{target}" is not a subclass of list')
+    element_type, = info.args
+    try:
+        result = []
+        for e in value:
+            result.append((yield element_type, e))
+        return result
+    except TypeError as te:
+        raise _cant_convert(target, value) from te
+
+
+def _convert_dictionary(target: t.Any, value: t.Dict) -> Steps:
+    info = plan.plan(target)
+    if info.kind != plan.DICT:
+        raise ValueError(f'"{target}" is not a subclass of dict')
+    if not isinstance(value, dict):
+        raise TypeError(f'can\'t convert "{_show(value)}" '
+                        f'(type {type(value)}) to {target}')
+    key_type, value_type = info.args
+    try:
+        result = {}
+        for k, v in value.items():
+            new_k = yield key_type, k
+            result[new_k] = yield value_type, v
+        return result
+    except TypeError as te:
+        raise _cant_convert(target, value) from te
+
+
+def _convert_record_fields(target: t.Any,
+                           record: records.Record,
+                           value: t.Any) -> Steps:
+    if not isinstance(value, dict):
+        raise _cant_convert(target, value)
+    result = {}
+    for f in record.fields:
+        if f.name in value:
+            result[f.name] = yield f.annotation, value[f.name]
+        elif f.required:
+            raise TypeError(f'missing a required argument: \'{f.name}\'')
+    if len(result) != len(value):
+        extra_keys = [k for k in value if k not in record.names]
+        raise TypeError('the following parameters not accepted for '
+                        f'"{target}" : {extra_keys}')
+    return result
+
+
+def _make_record(target: t.Any,
+                 record: records.Record,
+                 value: t.Any) -> Steps:
+    fields = yield from _convert_record_fields(target, record, value)
+    return record.make(target, fields)
+
+
+def _convert_list_to_named_tuple(target: t.Any,
+                                 record: records.Record,
+                                 value: t.Union[list, tuple]) -> Steps:
+    required = sum(1 for f in record.fields if f.required)
+    if not required <= len(value) <= len(record.fields):
+        raise TypeError(f'{target} takes {len(record.fields)} positional '
+                        f'argument(s) but {len(value)} were given')
+    result = {}
+    for f, element in zip(record.fields, value):
+        result[f.name] = yield f.annotation, element
+    return record.make(target, result)
+
+
+def _convert_dictionary_to_target(target: t.Any, value: dict) -> Steps:
+    kwargs = yield from _convert_dictionary_to_kwargs(target, value)
+    return target(**kwargs)
+
+
+def _cannot_convert(target: t.Any, value: t.Any) -> t.Any:
+    raise _cant_convert(target, value)
+
+
+# Maps (target, type of value) to how such values are converted, and
+# whether the handler is a generator. Like `dynamic._handlers` this is
+# written once per key and read without a lock.
+_handlers: t.Dict[t.Tuple[t.Any, type], t.Tuple[Handler, bool]] = {}
+
+
+def clear_cache() -> None:
+    """Forgets the handlers chosen for each target and value type."""
+    _handlers.clear()
+
+
+registry.default.on_change(clear_cache)
+
+
+def _resolve_union(members: t.Tuple[t.Any, ...],
+                   value_type: type) -> t.Tuple[Handler, bool]:
+    """Follows `dynamic._resolve_union`."""
+    member = introspect.instance_member(members, value_type)
+    if member is not None:
+        def convert_member(target: t.Any, value: t.Any) -> Steps:
+            return (yield member, value)
+        return convert_member, True
+
+    def convert_union(target: t.Any, value: t.Any) -> Steps:
+        for member in members:
+            try:
+                return (yield member, value)
+            except TypeError:
+                pass
+        raise _cant_convert(target, value)
+    return convert_union, True
+
+
+def _resolve_call(call: t.Optional[plan.Call],
+                  value_type: type) -> t.Tuple[Handler, bool]:
+    """Follows `dynamic._resolve_call`."""
+    if call is None:
+        return _cannot_convert, False
+
+    if issubclass(value_type, dict):
+        return _convert_dictionary_to_target, True
+
+    params = len(call.fields.fields)
+    if params < 1:
+        def no_params(target: t.Any, value: t.Any) -> t.Any:
+            raise TypeError(f'{target} does not accept any parameters, '
+                            f'cannot convert from value "{_show(value)}".')
+        return no_params, False
+    elif params > 1:
+        def many_params(target: t.Any, value: t.Any) -> t.Any:
+            raise TypeError(f'{target} accepts {params} parameters, '
+                            f'cannot create from value "{_show(value)}".')
+        return many_params, False
+    annotation = call.sole
+    if annotation == t.Any:
+        return (lambda target, value: target(value)), False
+
+    def single_arg(target: t.Any, value: t.Any) -> Steps:
+        try:
+            arg = yield annotation, value
+        except TypeError as te:
+            raise TypeError(f'sole argument to {target} accepts type '
+                            f'{annotation}; cannot be satisified '
+                            f'with value {_show(value)}.') from te
+        return target(arg)
+    return single_arg, True
+
+
+def _resolve_handler(target: t.Any,
+                     value_type: type) -> t.Tuple[Handler, bool]:
+    """Works out how to convert values of `value_type` to `target`.
+
+    Follows `dynamic._resolve_handler`. Returns the handler and whether it
+    is a generator of nested conversions.
+    """
+    p = plan.plan(target)
+    if p.kind == plan.ANY:
+        return dynamic._return_value, False
+    elif p.kind == plan.CONVERTER:
+        converter = p.converter
+        assert converter is not None
+        return (lambda target, value: dynamic.convert_with(
+            target, converter, value)), False
+    elif p.kind == plan.ENUM:
+        enum_info = p.choices
+        return (lambda target, value: dynamic.convert_enum(
+            target, enum_info, value)), False
+    elif p.kind == plan.LITERAL:
+        literal_keys = p.choices
+        return (lambda target, value: dynamic.convert_literal(
+            target, literal_keys, value)), False
+
+    record = p.record
+    if p.kind == plan.TYPED_DICT:
+        assert record is not None
+        return (lambda target, value: _convert_record_fields(
+            target, record, value)), True
+    elif p.kind == plan.NEW_TYPE:
+        st, = p.args
+
+        def new_type(target: t.Any, value: t.Any) -> Steps:
+            return (yield st, value)
+        return new_type, True
+    elif p.kind == plan.UNION:
+        return _resolve_union(p.args, value_type)
+    elif p.kind == plan.DICT:
+        return _convert_dictionary, True
+    elif p.kind == plan.LIST:
+        return _convert_list, True
+    elif p.cls is not None and issubclass(value_type, p.cls):
+        return dynamic._return_value, False
+    elif record is not None and issubclass(value_type, dict):
+        return (lambda target, value: _make_record(
+            target, record, value)), True
+    elif p.kind == plan.NAMED_TUPLE:
+        assert record is not None
+        if not issubclass(value_type, (list, tuple)):
+            return _cannot_convert, False
+        return (lambda target, value: _convert_list_to_named_tuple(
+            target, record, value)), True
+    return _resolve_call(p.call, value_type)
+
+
+def _handler(target: t.Any, value: t.Any) -> t.Tuple[Handler, bool]:
+    key = (target, type(value))
+    try:
+        return _handlers[key]
+    except KeyError:
+        handler = _handlers[key] = _resolve_handler(target, type(value))
+        return handler
+
+
+def _run(steps: Steps) -> t.Any:
+    """Runs `steps` and every nested conversion they ask for."""
+    stack = [steps]
+    handlers = _handlers
+    result: t.Any = None
+    error: t.Optional[Exception] = None
+    while True:
+        try:
+            if error is None:
+                target, value = stack[-1].send(result)
+            else:
+                target, value = stack[-1].throw(error)
+        except StopIteration as stop:
+            stack.pop()
+            if not stack:
+                return stop.value
+            result, error = stop.value, None
+            continue
+        except Exception as e:
+            stack.pop()
+            if not stack:
+                raise
+            result, error = None, e
+            continue
+
+        # Convert the value asked for, directly if it has no nested values.
+        # As in `dynamic`, errors working out how are raised to the asker.
+        try:
+            try:
+                handler, nested = handlers[target, type(value)]
+            except KeyError:
+                handler, nested = _handler(target, value)
+            if nested:
+                stack.append(handler(target, value))
+                result, error = None, None
+            else:
+                result, error = handler(target, value), None
+        except Exception as e:
+            result, error = None, e
+
+
+def convert_dictionary_to_kwargs(target: t.Any, value: dict) -> t.Any:
+    """Like `dynamic.convert_dictionary_to_kwargs`."""
+    return _run(_convert_dictionary_to_kwargs(target, value))
+
+
+def convert_value(target: t.Any, value: t.Any) -> t.Any:
+    """Converts `value` to `target`, like `dynamic.convert_value`.
+
+    Nested values are converted in a loop rather than by recursion, so any
+    depth of input can be converted.
+    """
+    handler, nested = _handler(target, value)
+    if not nested:
+        return handler(target, value)
+    return _run(handler(target, value))
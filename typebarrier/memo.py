@@ -0,0 +1,176 @@
+"""
+Remembers converted results across calls, for inputs which keep repeating.
+
+Config blobs, feature flags and catalog entries often arrive identically
+many times a minute. `memoize` wraps the converter for such a target so that
+an input equal to a recent one returns the earlier result, looked up by a
+fingerprint of the input.
+
+The same result object is handed to every caller, so this is only allowed
+for targets marked with `immutable` (or `mark_immutable` for targets which
+can't be decorated, such as `Dict[str, Flag]`).
+"""
+import collections
+import threading
+import time
+import typing as t
+
+from . import inline
+
+
+IMMUTABLE_ATTR = '__typebarrier_immutable__'
+
+T = t.TypeVar('T')
+
+Fingerprint = t.Callable[[t.Any], t.Hashable]
+
+_immutable: t.Set[t.Any] = set()
+
+
+def immutable(cls: t.Type[T]) -> t.Type[T]:
+    """Class decorator promising instances are never changed once built,
+    so one instance may be shared by everything converting equal input."""
+    setattr(cls, IMMUTABLE_ATTR, True)
+    return cls
+
+
+def mark_immutable(target: t.Any) -> None:
+    """Like `immutable`, for targets which aren't classes."""
+    _immutable.add(target)
+
+
+def is_immutable(target: t.Any) -> bool:
+    if target in _immutable:
+        return True
+    # Only look at the class itself, so subclasses must be marked too.
+    return isinstance(target, type) and IMMUTABLE_ATTR in vars(target)
+
+
+# Types fingerprinted as themselves. Subclasses, such as enums, aren't.
+_SCALARS = frozenset([str, int, bool, type(None)])
+
+
+def fingerprint(value: t.Any) -> t.Hashable:
+    """Returns a key equal for equal JSON-like values of the same types.
+
+    Types are kept throughout, so `{1: x}` and `{'1': x}`, `1` and `True`,
+    or lists and tuples, have different fingerprints. Dictionaries are
+    equal whatever the order of their keys. Floats are keyed by their repr,
+    so `-0.0` isn't `0.0`. Raises TypeError for anything else.
+    """
+    cls = type(value)
+    if cls in _SCALARS:
+        return cls, value
+    if cls is float:
+        return cls, repr(value)
+    if cls is dict:
+        return cls, frozenset((fingerprint(k), fingerprint(v))
+                              for k, v in value.items())
+    if cls is list or cls is tuple:
+        return cls, tuple(map(fingerprint, value))
+    raise TypeError(f'can\'t fingerprint "{value}" (type {cls}).')
+
+
+class CacheStats(t.NamedTuple):
+    hits: int
+    misses: int
+    # Inputs which couldn't be fingerprinted, so were always converted.
+    uncached: int
+    evictions: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of calls answered from the cache."""
+        calls = self.hits + self.misses + self.uncached
+        return self.hits / calls if calls else 0.0
+
+
+class Memoized:
+    """Wraps a converter, returning recent results for equal input.
+
+    At most `maxsize` results are kept, dropping the least recently used.
+    If `ttl` is given, results are also dropped that many seconds after
+    they were converted.
+    """
+
+    def __init__(self,
+                 converter: inline.Converter,
+                 maxsize: int = 1024,
+                 ttl: t.Optional[float] = None,
+                 key: Fingerprint = fingerprint,
+                 clock: t.Callable[[], float] = time.monotonic) -> None:
+        if maxsize < 1:
+            raise ValueError(f'maxsize must be at least 1, not {maxsize}')
+        self._converter = converter
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._key = key
+        self._clock = clock
+        # Maps fingerprints to (expiry time or None, result), least recently
+        # used first.
+        self._results: t.OrderedDict[t.Hashable,
+                                     t.Tuple[t.Optional[float], t.Any]] = (
+            collections.OrderedDict())
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._uncached = 0
+        self._evictions = 0
+
+    def __call__(self, value: t.Any) -> t.Any:
+        try:
+            key = self._key(value)
+        except (TypeError, ValueError):
+            with self._lock:
+                self._uncached += 1
+            return self._converter(value)
+
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is not None:
+                expires, result = entry
+                if expires is None or self._clock() < expires:
+                    self._results.move_to_end(key)
+                    self._hits += 1
+                    return result
+                del self._results[key]
+                self._evictions += 1
+            self._misses += 1
+
+        # Convert without holding the lock; if two threads miss the same
+        # key at once, both convert and the last result is kept.
+        result = self._converter(value)
+        expires = None if self._ttl is None else self._clock() + self._ttl
+        with self._lock:
+            self._results[key] = (expires, result)
+            self._results.move_to_end(key)
+            while len(self._results) > self._maxsize:
+                self._results.popitem(last=False)
+                self._evictions += 1
+        return result
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._uncached,
+                              self._evictions, len(self._results))
+
+    def clear(self) -> None:
+        """Forgets every result, but not the stats."""
+        with self._lock:
+            self._results.clear()
+
+
+def memoize(target: t.Any,
+            maxsize: int = 1024,
+            ttl: t.Optional[float] = None,
+            **options: t.Any) -> Memoized:
+    """Returns a memoized `inline.convert_value` converter for `target`.
+
+    `target` must be marked immutable. Options are passed to
+    `inline.convert_value`.
+    """
+    if not is_immutable(target):
+        raise ValueError(f'"{target}" is not marked immutable, so its '
+                         'results can\'t be shared between calls')
+    return Memoized(inline.convert_value(target, **options), maxsize, ttl)
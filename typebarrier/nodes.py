@@ -0,0 +1,251 @@
+"""
+Small constructors for the `ast` nodes built by `codegen`.
+
+Expressions are built for loading; `store` copies one for assigning to.
+Wherever an expression is expected, anything which isn't already a node is
+taken as a constant, so names always go through `name`.
+"""
+import ast
+import copy
+import typing as t
+
+
+Value = t.Union[ast.expr, None, bool, int, float, str, bytes]
+
+N = t.TypeVar('N', bound=ast.AST)
+
+# Every node gets the same dummy location. That's much cheaper than filling
+# locations in with `ast.fix_missing_locations` before compiling.
+_LOCATION = {'lineno': 1, 'col_offset': 0, 'end_lineno': 1,
+             'end_col_offset': 0}
+
+# Contexts carry no data, so one of each is shared.
+_LOAD = ast.Load()
+_STORE = ast.Store()
+
+
+def node(cls: t.Type[N], **fields: t.Any) -> N:
+    """Returns `cls(**fields)`, located so that it can be compiled."""
+    result = cls(**fields)
+    # Quicker than passing the location as keyword arguments.
+    result.__dict__.update(_LOCATION)
+    return result
+
+
+def expr(value: Value) -> ast.expr:
+    if isinstance(value, ast.expr):
+        return value
+    return node(ast.Constant, value=value)
+
+
+def name(id: str) -> ast.Name:
+    return node(ast.Name, id=id, ctx=_LOAD)
+
+
+def store(target: t.Union[ast.expr, str]) -> ast.expr:
+    """Returns a copy of a name, subscript, attribute or tuple of names for
+    assigning to."""
+    if isinstance(target, str):
+        return node(ast.Name, id=target, ctx=_STORE)
+    target = copy.copy(target)
+    if isinstance(target, ast.Tuple):
+        target.elts = [store(e) for e in target.elts]
+    target.ctx = _STORE  # type: ignore
+    return target
+
+
+def attr(value: ast.expr, attr: str) -> ast.Attribute:
+    return node(ast.Attribute, value=value, attr=attr, ctx=_LOAD)
+
+
+def subscript(value: ast.expr, key: Value) -> ast.Subscript:
+    return node(ast.Subscript, value=value, slice=expr(key), ctx=_LOAD)
+
+
+def slice_from(value: ast.expr, start: Value) -> ast.Subscript:
+    """Returns `value[start:]`."""
+    return node(ast.Subscript, value=value,
+                slice=node(ast.Slice, lower=expr(start), upper=None,
+                           step=None),
+                ctx=_LOAD)
+
+
+def starred(value: ast.expr) -> ast.Starred:
+    return node(ast.Starred, value=value, ctx=_LOAD)
+
+
+def call(func: t.Union[ast.expr, str],
+         *args: Value,
+         keywords: t.Optional[t.Mapping[str, ast.expr]] = None,
+         double_star: t.Optional[ast.expr] = None) -> ast.Call:
+    """Returns `func(*args, **keywords, **double_star)`.
+
+    A string `func` is a name.
+    """
+    kws = [node(ast.keyword, arg=k, value=v)
+           for k, v in (keywords or {}).items()]
+    if double_star is not None:
+        kws.append(node(ast.keyword, arg=None, value=double_star))
+    return node(ast.Call, func=name(func) if isinstance(func, str) else func,
+                args=[expr(a) for a in args], keywords=kws)
+
+
+_COMPARISONS = {
+    '==': ast.Eq, '!=': ast.NotEq, '<': ast.Lt, '<=': ast.LtE,
+    '>': ast.Gt, '>=': ast.GtE, 'in': ast.In, 'not in': ast.NotIn,
+    'is': ast.Is, 'is not': ast.IsNot,
+}
+
+
+def compare(left: Value, *pairs: t.Union[str, Value]) -> ast.Compare:
+    """Returns a comparison, such as `compare(a, '<=', b, '<', c)`."""
+    ops = [_COMPARISONS[t.cast(str, op)]() for op in pairs[::2]]
+    return node(ast.Compare, left=expr(left), ops=ops,
+                comparators=[expr(c) for c in pairs[1::2]])
+
+
+def minus(left: Value, right: Value) -> ast.BinOp:
+    return node(ast.BinOp, left=expr(left), op=ast.Sub(), right=expr(right))
+
+
+def not_(operand: ast.expr) -> ast.UnaryOp:
+    return node(ast.UnaryOp, op=ast.Not(), operand=operand)
+
+
+def tuple_(*elts: Value) -> ast.Tuple:
+    return node(ast.Tuple, elts=[expr(e) for e in elts], ctx=_LOAD)
+
+
+def list_(*elts: Value) -> ast.List:
+    return node(ast.List, elts=[expr(e) for e in elts], ctx=_LOAD)
+
+
+def dict_(items: t.Sequence[t.Tuple[Value, Value]] = ()) -> ast.Dict:
+    return node(ast.Dict, keys=[expr(k) for k, _ in items],
+                values=[expr(v) for _, v in items])
+
+
+def type_of(value: ast.expr) -> ast.Call:
+    return call('type', value)
+
+
+def _comprehension(target: t.Union[ast.expr, str],
+                   iterable: ast.expr,
+                   condition: t.Optional[ast.expr]) -> ast.comprehension:
+    return ast.comprehension(target=store(target), iter=iterable,
+                             ifs=[condition] if condition else [],
+                             is_async=0)
+
+
+def generator(element: ast.expr,
+              target: str,
+              iterable: ast.expr,
+              condition: ast.expr) -> ast.GeneratorExp:
+    """Returns `(element for target in iterable if condition)`."""
+    return node(ast.GeneratorExp, elt=element,
+                generators=[_comprehension(target, iterable, condition)])
+
+
+def list_comp(element: ast.expr,
+              target: t.Union[ast.expr, str],
+              iterable: ast.expr,
+              condition: t.Optional[ast.expr] = None) -> ast.ListComp:
+    """Returns `[element for target in iterable if condition]`."""
+    return node(ast.ListComp, elt=element,
+                generators=[_comprehension(target, iterable, condition)])
+
+
+def dict_comp(key: ast.expr,
+              value: ast.expr,
+              target: t.Union[ast.expr, str],
+              iterable: ast.expr) -> ast.DictComp:
+    """Returns `{key: value for target in iterable}`."""
+    return node(ast.DictComp, key=key, value=value,
+                generators=[_comprehension(target, iterable, None)])
+
+
+def fstring(*parts: t.Union[str, ast.expr]) -> ast.JoinedStr:
+    """Returns an f-string of literal text and formatted expressions.
+
+    Use `formatted` for a conversion such as `!r`.
+    """
+    values: t.List[ast.expr] = []
+    for part in parts:
+        if isinstance(part, str):
+            values.append(expr(part))
+        elif isinstance(part, ast.FormattedValue):
+            values.append(part)
+        else:
+            values.append(formatted(part))
+    return node(ast.JoinedStr, values=values)
+
+
+def formatted(value: ast.expr, conversion: str = '') -> ast.FormattedValue:
+    return node(ast.FormattedValue, value=value,
+                conversion=ord(conversion) if conversion else -1,
+                format_spec=None)
+
+
+def assign(target: t.Union[ast.expr, str], value: Value) -> ast.Assign:
+    return node(ast.Assign, targets=[store(target)], value=expr(value))
+
+
+def add_to(target: str, amount: Value) -> ast.AugAssign:
+    return node(ast.AugAssign,
+                target=node(ast.Name, id=target, ctx=_STORE),
+                op=ast.Add(), value=expr(amount))
+
+
+def call_stmt(value: ast.expr) -> ast.Expr:
+    return node(ast.Expr, value=value)
+
+
+def pass_() -> ast.Pass:
+    return node(ast.Pass)
+
+
+def return_(value: ast.expr) -> ast.Return:
+    return node(ast.Return, value=value)
+
+
+def if_(test: ast.expr,
+        body: t.List[ast.stmt],
+        orelse: t.Optional[t.List[ast.stmt]] = None) -> ast.If:
+    return node(ast.If, test=test, body=body, orelse=orelse or [])
+
+
+def arguments(*names: str,
+              annotations: t.Sequence[t.Optional[str]] = (),
+              defaults: t.Sequence[Value] = ()) -> ast.arguments:
+    """Returns positional parameters, annotated by closure variables.
+
+    As in a `def`, `defaults` are for the last parameters.
+    """
+    annotations = list(annotations) or [None] * len(names)
+    return ast.arguments(
+        posonlyargs=[],
+        args=[node(ast.arg, arg=p, annotation=name(a) if a else None)
+              for p, a in zip(names, annotations)],
+        vararg=None, kwonlyargs=[], kw_defaults=[], kwarg=None,
+        defaults=[expr(d) for d in defaults])
+
+
+def function_def(func_name: str,
+                 args: ast.arguments,
+                 body: t.List[ast.stmt]) -> ast.FunctionDef:
+    func = node(ast.FunctionDef, name=func_name, args=args, body=body,
+                decorator_list=[], returns=None)
+    if 'type_params' in ast.FunctionDef._fields:  # Python 3.12+
+        func.type_params = []  # type: ignore
+    return func
+
+
+def raise_(exc: ast.expr,
+           cause: t.Optional[ast.expr] = None) -> ast.Raise:
+    return node(ast.Raise, exc=exc, cause=cause)
+
+
+def type_error(*message: t.Union[str, ast.expr],
+               cause: t.Optional[ast.expr] = None) -> ast.Raise:
+    """Returns `raise TypeError(f'...') from cause`."""
+    return raise_(call('TypeError', fstring(*message)), cause)
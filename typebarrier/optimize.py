@@ -0,0 +1,472 @@
+"""
+Peephole optimizations for generated converter code.
+
+`codegen` favors simple, composable output over fast output: every nested
+conversion gets its own `try` block which re-raises a friendlier TypeError,
+results are passed through temporary variables and lists are built with
+`.append`. The passes here rewrite the parsed module before it's compiled:
+
+* `try` blocks which only re-raise a TypeError are dropped when an enclosing
+  `try` would replace that error with its own anyway.
+* `if x: ... else: raise ...` is flattened to `if not x: raise ...`.
+* Temporaries assigned and then read once by the next statement are
+  replaced by the assigned expression.
+* Loops which only append to a new list (or set keys of a new dict) become
+  comprehensions.
+* `type(x)` is computed once per variable instead of once per check.
+* Global and builtin names are bound as closure variables.
+
+None of these change what a converter returns or which error it raises,
+only how fast it does so.
+"""
+import ast
+import builtins
+import collections
+import typing as t
+
+from . import nodes
+
+
+Block = t.List[ast.stmt]
+
+# Exceptions which would catch a TypeError.
+_TYPE_ERROR_CATCHERS = {'TypeError', 'Exception', 'BaseException'}
+
+_TERMINAL = (ast.Raise, ast.Return, ast.Continue, ast.Break)
+
+_BIND_FUNCTION = '__typebarrier_bind'
+
+
+def _map_blocks(node: ast.AST, func: t.Callable[[Block], Block]) -> None:
+    """Replaces each statement list under node with `func(list)`.
+
+    Inner lists are rewritten before the lists containing them. Expressions
+    never hold statements, so only statements are descended into.
+    """
+    for field in ('body', 'orelse', 'finalbody', 'handlers'):
+        block = getattr(node, field, None)
+        if not isinstance(block, list) or not block:
+            continue
+        for child in block:
+            _map_blocks(child, func)
+        if isinstance(block[0], ast.stmt):
+            setattr(node, field, func(block))
+
+
+def _names(node: ast.AST, ctx: t.Type[ast.expr_context]) -> t.List[str]:
+    return [n.id for n in ast.walk(node)
+            if isinstance(n, ast.Name) and isinstance(n.ctx, ctx)]
+
+
+def _name_counts(node: ast.AST) -> t.Tuple[t.Counter[str], t.Counter[str]]:
+    """Counts how often each name is loaded and stored, in one walk."""
+    loads: t.Counter[str] = collections.Counter()
+    stores: t.Counter[str] = collections.Counter()
+    for n in ast.walk(node):
+        if isinstance(n, ast.Name):
+            if isinstance(n.ctx, ast.Load):
+                loads[n.id] += 1
+            else:
+                stores[n.id] += 1
+    return loads, stores
+
+
+def _is_pure(node: ast.expr) -> bool:
+    """True for expressions which can't raise or have side effects."""
+    return isinstance(node, (ast.Name, ast.Constant))
+
+
+# Dropping redundant try blocks
+
+
+def _catches_type_error(node: ast.Try) -> bool:
+    for handler in node.handlers:
+        if handler.type is None:
+            return True
+        types = (handler.type.elts if isinstance(handler.type, ast.Tuple)
+                 else [handler.type])
+        if any(isinstance(t, ast.Name) and t.id in _TYPE_ERROR_CATCHERS
+               for t in types):
+            return True
+    return False
+
+
+def _rewraps_type_error(node: ast.Try) -> bool:
+    """True for `try: ... except TypeError as e: raise TypeError(...)`.
+
+    The new error's arguments mustn't use the caught error, so that it makes
+    no difference which TypeError was caught.
+    """
+    if node.orelse or node.finalbody or len(node.handlers) != 1:
+        return False
+    handler = node.handlers[0]
+    if not (isinstance(handler.type, ast.Name)
+            and handler.type.id == 'TypeError'
+            and len(handler.body) == 1
+            and isinstance(handler.body[0], ast.Raise)):
+        return False
+    exc = handler.body[0].exc
+    if not (isinstance(exc, ast.Call) and isinstance(exc.func, ast.Name)
+            and exc.func.id == 'TypeError'):
+        return False
+    return handler.name not in _names(exc, ast.Load)
+
+
+def _drop_redundant_try(block: Block, covered: bool) -> Block:
+    """Removes try blocks whose TypeError would be replaced anyway.
+
+    `covered` is true when a TypeError raised in `block` is caught by an
+    enclosing `try` which replaces it with a TypeError of its own.
+    """
+    result: Block = []
+    for stmt in block:
+        if isinstance(stmt, ast.Try):
+            if _rewraps_type_error(stmt) and covered:
+                result.extend(_drop_redundant_try(stmt.body, True))
+                continue
+            body_covered = covered
+            if _catches_type_error(stmt):
+                body_covered = _rewraps_type_error(stmt)
+            stmt.body = _drop_redundant_try(stmt.body, body_covered)
+            for handler in stmt.handlers:
+                handler.body = _drop_redundant_try(handler.body, covered)
+            stmt.orelse = _drop_redundant_try(stmt.orelse, covered)
+            stmt.finalbody = _drop_redundant_try(stmt.finalbody, covered)
+        elif isinstance(stmt, (ast.FunctionDef, ast.ClassDef)):
+            stmt.body = _drop_redundant_try(stmt.body, False)
+        else:
+            for field in ('body', 'orelse'):
+                inner = getattr(stmt, field, None)
+                if isinstance(inner, list):
+                    setattr(stmt, field, _drop_redundant_try(inner, covered))
+        result.append(stmt)
+    return result
+
+
+# Flattening if / else
+
+
+def _flatten_ifs(block: Block) -> Block:
+    result: Block = []
+    for stmt in block:
+        if (isinstance(stmt, ast.If) and stmt.orelse
+                and isinstance(stmt.orelse[-1], _TERMINAL)
+                and not isinstance(stmt.body[-1], _TERMINAL)):
+            # if x: A else: raise  ->  if not x: raise; A
+            result.append(nodes.if_(_negate(stmt.test), stmt.orelse))
+            result.extend(stmt.body)
+        elif (isinstance(stmt, ast.If) and stmt.orelse
+                and isinstance(stmt.body[-1], _TERMINAL)):
+            # if x: raise else: B  ->  if x: raise; B
+            result.append(nodes.if_(stmt.test, stmt.body))
+            result.extend(stmt.orelse)
+        else:
+            result.append(stmt)
+    return result
+
+
+def _negate(test: ast.expr) -> ast.expr:
+    if isinstance(test, ast.UnaryOp) and isinstance(test.op, ast.Not):
+        return test.operand
+    return nodes.not_(test)
+
+
+# Removing temporaries
+
+
+class _Replace(ast.NodeTransformer):
+    def __init__(self, name: str, expr: ast.expr) -> None:
+        self.name = name
+        self.expr = expr
+
+    def visit_Name(self, node: ast.Name) -> ast.expr:  # noqa: N802
+        if node.id == self.name and isinstance(node.ctx, ast.Load):
+            return self.expr
+        return node
+
+
+def _first_read(node: ast.AST) -> t.Optional[ast.AST]:
+    """Returns what's evaluated first in a statement or expression.
+
+    Only follows calls where the function is a name or a name's attribute,
+    as in `x.append(y)` or `f(**y)`, since looking those up has no effects.
+    """
+    if isinstance(node, (ast.Assign, ast.Return, ast.Expr)):
+        return _first_read(node.value) if node.value else None
+    if isinstance(node, ast.Starred):
+        return _first_read(node.value)
+    if isinstance(node, ast.Call) and (
+            isinstance(node.func, ast.Name)
+            or (isinstance(node.func, ast.Attribute)
+                and isinstance(node.func.value, ast.Name))):
+        if node.args:
+            return _first_read(node.args[0])
+        if node.keywords:
+            return _first_read(node.keywords[0].value)
+        return None
+    return node
+
+
+def _has_scope(node: ast.AST) -> bool:
+    return any(isinstance(n, (ast.Lambda, ast.FunctionDef, ast.ListComp,
+                              ast.DictComp, ast.SetComp, ast.GeneratorExp))
+               for n in ast.walk(node))
+
+
+_COMPOUND = (ast.If, ast.For, ast.While, ast.Try, ast.With, ast.FunctionDef)
+
+
+def _remove_temporaries(func: ast.FunctionDef) -> bool:
+    loads, stores = _name_counts(func)
+    params = {a.arg for a in func.args.args}
+    changed = False
+
+    def visit(block: Block) -> Block:
+        nonlocal changed
+        result: Block = []
+        index = 0
+        while index < len(block):
+            stmt = block[index]
+            following = block[index + 1] if index + 1 < len(block) else None
+            if (following is not None
+                    and isinstance(stmt, ast.Assign)
+                    and len(stmt.targets) == 1
+                    and isinstance(stmt.targets[0], ast.Name)):
+                name = stmt.targets[0].id
+                value = stmt.value
+                first = _first_read(following)
+                # Pure values may be moved anywhere in a simple statement;
+                # anything else only to where it's read first.
+                replaceable = (
+                    loads[name] == 1 and stores[name] == 1
+                    and name not in params
+                    and ((isinstance(first, ast.Name) and first.id == name)
+                         or (_is_pure(value)
+                             and not isinstance(following, _COMPOUND)
+                             and not _has_scope(following)
+                             and name in _names(following, ast.Load))))
+                if replaceable:
+                    result.append(_Replace(name, value).visit(following))
+                    changed = True
+                    index += 2
+                    continue
+            result.append(stmt)
+            index += 1
+        return result
+
+    _map_blocks(func, visit)
+    return changed
+
+
+# Building comprehensions
+
+
+def _comprehension_for(loop: ast.For,
+                       result_name: str,
+                       loads: t.Counter[str]) -> t.Optional[ast.expr]:
+    """Returns a comprehension equivalent to `loop`, or None."""
+    if loop.orelse or len(loop.body) != 1:
+        return None
+    if not isinstance(loop.target, (ast.Name, ast.Tuple)):
+        return None
+    loop_names = _names(loop.target, ast.Store)
+    # The loop variables mustn't be used once the loop is done, since they
+    # don't escape a comprehension.
+    inside = collections.Counter(_names(loop, ast.Load))
+    if any(loads[n] != inside[n] for n in loop_names):
+        return None
+    if result_name in _names(loop.iter, ast.Load):
+        return None
+
+    stmt = loop.body[0]
+    if (isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call)
+            and isinstance(stmt.value.func, ast.Attribute)
+            and isinstance(stmt.value.func.value, ast.Name)
+            and stmt.value.func.value.id == result_name
+            and stmt.value.func.attr == 'append'
+            and len(stmt.value.args) == 1 and not stmt.value.keywords):
+        element = stmt.value.args[0]
+        if result_name in _names(element, ast.Load):
+            return None
+        return nodes.list_comp(element, loop.target, loop.iter)
+    if (isinstance(stmt, ast.Assign) and len(stmt.targets) == 1
+            and isinstance(stmt.targets[0], ast.Subscript)
+            and isinstance(stmt.targets[0].value, ast.Name)
+            and stmt.targets[0].value.id == result_name):
+        key = stmt.targets[0].slice
+        value = stmt.value
+        # A comprehension evaluates the key first, an assignment the value,
+        # so at least one of them has to be free of side effects.
+        if not (_is_pure(key) or _is_pure(value)):
+            return None
+        if result_name in _names(key, ast.Load) + _names(value, ast.Load):
+            return None
+        return nodes.dict_comp(key, value, loop.target, loop.iter)
+    return None
+
+
+def _build_comprehensions(func: ast.FunctionDef) -> bool:
+    loads, _ = _name_counts(func)
+    changed = False
+
+    def visit(block: Block) -> Block:
+        nonlocal changed
+        result: Block = []
+        for stmt in block:
+            previous = result[-1] if result else None
+            if (isinstance(stmt, ast.For)
+                    and isinstance(previous, ast.Assign)
+                    and len(previous.targets) == 1
+                    and isinstance(previous.targets[0], ast.Name)
+                    and isinstance(previous.value, (ast.List, ast.Dict))
+                    and not getattr(previous.value, 'elts', None)
+                    and not getattr(previous.value, 'keys', None)):
+                comprehension = _comprehension_for(
+                    stmt, previous.targets[0].id, loads)
+                expected = (ast.ListComp if isinstance(previous.value,
+                                                       ast.List)
+                            else ast.DictComp)
+                if isinstance(comprehension, expected):
+                    previous.value = comprehension
+                    changed = True
+                    continue
+            result.append(stmt)
+        return result
+
+    _map_blocks(func, visit)
+    return changed
+
+
+# Computing type(x) once
+
+
+def _is_type_call(node: ast.AST) -> t.Optional[str]:
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+            and node.func.id == 'type' and len(node.args) == 1
+            and isinstance(node.args[0], ast.Name) and not node.keywords):
+        return node.args[0].id
+    return None
+
+
+class _ReplaceTypeCalls(ast.NodeTransformer):
+    def __init__(self, names: t.Dict[str, str]) -> None:
+        self.names = names
+
+    def visit_Call(self, node: ast.Call) -> ast.expr:  # noqa: N802
+        self.generic_visit(node)
+        name = _is_type_call(node)
+        if name in self.names:
+            return nodes.name(self.names[name])
+        return node
+
+
+def _hoist_type_calls(func: ast.FunctionDef) -> None:
+    counts: t.Counter[str] = collections.Counter()
+    stores: t.Counter[str] = collections.Counter()
+    loaded: t.Set[str] = set()
+    # Names bound inside comprehensions belong to another scope.
+    nested: t.Set[str] = set()
+    raising: t.Set[int] = set()
+    for node in ast.walk(func):
+        if isinstance(node, ast.Name):
+            if isinstance(node.ctx, ast.Load):
+                loaded.add(node.id)
+            else:
+                stores[node.id] += 1
+        elif isinstance(node, ast.Raise):
+            # Calls in `raise` statements run at most once, so they aren't
+            # counted.
+            raising.update(id(n) for n in ast.walk(node))
+        elif isinstance(node, (ast.ListComp, ast.DictComp, ast.SetComp,
+                               ast.GeneratorExp)):
+            nested.update(name for g in node.generators
+                          for name in _names(g.target, ast.Store))
+        else:
+            name = _is_type_call(node)
+            if name and id(node) not in raising:
+                counts[name] += 1
+    params = {a.arg for a in func.args.args}
+    used = loaded | set(stores) | params
+
+    hoisted: t.Dict[str, str] = {}
+    for name, count in counts.items():
+        if count < 2 or name in nested:
+            continue
+        if not ((name in params and name not in stores)
+                or (name not in params and stores.get(name) == 1)):
+            continue
+        type_name = f'{name}_type'
+        while type_name in used:
+            type_name += '_'
+        used.add(type_name)
+        hoisted[name] = type_name
+    if not hoisted:
+        return
+
+    _ReplaceTypeCalls(hoisted).visit(func)
+
+    def type_assign(name: str) -> ast.stmt:
+        return nodes.assign(hoisted[name], nodes.type_of(nodes.name(name)))
+
+    def visit(block: Block) -> Block:
+        result: Block = []
+        for stmt in block:
+            result.append(stmt)
+            if isinstance(stmt, ast.Assign):
+                for name in _names(stmt, ast.Store):
+                    if name in hoisted and name not in params:
+                        result.append(type_assign(name))
+            elif isinstance(stmt, ast.For):
+                for name in _names(stmt.target, ast.Store):
+                    if name in hoisted:
+                        stmt.body.insert(0, type_assign(name))
+        return result
+
+    _map_blocks(func, visit)
+    func.body[:0] = [type_assign(name) for name in hoisted if name in params]
+
+
+# Binding globals
+
+
+def _bind_globals(module: ast.Module,
+                  func: ast.FunctionDef,
+                  namespace: t.Dict[str, t.Any]) -> None:
+    """Wraps func in a factory so globals become closure variables.
+
+    Names in `namespace` and builtins are passed to the factory, so inside
+    the function they're read with a cheap closure lookup.
+    """
+    loads, stores = _name_counts(func)
+    local = set(stores) | {a.arg for a in func.args.args}
+    free = [name for name in loads
+            if name not in local
+            and (name in namespace or hasattr(builtins, name))]
+    if not free:
+        return
+
+    factory = nodes.function_def(
+        _BIND_FUNCTION, nodes.arguments(*free),
+        [func, nodes.return_(nodes.name(func.name))])
+    bind = nodes.assign(func.name, nodes.call(
+        _BIND_FUNCTION, *[nodes.name(name) for name in free]))
+    index = module.body.index(func)
+    module.body[index:index + 1] = [factory, bind]
+
+
+def optimize(module: ast.Module, namespace: t.Dict[str, t.Any]) -> ast.Module:
+    """Optimizes each top level function in a generated module in place.
+
+    `namespace` is the dictionary the module will be executed in.
+    """
+    for func in [s for s in module.body if isinstance(s, ast.FunctionDef)]:
+        func.body = _drop_redundant_try(func.body, False)
+        _map_blocks(func, _flatten_ifs)
+        for _ in range(4):
+            changed = _remove_temporaries(func)
+            changed = _build_comprehensions(func) or changed
+            if not changed:
+                break
+        _hoist_type_calls(func)
+        _bind_globals(module, func, namespace)
+    return module
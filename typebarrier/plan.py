@@ -0,0 +1,156 @@
+"""
+Plans for converting to each target, worked out once and shared by engines.
+
+Every engine makes the same decisions about a target: is it `Any`, does
+the registry have a converter for it, is it an enum, a record, a union, a
+list or dictionary, a class whose instances are kept as they are, and how
+is it called otherwise. `plan` makes them once per target and returns a
+`Plan`; the dynamic and iterative engines interpret it and `codegen` writes
+code from it, so a change to the decisions applies to every engine.
+
+Nested targets, such as the element type of a list, are referred to by
+target rather than by plan, and planned when they're first needed. That
+keeps plans for recursive types finite.
+"""
+import functools
+import typing as t
+
+from . import choices
+from . import introspect
+from . import records
+from . import registry
+
+
+ANY = 'any'
+# Converted by `converter`, from the registry.
+CONVERTER = 'converter'
+# `choices` is the `choices.EnumInfo`.
+ENUM = 'enum'
+# `choices` is the frozenset of allowed values, from `choices.literal_keys`.
+LITERAL = 'literal'
+# Built from the fields of `record`.
+TYPED_DICT = 'typed dict'
+# Instances of `cls` are kept; otherwise built from `record`'s fields.
+NAMED_TUPLE = 'named tuple'
+# Converted to `args[0]`.
+NEW_TYPE = 'new type'
+# Converted to one of `args`.
+UNION = 'union'
+# Each element converted to `args[0]`.
+LIST = 'list'
+# Each key and value converted to `args`.
+DICT = 'dict'
+# Instances of `cls` are kept, anything else is passed to `call`. For
+# dataclasses, `record` has the fields too.
+INSTANCE = 'instance'
+# Anything which isn't a class, such as a function, is passed to `call`.
+CALL = 'call'
+
+
+class Call(t.NamedTuple):
+    """How values are passed to a callable target."""
+
+    # The parameters which can be passed by keyword, in order. A dictionary
+    # is matched against these.
+    fields: records.Record
+    # The annotation of `**kwargs`, or None if there isn't one, in which
+    # case keys which aren't fields aren't accepted.
+    extras: t.Any
+    # How many of `fields` can be passed positionally, from the start.
+    positional: int
+    # The name and annotation of `*args`, if there is one.
+    var_positional: t.Optional[records.Field]
+    # Anything other than a dictionary is passed as the sole argument, if
+    # there's exactly one field. This is its annotation, which is `Any` if
+    # it has none or if it's the target itself.
+    sole: t.Any
+
+
+class Plan(t.NamedTuple):
+    kind: str
+    target: t.Any
+    cls: t.Optional[type] = None
+    args: t.Tuple[t.Any, ...] = ()
+    record: t.Optional[records.Record] = None
+    # None for INSTANCE and CALL if the target has no signature.
+    call: t.Optional[Call] = None
+    converter: t.Optional[registry.Converter] = None
+    choices: t.Any = None
+
+
+@functools.lru_cache(maxsize=None)
+def call(target: t.Any) -> Call:
+    """Returns how values are passed to `target`.
+
+    Raises ValueError if `target` has no signature.
+    """
+    sig = introspect.signature(target)
+    fields, extras = records.keyword_parameters(sig)
+    positional = 0
+    var_positional = None
+    for p in sig.parameters.values():
+        if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD):
+            positional += 1
+        elif p.kind == p.VAR_POSITIONAL:
+            annotation = t.Any if p.annotation is p.empty else p.annotation
+            var_positional = records.Field(p.name, annotation)
+    sole = t.Any
+    if len(fields.fields) == 1:
+        annotation = fields.fields[0].annotation
+        if annotation and annotation != target:
+            sole = annotation
+    return Call(fields, extras, positional, var_positional, sole)
+
+
+def _call_or_none(target: t.Any) -> t.Optional[Call]:
+    try:
+        return call(target)
+    except ValueError:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def plan(target: t.Any) -> Plan:
+    """Returns the plan for converting to `target`."""
+    if target == t.Any:
+        return Plan(ANY, target)
+
+    converter = registry.lookup(target)
+    if converter is not None:
+        return Plan(CONVERTER, target, converter=converter)
+
+    enum_info = choices.enum_info(target)
+    if enum_info is not None:
+        return Plan(ENUM, target, cls=target, choices=enum_info)
+    literal_keys = choices.literal_keys(target)
+    if literal_keys is not None:
+        return Plan(LITERAL, target, choices=literal_keys)
+
+    record = records.record_info(target)
+    if record is not None and record.kind == records.TYPED_DICT:
+        return Plan(TYPED_DICT, target, record=record)
+    elif record is not None and record.kind == records.NAMED_TUPLE:
+        return Plan(NAMED_TUPLE, target, cls=target, record=record)
+
+    info = introspect.describe(target)
+    if info.kind == introspect.NEW_TYPE:
+        return Plan(NEW_TYPE, target, args=info.args)
+    elif info.kind == introspect.UNION:
+        return Plan(UNION, target, args=info.args)
+    elif info.kind == introspect.LIST:
+        return Plan(LIST, target, cls=info.cls, args=info.args)
+    elif info.kind == introspect.DICT:
+        return Plan(DICT, target, cls=info.cls, args=info.args)
+    elif info.cls is not None:
+        return Plan(INSTANCE, target, cls=info.cls, record=record,
+                    call=_call_or_none(target))
+    return Plan(CALL, target, call=_call_or_none(target))
+
+
+def clear_cache() -> None:
+    """Forgets every plan, such as after registering a converter."""
+    call.cache_clear()
+    plan.cache_clear()
+
+
+registry.default.on_change(clear_cache)
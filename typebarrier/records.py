@@ -0,0 +1,142 @@
+"""
+Recognizes record-like targets: dataclasses, NamedTuples and TypedDicts.
+
+These declare their fields up front, so rather than calling
+`inspect.signature` for every value the field metadata is read once per type
+and cached here.
+"""
+import dataclasses
+import functools
+import inspect
+import typing as t
+
+
+DATACLASS = 'dataclass'
+NAMED_TUPLE = 'named tuple'
+TYPED_DICT = 'typed dict'
+
+# Used as the default of required fields, like `inspect.Parameter`.
+empty = inspect.Parameter.empty
+
+
+class Field(t.NamedTuple):
+    name: str
+    annotation: t.Any
+    default: t.Any = empty
+
+    @property
+    def required(self) -> bool:
+        return self.default is empty
+
+
+class Record(t.NamedTuple):
+    kind: str
+    fields: t.Tuple[Field, ...]
+    # Named tuples whose `__new__` hasn't been overridden are created with
+    # `tuple.__new__` directly, skipping the generated Python `__new__`.
+    fast_new: bool = False
+
+    @property
+    def names(self) -> t.FrozenSet[str]:
+        return frozenset(f.name for f in self.fields)
+
+    def make(self, target: t.Any, kwargs: t.Dict[str, t.Any]) -> t.Any:
+        """Creates an instance of target from converted field values."""
+        if self.kind == TYPED_DICT:
+            return kwargs
+        elif self.kind == NAMED_TUPLE:
+            values = tuple(kwargs.get(f.name, f.default) for f in self.fields)
+            if self.fast_new:
+                return tuple.__new__(target, values)
+            return target(*values)
+        else:
+            return target(**kwargs)
+
+
+def _type_hints(target: t.Any) -> t.Dict[str, t.Any]:
+    try:
+        return t.get_type_hints(target)
+    except Exception:
+        # Forward references which can't be resolved; treat them as Any.
+        return {}
+
+
+def _is_typed_dict(target: t.Any) -> bool:
+    return (issubclass(target, dict)
+            and hasattr(target, '__total__')
+            and hasattr(target, '__annotations__'))
+
+
+def _typed_dict(target: t.Any) -> Record:
+    hints = _type_hints(target)
+    required = getattr(target, '__required_keys__', None)
+    if required is None:
+        required = set(hints) if target.__total__ else set()
+    # Optional keys are simply left out, so their "default" is never used.
+    fields = tuple(Field(name, hints.get(name, t.Any),
+                         empty if name in required else None)
+                   for name in target.__annotations__)
+    return Record(TYPED_DICT, fields)
+
+
+def _named_tuple(target: t.Any) -> Record:
+    hints = _type_hints(target)
+    defaults = getattr(target, '_field_defaults', {})
+    fields = tuple(Field(name, hints.get(name, t.Any),
+                         defaults.get(name, empty))
+                   for name in target._fields)
+    base = next(c for c in target.__mro__ if '_fields' in c.__dict__)
+    return Record(NAMED_TUPLE, fields, fast_new=target.__new__ is base.__new__)
+
+
+def _dataclass(target: t.Any) -> Record:
+    hints = _type_hints(target)
+    fields = []
+    for f in dataclasses.fields(target):
+        if not f.init:
+            continue
+        if f.default is not dataclasses.MISSING:
+            default = f.default
+        elif f.default_factory is not dataclasses.MISSING:  # type: ignore
+            default = f.default_factory  # type: ignore
+        else:
+            default = empty
+        fields.append(Field(f.name, hints.get(f.name, t.Any), default))
+    return Record(DATACLASS, tuple(fields))
+
+
+@functools.lru_cache(maxsize=None)
+def record_info(target: t.Any) -> t.Optional[Record]:
+    """Returns the fields of target if it's a record type, otherwise None.
+
+    For dataclasses the default of a field using `default_factory` is the
+    factory itself; it's only used to tell whether the field is required.
+    """
+    if not inspect.isclass(target):
+        return None
+    if _is_typed_dict(target):
+        return _typed_dict(target)
+    if issubclass(target, tuple) and hasattr(target, '_fields'):
+        return _named_tuple(target)
+    if dataclasses.is_dataclass(target):
+        return _dataclass(target)
+    return None
+
+
+def keyword_parameters(sig: inspect.Signature) -> t.Tuple[Record, t.Any]:
+    """Returns the parameters of `sig` other than `*args` and `**kwargs`, as
+    the fields of a record, and the annotation of `**kwargs`.
+
+    Unannotated parameters are given the annotation `Any`. The annotation
+    returned for `**kwargs` is None if there isn't one, as then extra keys
+    aren't accepted.
+    """
+    fields = []
+    extras = None
+    for p in sig.parameters.values():
+        if p.kind == p.VAR_KEYWORD:
+            extras = t.Any if p.annotation is p.empty else p.annotation
+        elif p.kind != p.VAR_POSITIONAL:
+            annotation = t.Any if p.annotation is p.empty else p.annotation
+            fields.append(Field(p.name, annotation, p.default))
+    return Record('kwargs', tuple(fields)), extras
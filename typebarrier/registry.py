@@ -0,0 +1,170 @@
+"""
+Custom conversions for types which can't be built from their `__init__`.
+
+A converter is a callable taking the incoming value and returning an instance
+of the target type. It should raise TypeError or ValueError if the value
+can't be converted.
+
+Converters are found for a target, in order:
+
+* by looking up the exact target type in those passed to `register`,
+* by calling a `__typebarrier_convert__` classmethod on the target,
+* by asking each predicate passed to `register_predicate`.
+
+What's found is remembered per target, so the dynamic engine does one dict
+lookup per value and generated code calls the converter directly. Modules
+which cache plans or converters built from what's found subscribe to the
+default registry with `on_change`, so registering a converter late forgets
+them all. Converters already returned by `inline.convert_value` keep the
+code they were compiled with, though.
+"""
+import datetime
+import decimal
+import typing as t
+import uuid
+
+
+Converter = t.Callable[[t.Any], t.Any]
+
+PROTOCOL_ATTR = '__typebarrier_convert__'
+
+
+class Registry:
+    """Maps targets to the converters used for them."""
+
+    def __init__(self) -> None:
+        self._types: t.Dict[t.Any, Converter] = {}
+        self._predicates: t.List[t.Tuple[t.Callable[[t.Any], bool],
+                                         t.Callable[[t.Any], Converter]]] = []
+        self._resolved: t.Dict[t.Any, t.Optional[Converter]] = {}
+        self._listeners: t.List[t.Callable[[], None]] = []
+
+    def on_change(self, listener: t.Callable[[], None]) -> None:
+        """Calls `listener` whenever a converter or predicate is registered,
+        so that it can forget anything built from earlier lookups."""
+        self._listeners.append(listener)
+
+    def _changed(self) -> None:
+        self._resolved.clear()
+        for listener in self._listeners:
+            listener()
+
+    def register(self, target: t.Any, converter: Converter) -> None:
+        """Uses `converter` whenever the target is exactly `target`."""
+        self._types[target] = converter
+        self._changed()
+
+    def register_predicate(self,
+                           predicate: t.Callable[[t.Any], bool],
+                           factory: t.Callable[[t.Any], Converter]) -> None:
+        """For targets where `predicate(target)` is true, use a converter.
+
+        The converter is created by calling `factory(target)`, once per
+        target.
+        """
+        self._predicates.append((predicate, factory))
+        self._changed()
+
+    def _resolve(self, target: t.Any) -> t.Optional[Converter]:
+        if target in self._types:
+            return self._types[target]
+        protocol = getattr(target, PROTOCOL_ATTR, None)
+        if protocol is not None:
+            return t.cast(Converter, protocol)
+        for predicate, factory in self._predicates:
+            if predicate(target):
+                return factory(target)
+        return None
+
+    def lookup(self, target: t.Any) -> t.Optional[Converter]:
+        """Returns the converter for `target`, or None if there isn't one."""
+        try:
+            return self._resolved[target]
+        except KeyError:
+            converter = self._resolve(target)
+            self._resolved[target] = converter
+            return converter
+
+
+def convert_datetime(value: t.Any) -> datetime.datetime:
+    """Accepts datetimes or ISO 8601 strings."""
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value)
+    raise TypeError(f'expected an ISO 8601 string, got {type(value)}')
+
+
+def convert_date(value: t.Any) -> datetime.date:
+    """Accepts dates or ISO 8601 strings."""
+    if isinstance(value, datetime.date):
+        return value
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    raise TypeError(f'expected an ISO 8601 string, got {type(value)}')
+
+
+def convert_uuid(value: t.Any) -> uuid.UUID:
+    """Accepts UUIDs or their string form."""
+    if isinstance(value, uuid.UUID):
+        return value
+    if isinstance(value, str):
+        return uuid.UUID(value)
+    raise TypeError(f'expected a UUID string, got {type(value)}')
+
+
+def convert_decimal(value: t.Any) -> decimal.Decimal:
+    """Accepts decimals, strings, ints and floats.
+
+    Floats are converted from their shortest repr, so 0.1 becomes
+    Decimal('0.1') rather than the exact binary value.
+    """
+    if isinstance(value, decimal.Decimal):
+        return value
+    if isinstance(value, bool):
+        raise TypeError(f'expected a number, got {type(value)}')
+    if isinstance(value, float):
+        value = repr(value)
+    if isinstance(value, (str, int)):
+        try:
+            return decimal.Decimal(value)
+        except decimal.InvalidOperation:
+            raise ValueError(f'invalid decimal "{value}"') from None
+    raise TypeError(f'expected a number, got {type(value)}')
+
+
+default = Registry()
+default.register(datetime.datetime, convert_datetime)
+default.register(datetime.date, convert_date)
+default.register(uuid.UUID, convert_uuid)
+default.register(decimal.Decimal, convert_decimal)
+
+
+def register(target: t.Any,
+             converter: t.Optional[Converter] = None) -> t.Any:
+    """Registers a converter for `target` in the default registry.
+
+    Can also be used as a decorator on the converter:
+
+        @registry.register(Money)
+        def parse_money(value: t.Any) -> Money:
+            ...
+    """
+    if converter is None:
+        def decorator(func: Converter) -> Converter:
+            default.register(target, func)
+            return func
+        return decorator
+    default.register(target, converter)
+    return converter
+
+
+def register_predicate(predicate: t.Callable[[t.Any], bool],
+                       factory: t.Callable[[t.Any], Converter]) -> None:
+    """Registers a predicate in the default registry."""
+    default.register_predicate(predicate, factory)
+
+
+def lookup(target: t.Any) -> t.Optional[Converter]:
+    """Returns the converter for `target` in the default registry."""
+    return default.lookup(target)
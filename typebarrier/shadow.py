@@ -0,0 +1,189 @@
+"""
+Checks compiled converters against the dynamic engine on real traffic.
+
+`dynamic` is the reference behavior and the generated code is meant to
+behave identically, only faster. `shadow` returns a compiled converter which,
+for a sample of calls, also converts the value with `dynamic.convert_value`
+and compares the two outcomes: equal results, or errors of the same type.
+Disagreements are passed to a hook, while the caller always gets what the
+compiled converter returned or raised.
+
+With a sample rate of zero `shadow` returns the compiled converter itself,
+so shadowing costs nothing once it's turned off.
+
+A sampled value is converted twice, so each engine builds its own result.
+Iterators can only be read once: one passed as the value is copied with
+`itertools.tee`, and values holding iterators aren't sampled at all.
+Targets which are functions rather than classes are never shadowed, since
+calling them twice may do whatever they do twice. Classes are, so their
+constructors had better not have side effects.
+"""
+import collections.abc
+import itertools
+import random
+import threading
+import typing as t
+
+from . import dynamic
+from . import inline
+from . import plan
+
+
+class Outcome(t.NamedTuple):
+    result: t.Any = None
+    # What converting raised, in which case `result` is None.
+    error: t.Optional[Exception] = None
+
+
+class Mismatch(t.NamedTuple):
+    target: t.Any
+    value: t.Any
+    compiled: Outcome
+    reference: Outcome
+
+
+Hook = t.Callable[[Mismatch], None]
+
+
+class ShadowStats(t.NamedTuple):
+    sampled: int
+    mismatches: int
+
+
+def same(left: t.Any, right: t.Any) -> bool:
+    """Returns True if two converted results are structurally equal.
+
+    Both must be of exactly the same type, with the same elements, items or
+    attributes, compared the same way. Anything else is compared with `==`,
+    except that NaN is the same as NaN.
+    """
+    if left is right:
+        return True
+    if type(left) is not type(right):
+        return False
+    if isinstance(left, dict):
+        return (left.keys() == right.keys()
+                and all(same(v, right[k]) for k, v in left.items()))
+    if isinstance(left, (list, tuple)):
+        return (len(left) == len(right)
+                and all(same(a, b) for a, b in zip(left, right)))
+    state = getattr(left, '__dict__', None)
+    slots = getattr(type(left), '__slots__', ())
+    if state is not None or slots:
+        if isinstance(slots, str):
+            slots = (slots,)
+        missing = object()
+        return (same(state, getattr(right, '__dict__', None))
+                and all(same(getattr(left, s, missing),
+                             getattr(right, s, missing)) for s in slots))
+    if left != left and right != right:
+        return True
+    return bool(left == right)
+
+
+def _outcome(convert: inline.Converter, value: t.Any) -> Outcome:
+    try:
+        return Outcome(convert(value))
+    except Exception as e:
+        return Outcome(error=e)
+
+
+def _holds_iterator(value: t.Any) -> bool:
+    """Returns True if an iterator is found within lists, tuples and
+    dictionaries in `value`."""
+    if isinstance(value, collections.abc.Iterator):
+        return True
+    if isinstance(value, dict):
+        return any(map(_holds_iterator, value.values()))
+    if isinstance(value, (list, tuple)):
+        return any(map(_holds_iterator, value))
+    return False
+
+
+def _agree(compiled: Outcome, reference: Outcome) -> bool:
+    if compiled.error is not None or reference.error is not None:
+        return type(compiled.error) is type(reference.error)
+    return same(compiled.result, reference.result)
+
+
+class Shadowed:
+    """Wraps a compiled converter, also converting a fraction `rate` of
+    values with the dynamic engine and calling `on_mismatch` when they
+    disagree.
+
+    Errors raised by `on_mismatch` are passed on to the caller.
+    """
+
+    def __init__(self,
+                 target: t.Any,
+                 converter: inline.Converter,
+                 rate: float,
+                 on_mismatch: Hook,
+                 reference: inline.Converter,
+                 sample: t.Callable[[], float] = random.random) -> None:
+        self._target = target
+        self._converter = converter
+        self._rate = rate
+        self._on_mismatch = on_mismatch
+        self._reference = reference
+        self._sample = sample
+        self._lock = threading.Lock()
+        self._sampled = 0
+        self._mismatches = 0
+
+    def __call__(self, value: t.Any) -> t.Any:
+        # Calls which aren't sampled aren't counted, so they never wait on
+        # the lock.
+        if self._sample() >= self._rate:
+            return self._converter(value)
+
+        copy = value
+        if isinstance(value, collections.abc.Iterator):
+            value, copy = itertools.tee(value)
+        elif _holds_iterator(value):
+            return self._converter(value)
+
+        compiled = _outcome(self._converter, value)
+        reference = _outcome(self._reference, copy)
+        agree = _agree(compiled, reference)
+        with self._lock:
+            self._sampled += 1
+            if not agree:
+                self._mismatches += 1
+        if not agree:
+            self._on_mismatch(
+                Mismatch(self._target, value, compiled, reference))
+        if compiled.error is not None:
+            raise compiled.error
+        return compiled.result
+
+    def stats(self) -> ShadowStats:
+        with self._lock:
+            return ShadowStats(self._sampled, self._mismatches)
+
+
+def shadow(target: t.Any,
+           rate: float,
+           on_mismatch: Hook,
+           sample: t.Callable[[], float] = random.random,
+           **options: t.Any) -> inline.Converter:
+    """Returns an `inline.convert_value` converter for `target`, shadowed by
+    the dynamic engine for a fraction `rate` of calls.
+
+    `sample` returns a number in [0, 1) for each call, which is shadowed if
+    it's below `rate`. Options are passed to `inline.convert_value`; a
+    `budget` is also kept to by the dynamic engine. Targets which are
+    functions aren't shadowed, and get the compiled converter.
+    """
+    converter = inline.convert_value(target, **options)
+    if rate <= 0 or plan.plan(target).kind == plan.CALL:
+        return converter
+
+    limits = options.get('budget')
+
+    def reference(value: t.Any) -> t.Any:
+        if limits is not None:
+            return dynamic.convert_within(target, value, limits)
+        return dynamic.convert_value(target, value)
+
+    return Shadowed(target, converter, rate, on_mismatch, reference, sample)
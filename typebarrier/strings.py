@@ -0,0 +1,267 @@
+"""
+Converts rows of strings, such as those read from CSV files, to objects.
+
+Every cell of a CSV file is a string, which the other engines would pass
+to `int` and the like through the general rules for calling a class, cell
+by cell, when they don't reject it outright. Here each column is given a
+parser from the annotation of its field once, and `row_converter` compiles
+a function for a header which parses each cell of a row and calls the
+target with them directly:
+
+    def convert(row):
+        return Volume(row[0], int(row[1]), zone=parse_zone(row[2]))
+
+Integers, floats, bools, dates, datetimes, enums and literals have fast
+parsers. Empty cells are None for optional fields. Anything else is
+converted from the string by `inline.convert_value`.
+
+`convert_rows` streams rows, for instance from a `csv.reader`, and
+`read_csv` reads a file. Errors say which row and column they came from.
+"""
+import ast
+import csv
+import datetime
+import functools
+import typing as t
+
+from . import codegen as cg
+from . import inline
+from . import nodes as n
+from . import plan
+from . import records
+from . import registry
+
+
+T = t.TypeVar('T')
+
+Parser = t.Callable[[str], t.Any]
+
+TRUE = frozenset(['true', 't', 'yes', 'y', '1'])
+FALSE = frozenset(['false', 'f', 'no', 'n', '0'])
+
+# The usual spellings, looked up before anything is stripped or lowered.
+_BOOLS = {**{s: True for s in TRUE}, **{s: False for s in FALSE},
+          'True': True, 'False': False, 'TRUE': True, 'FALSE': False}
+
+
+def parse_bool(value: str) -> bool:
+    """Parses `true`, `yes`, `1` and so on, in any case."""
+    parsed = _BOOLS.get(value)
+    if parsed is not None:
+        return parsed
+    lowered = value.strip().lower()
+    if lowered in TRUE:
+        return True
+    if lowered in FALSE:
+        return False
+    raise ValueError(f'invalid bool "{value}"')
+
+
+_PARSERS: t.Dict[t.Any, Parser] = {
+    int: int,
+    float: float,
+    bool: parse_bool,
+    datetime.date: datetime.date.fromisoformat,
+    datetime.datetime: datetime.datetime.fromisoformat,
+}
+
+# Parsers above replace these converters, which do the same for strings
+# more slowly, but not converters registered instead.
+_REPLACED = {
+    datetime.date: registry.convert_date,
+    datetime.datetime: registry.convert_datetime,
+}
+
+
+def _lookup_parser(table: t.Dict[str, t.Any], target: t.Any) -> Parser:
+    def parse(value: str) -> t.Any:
+        try:
+            return table[value]
+        except KeyError:
+            raise ValueError(f'"{value}" is not one of {target}') from None
+    return parse
+
+
+def _optional_parser(parse: t.Optional[Parser]) -> Parser:
+    def parse_optional(value: str) -> t.Any:
+        if value == '':
+            return None
+        return value if parse is None else parse(value)
+    return parse_optional
+
+
+@functools.lru_cache(maxsize=None)
+def parser(target: t.Any) -> t.Optional[Parser]:
+    """Returns a function parsing a cell for `target`, or None if cells
+    are used as they are."""
+    fast = _PARSERS.get(target)
+    p = plan.plan(target)
+    if fast is not None and (p.kind != plan.CONVERTER
+                             or p.converter is _REPLACED.get(target)):
+        return fast
+
+    if p.kind == plan.ANY:
+        return None
+    elif p.kind == plan.NEW_TYPE:
+        return parser(p.args[0])
+    elif p.kind == plan.ENUM:
+        members = p.choices.members
+        # By value as a string, or else by name.
+        table = {m.name: m for m in members.values()}
+        table.update((str(v), m) for v, m in members.items())
+        return _lookup_parser(table, target)
+    elif p.kind == plan.LITERAL:
+        return _lookup_parser({str(v): v for _, v in p.choices}, target)
+    elif p.kind == plan.UNION and type(None) in p.args:
+        others = tuple(a for a in p.args if a is not type(None))
+        if len(others) == 1:
+            return _optional_parser(parser(others[0]))
+    elif p.kind == plan.INSTANCE and p.cls is not None and issubclass(
+            str, p.cls):
+        return None
+    return inline.convert_value(target)
+
+
+def clear_cache() -> None:
+    """Forgets the parser for each target."""
+    parser.cache_clear()
+
+
+registry.default.on_change(clear_cache)
+
+
+def _fields(target: t.Any,
+            ) -> t.Tuple[t.Tuple[records.Field, ...], int, t.Any]:
+    """Returns the fields of `target`, how many can be passed positionally
+    and the annotation of `**kwargs`, or None."""
+    p = plan.plan(target)
+    if p.kind == plan.TYPED_DICT and p.record is not None:
+        return p.record.fields, 0, None
+    if p.kind == plan.NAMED_TUPLE and p.record is not None:
+        return p.record.fields, len(p.record.fields), None
+    if p.call is None:
+        raise TypeError(f'can\'t convert rows to {target}.')
+    return p.call.fields.fields, p.call.positional, p.call.extras
+
+
+def _convert_row(code: cg.CodeGen,
+                 target: t.Any,
+                 arg_var: ast.expr,
+                 header: t.Tuple[str, ...]) -> None:
+    """Writes code building `target` from a row of strings in the order of
+    `header`."""
+    fields, positional, extras = _fields(target)
+    by_name = {f.name: f for f in fields}
+    unknown = [name for name in header if name not in by_name]
+    if unknown and extras is None:
+        raise TypeError('the following parameters not accepted for '
+                        f'"{target}" : {unknown}')
+    missing = [f.name for f in fields if f.required and f.name not in header]
+    if missing:
+        raise TypeError(f'missing a required argument: {missing[0]}')
+
+    target_var_name = code.inject_closure_var(target)
+    with code.if_(n.compare(n.call('len', arg_var), '!=', len(header))):
+        code.add(n.type_error(f'expected {len(header)} cells, got ',
+                              n.call('len', arg_var)))
+
+    cells = {}
+    for index, name in enumerate(header):
+        parse = parser(by_name[name].annotation if name in by_name
+                       else extras)
+        cell: ast.expr = n.subscript(arg_var, index)
+        if parse is not None:
+            cell = n.call(code.inject_closure_var(parse), cell)
+        cells[name] = cell
+
+    if plan.plan(target).kind == plan.TYPED_DICT:
+        code.add_return(n.dict_(list(cells.items())))
+        return
+    # Positional up to the first field missing from the header.
+    args = []
+    for f in fields[:positional]:
+        if f.name not in cells:
+            break
+        args.append(cells.pop(f.name))
+    keywords = {name: cells.pop(name) for name in list(cells)
+                if name in by_name}
+    # Whatever's left goes to `**kwargs`.
+    extra = n.dict_(list(cells.items())) if cells else None
+    code.add_return(n.call(target_var_name, *args, keywords=keywords,
+                           double_star=extra))
+
+
+def row_converter(target: t.Callable[..., T],
+                  header: t.Tuple[str, ...],
+                  ) -> t.Callable[[t.Sequence[str]], T]:
+    """Returns a function converting a row of strings, whose columns are
+    named by `header`, to `target`.
+
+    It's compiled once per target and header by
+    `inline.compile_generated`. Raises TypeError if the
+    header lacks a required field or has one the target doesn't accept.
+    The function raises ValueError or TypeError for cells which can't be
+    parsed, without saying which; `convert_rows` finds that out.
+    """
+    return t.cast(t.Callable[[t.Sequence[str]], T], inline.compile_generated(
+        ('strings.row_converter', header),
+        functools.partial(_convert_row, header=header), target))
+
+
+def _explain(target: t.Any,
+             header: t.Tuple[str, ...],
+             row: t.Sequence[str],
+             error: Exception) -> str:
+    """Works out which cell of a row couldn't be converted."""
+    fields, _, extras = _fields(target)
+    annotations = {f.name: f.annotation for f in fields}
+    if len(row) == len(header):
+        for name, cell in zip(header, row):
+            parse = parser(annotations.get(name, extras))
+            if parse is None:
+                continue
+            try:
+                parse(cell)
+            except (TypeError, ValueError) as e:
+                return f'column "{name}": can\'t convert "{cell}": {e}'
+    return str(error)
+
+
+def convert_rows(target: t.Callable[..., T],
+                 rows: t.Iterable[t.Sequence[str]],
+                 header: t.Optional[t.Sequence[str]] = None,
+                 ) -> t.Iterator[T]:
+    """Converts each row of strings to `target`, as they're read.
+
+    `rows` can be a `csv.reader`. Its first row is the header naming the
+    field of each column, unless `header` is given. Raises TypeError for a
+    row which can't be converted, giving its number, counting the header
+    as row 1 if it was read.
+    """
+    rows = iter(rows)
+    start = 1
+    if header is None:
+        header = next(rows, None)
+        if header is None:
+            return
+        start = 2
+    names = tuple(header)
+    convert = row_converter(target, names)
+    for number, row in enumerate(rows, start):
+        # Only errors converting the row are about the row; those reading
+        # it, or raised where it's yielded, pass through.
+        try:
+            result = convert(row)
+        except (TypeError, ValueError) as e:
+            raise TypeError(f'row {number}: {_explain(target, names, row, e)}'
+                            ) from e
+        yield result
+
+
+def read_csv(target: t.Callable[..., T],
+             path: str,
+             **fmtparams: t.Any) -> t.Iterator[T]:
+    """Reads a CSV file with a header row, converting each other row to
+    `target`. `fmtparams` are passed to `csv.reader`."""
+    with open(path, newline='') as f:
+        yield from convert_rows(target, csv.reader(f, **fmtparams))
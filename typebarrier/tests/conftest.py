@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from typebarrier import dynamic
+from typebarrier import inline
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skips tests using the `benchmark` fixture unless TYPIFY_BENCHMARK is
+    set, as the benchmarks in test_dynamic are."""
+    if os.environ.get('TYPIFY_BENCHMARK') == 'true':
+        return
+    skip = pytest.mark.skip(
+        reason='benchmarks only run with TYPIFY_BENCHMARK')
+    for item in items:
+        if 'benchmark' in getattr(item, 'fixturenames', ()):
+            item.add_marker(skip)
+
+
+class DynamicEngine:
+
+    @staticmethod
+    def converter(target, budget=None):
+        if budget is None:
+            return lambda value: dynamic.convert_value(target, value)
+        return lambda value: dynamic.convert_within(target, value, budget)
+
+    @staticmethod
+    def validator(target):
+        return lambda value: dynamic.validate(target, value)
+
+
+class InlineEngine:
+
+    @staticmethod
+    def converter(target, budget=None):
+        if budget is None:
+            return inline.convert_value(target)
+        return inline.convert_value(target, budget=budget)
+
+    @staticmethod
+    def validator(target):
+        return inline.validate(target)
+
+
+@pytest.fixture(params=[DynamicEngine, InlineEngine],
+                ids=['dynamic', 'inline'])
+def engine(request):
+    """Runs a test with each engine, giving functions from `converter` and
+    `validator` which take just the value."""
+    return request.param
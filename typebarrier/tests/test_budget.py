@@ -0,0 +1,121 @@
+import typing as t
+
+import pytest
+
+from typebarrier import budget
+from typebarrier import dynamic
+from typebarrier import inline
+
+
+class Track:
+    def __init__(self, title: str, length: int) -> None:
+        self.title = title
+        self.length = length
+
+
+class Album:
+    def __init__(self, name: str, **tracks: Track) -> None:
+        self.name = name
+        self.tracks = tracks
+
+
+def album(track_count):
+    value = {'name': 'Album'}
+    for n in range(track_count):
+        value[f't{n}'] = {'title': f'Track {n}', 'length': n}
+    return value
+
+
+# album(2) has 7 elements, 2 levels, 19 characters and 2 extra keys.
+def test_within_budget(engine):
+    limits = budget.Budget(max_elements=7, max_depth=2, max_string_bytes=19,
+                           max_extra_keys=2)
+    result = engine.converter(Album, limits)(album(2))
+    assert sorted(track.title for track in result.tracks.values()) == [
+        'Track 0', 'Track 1']
+
+
+@pytest.mark.parametrize('limits', [
+    budget.Budget(max_elements=6),
+    budget.Budget(max_depth=1),
+    budget.Budget(max_string_bytes=18),
+    budget.Budget(max_extra_keys=1),
+])
+def test_over_budget(engine, limits):
+    with pytest.raises(budget.BudgetExceeded) as excinfo:
+        engine.converter(Album, limits)(album(2))
+    limit = next(name for name, v in limits._asdict().items() if v)
+    assert excinfo.value.limit == limit
+    assert excinfo.value.budget == getattr(limits, limit)
+
+
+def test_counts_are_per_call(engine):
+    convert = engine.converter(Album, budget.Budget(max_elements=7))
+    for _ in range(3):
+        convert(album(2))
+
+
+class Playlist:
+    def __init__(self, tracks: t.List[Track]) -> None:
+        self.tracks = tracks
+
+
+def test_iterables_without_a_length(engine):
+    def tracks(count):
+        for n in range(count):
+            yield {'title': f'Track {n}', 'length': n}
+
+    convert = engine.converter(Playlist, budget.Budget(max_elements=10))
+    # 1 for the playlist, and 1 for each track and 2 for its fields.
+    assert len(convert({'tracks': tracks(3)}).tracks) == 3
+    with pytest.raises(budget.BudgetExceeded) as excinfo:
+        convert({'tracks': tracks(4)})
+    assert excinfo.value.limit == budget.ELEMENTS
+
+
+class Folder:
+    def __init__(self, name: str, folders: 't.List[Folder]') -> None:
+        self.name = name
+        self.folders = folders
+
+
+def folders(depth):
+    value = {'name': 'leaf', 'folders': []}
+    for _ in range(depth):
+        value = {'name': 'folder', 'folders': [value]}
+    return value
+
+
+def test_recursive_targets(engine):
+    # Each folder is a dictionary holding a list.
+    convert = engine.converter(Folder, budget.Budget(max_depth=6))
+    assert convert(folders(2)).folders[0].folders[0].name == 'leaf'
+    with pytest.raises(budget.BudgetExceeded) as excinfo:
+        convert(folders(3))
+    assert excinfo.value.limit == budget.DEPTH
+
+
+def test_recursive_targets_need_a_max_depth_to_compile():
+    with pytest.raises(ValueError):
+        inline.convert_value(Folder, budget=budget.Budget(max_elements=10))
+
+
+def test_no_budget_outside_convert_within():
+    limits = budget.Budget(max_elements=1)
+    with pytest.raises(budget.BudgetExceeded):
+        dynamic.convert_within(Album, album(1), limits)
+    assert dynamic.convert_value(Album, album(1)).tracks['t0'].length == 0
+
+
+@pytest.mark.parametrize('limits', [None, budget.Budget(
+    max_elements=10 ** 6, max_depth=10, max_string_bytes=10 ** 6,
+    max_extra_keys=10)])
+@pytest.mark.parametrize('engine', ['dynamic', 'inline'])
+def test_benchmark_budget_overhead(engine, limits, benchmark):
+    value = album(100)
+    if engine == 'dynamic' and limits is None:
+        benchmark(dynamic.convert_value, Album, value)
+    elif engine == 'dynamic':
+        benchmark(dynamic.convert_within, Album, value, limits)
+    else:
+        benchmark(inline.convert_value(Album, budget=limits), value)
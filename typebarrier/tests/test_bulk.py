@@ -0,0 +1,129 @@
+import dataclasses
+import datetime
+import enum
+import json
+import typing as t
+
+import pytest
+
+from typebarrier import bulk
+
+
+class Kind(enum.Enum):
+    SSD = 'ssd'
+    HDD = 'hdd'
+
+
+@dataclasses.dataclass
+class Volume:
+    id: str
+    size: int
+    kind: Kind = Kind.SSD
+    made: t.Optional[datetime.date] = None
+    tags: t.List[str] = dataclasses.field(default_factory=list)
+
+
+def write_lines(path, lines):
+    path.write_text(''.join(line + '\n' for line in lines))
+    return str(path)
+
+
+@pytest.fixture
+def small_shards(monkeypatch):
+    monkeypatch.setattr(bulk, 'MIN_SHARD_SIZE', 64)
+
+
+def test_load_target():
+    assert bulk.load_target('typebarrier.bulk:Report') is bulk.Report
+    assert bulk.load_target('datetime:datetime.min') == datetime.datetime.min
+    with pytest.raises(ValueError):
+        bulk.load_target('typebarrier.bulk')
+
+
+@pytest.mark.parametrize('data', [
+    b'', b'a', b'a\n', b'\n\n\n', b'ab\ncd\nef', b'a\nbcdefgh\ni\n',
+])
+@pytest.mark.parametrize('count', [1, 2, 3, 10])
+def test_shards_are_whole_lines(data, count):
+    ranges = bulk.shards(data, count)
+    assert len(ranges) <= max(count, 1)
+    assert b''.join(data[start:end] for start, end in ranges) == data
+    for start, end in ranges[:-1]:
+        assert data[end - 1:end] == b'\n'
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_convert_file(tmp_path, small_shards, workers):
+    lines = []
+    for i in range(200):
+        if i % 50 == 7:
+            lines.append(json.dumps({'id': f'v{i}', 'size': 'big'}))
+        elif i % 60 == 11:
+            lines.append('')
+        else:
+            lines.append(json.dumps({'id': f'v{i}', 'size': i}))
+    lines.append('{not json')
+    path = write_lines(tmp_path / 'volumes.jsonl', lines)
+
+    report = bulk.convert_file(Volume, path, workers=workers)
+    assert report.lines == 197
+    assert report.converted == 192
+    assert [e.line for e in report.errors] == [8, 58, 108, 158, 201]
+    assert '"big"' in report.errors[0].message
+
+
+def test_lines_nested_too_deeply_are_errors(tmp_path):
+    deep = '[' * 100_000 + ']' * 100_000
+    path = write_lines(tmp_path / 'volumes.jsonl', [
+        json.dumps({'id': 'a', 'size': 1}), deep,
+        json.dumps({'id': 'b', 'size': 2})])
+    report = bulk.convert_file(Volume, path, workers=1)
+    assert (report.lines, report.converted) == (3, 2)
+    assert [e.line for e in report.errors] == [2]
+
+
+def test_output_is_normalized_in_order(tmp_path, small_shards):
+    lines = [json.dumps({'id': f'v{i}', 'size': i, 'kind': 'hdd',
+                         'made': '2020-01-02'}) for i in range(100)]
+    path = write_lines(tmp_path / 'volumes.jsonl', lines)
+    output = str(tmp_path / 'out.jsonl')
+
+    report = bulk.convert_file(Volume, path, workers=2, output=output)
+    assert report.converted == 100
+    with open(output) as f:
+        written = [json.loads(line) for line in f]
+    assert written == [{'id': f'v{i}', 'size': i, 'kind': 'hdd',
+                        'made': '2020-01-02', 'tags': []} for i in range(100)]
+
+
+def test_empty_file(tmp_path):
+    path = write_lines(tmp_path / 'empty.jsonl', [])
+    assert bulk.convert_file(Volume, path) == bulk.Report(0, 0, [])
+
+
+class Pair(t.NamedTuple):
+    left: int
+    right: int
+
+
+class Point:
+    def __init__(self, x: int) -> None:
+        self.x = x
+
+
+@pytest.mark.parametrize('value, expected', [
+    (Pair(1, 2), {'left': 1, 'right': 2}),
+    ({'a': [Kind.SSD, (1, 2)]}, {'a': ['ssd', [1, 2]]}),
+    (Point(3), {'x': 3}),
+    (datetime.datetime(2020, 1, 2, 3), '2020-01-02T03:00:00'),
+])
+def test_normalize(value, expected):
+    assert bulk.normalize(value) == expected
+
+
+@pytest.mark.parametrize('workers', [1, None])
+def test_benchmark_convert_file(tmp_path, workers, benchmark):
+    path = write_lines(tmp_path / 'volumes.jsonl', [
+        json.dumps({'id': f'v{i}', 'size': i, 'kind': 'hdd',
+                    'tags': ['a', 'b']}) for i in range(1_000_000)])
+    benchmark.pedantic(bulk.convert_file, (Volume, path, workers), rounds=1)
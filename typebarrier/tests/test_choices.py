@@ -0,0 +1,145 @@
+import enum
+import typing as t
+
+import pytest
+
+from typebarrier import choices
+from typebarrier import dynamic
+from typebarrier import inline
+
+
+def inline_convert(target, value):
+    return inline.convert_value(target)(value)
+
+
+def interned_convert(target, value):
+    return inline.convert_value(target, intern_literals=True)(value)
+
+
+engines = pytest.mark.parametrize(
+    'convert', [dynamic.convert_value, inline_convert, interned_convert],
+    ids=['dynamic', 'inline', 'interned'])
+
+
+class Status(enum.Enum):
+    ACTIVE = 'active'
+    DELETED = 'deleted'
+
+
+class Priority(enum.IntEnum):
+    LOW = 1
+    HIGH = 2
+
+
+class Shape(enum.Enum):
+    SQUARE = [4]
+    TRIANGLE = [3]
+
+
+class Permission(enum.Flag):
+    READ = 1
+    WRITE = 2
+
+
+class Colour(enum.Enum):
+    RED = 'red'
+
+    @classmethod
+    def _missing_(cls, value):
+        if isinstance(value, str) and value.lower() == 'red':
+            return cls.RED
+        return None
+
+
+Mode = t.Literal['r', 'w', 'rw']
+
+
+class Volume:
+    def __init__(self, status: Status, mode: Mode) -> None:
+        self.status = status
+        self.mode = mode
+
+
+def test_tables():
+    info = choices.enum_info(Status)
+    assert info.members == {'active': Status.ACTIVE,
+                            'deleted': Status.DELETED}
+    assert not info.needs_call
+    assert choices.enum_info(Shape).needs_call
+    assert choices.enum_info(Permission).needs_call
+    assert choices.enum_info(Colour).needs_call
+    assert choices.enum_info(str) is None
+
+    assert choices.literal_values(Mode) == frozenset(['r', 'w', 'rw'])
+    assert choices.literal_values(str) is None
+    assert choices.literal_keys(t.Literal[1, True]) == frozenset(
+        [(int, 1), (bool, True)])
+
+
+@engines
+def test_enum(convert):
+    assert convert(Status, 'active') is Status.ACTIVE
+    assert convert(Status, Status.DELETED) is Status.DELETED
+    assert convert(Priority, 2) is Priority.HIGH
+    assert convert(Priority, Priority.LOW) is Priority.LOW
+
+    with pytest.raises(TypeError) as excinfo:
+        convert(Status, 'ACTIVE')
+    assert 'can\'t convert "ACTIVE"' in str(excinfo.value)
+    with pytest.raises(TypeError):
+        convert(Status, ['active'])
+
+
+@engines
+def test_enum_needing_call(convert):
+    assert convert(Shape, [4]) is Shape.SQUARE
+    assert convert(Permission, 3) == Permission.READ | Permission.WRITE
+    assert convert(Colour, 'RED') is Colour.RED
+
+    with pytest.raises(TypeError):
+        convert(Colour, 'blue')
+    with pytest.raises(TypeError):
+        convert(Shape, [5])
+
+
+@engines
+def test_literal(convert):
+    assert convert(Mode, 'rw') == 'rw'
+    assert convert(t.Literal[1, 2], 2) == 2
+
+    with pytest.raises(TypeError) as excinfo:
+        convert(Mode, 'x')
+    assert 'can\'t convert "x"' in str(excinfo.value)
+    with pytest.raises(TypeError):
+        convert(Mode, ['r'])
+
+
+@engines
+def test_literals_keep_their_types(convert):
+    # True == 1 == 1.0, but none of them is the other.
+    for target, value in [(t.Literal[0, 1], False), (t.Literal[0, 1], True),
+                          (t.Literal[1], 1.0), (t.Literal[1.0], 1)]:
+        with pytest.raises(TypeError):
+            convert(target, value)
+
+    assert type(convert(t.Literal[1, True], 1)) is int
+    assert convert(t.Literal[1, True], True) is True
+
+
+@engines
+def test_fields(convert):
+    volume = convert(Volume, {'status': 'deleted', 'mode': 'r'})
+    assert volume.status is Status.DELETED
+    assert volume.mode == 'r'
+
+    with pytest.raises(TypeError):
+        convert(Volume, {'status': 'deleted', 'mode': 'x'})
+
+
+def test_interned_literals_share_memory():
+    mode = ''.join(['r', 'w'])
+    literal_mode = t.get_args(Mode)[2]
+    assert mode is not literal_mode
+
+    assert interned_convert(Mode, mode) is literal_mode
+    assert inline_convert(Mode, mode) is mode
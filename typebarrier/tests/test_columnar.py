@@ -0,0 +1,118 @@
+import array
+import dataclasses
+import datetime
+import typing as t
+
+import pytest
+
+from typebarrier import columnar
+from typebarrier import dynamic
+
+
+class Volume:
+    def __init__(self,
+                 id: str,
+                 size: int,
+                 tags: t.Optional[t.List[str]] = None,
+                 *,
+                 zone: str = 'a') -> None:
+        self.id = id
+        self.size = size
+        self.tags = tags
+        self.zone = zone
+
+
+@dataclasses.dataclass
+class Reading:
+    sensor: str
+    value: float
+    at: t.Optional[datetime.date] = None
+    notes: t.List[str] = dataclasses.field(default_factory=list)
+
+
+class Pair(t.NamedTuple):
+    left: int
+    right: int = 0
+
+
+class Movie(t.TypedDict):
+    title: str
+
+
+def rows_of(value):
+    """Zips columns into a dictionary per row, the slow way."""
+    return [dict(zip(value, row)) for row in zip(*value.values())]
+
+
+@pytest.mark.parametrize('target, value', [
+    (Volume, {'id': ['a', 'b'], 'size': [1, 2]}),
+    (Volume, {'size': [1, 2], 'id': ['a', 'b'], 'zone': ['x', 'y']}),
+    (Volume, {'id': ['a', 'b'], 'size': [1, 2], 'tags': [['t'], None]}),
+    (Volume, {'id': [], 'size': []}),
+    (Reading, {'sensor': ['s', 't'], 'value': [1, 2.5],
+               'at': ['2020-01-01', None]}),
+    (Pair, {'left': [1, 2]}),
+    (Pair, {'right': [3, 4], 'left': [1, 2]}),
+    (Movie, {'title': ['Alien', 'Heat']}),
+])
+def test_rows_match_converting_each_row(target, value):
+    expected = [dynamic.convert_value(target, row) for row in rows_of(value)]
+    rows = columnar.convert_rows(target, value)
+    assert [vars(r) if hasattr(r, '__dict__') else r for r in rows] == [
+        vars(r) if hasattr(r, '__dict__') else r for r in expected]
+    assert [type(r) for r in rows] == [type(r) for r in expected]
+
+
+def test_list_targets():
+    rows = columnar.convert_rows(t.List[Pair], {'left': [1, 2]})
+    assert rows == [Pair(1), Pair(2)]
+
+
+def test_columns_are_checked_once_and_kept():
+    sizes = [1, 2, 3]
+    columns = columnar.convert_columns(Volume, {'id': ['a', 'b', 'c'],
+                                                'size': sizes})
+    assert columns['size'] is sizes
+
+
+@pytest.mark.parametrize('value, message', [
+    ({'id': ['a'], 'size': [1, 2]}, 'have different lengths'),
+    ({'size': [1]}, 'missing a required argument: id'),
+    ({'id': ['a', 'b'], 'size': [1, 'x']},
+     'problem converting row 1 of column "size"'),
+    ({'id': 'ab', 'size': [1, 2]}, 'expected a list for each column'),
+    ({'id': ['a'], 'size': [1], 'colour': ['red']}, 'not accepted'),
+    ([{'id': 'a', 'size': 1}], 'to columns of'),
+])
+def test_errors(value, message):
+    with pytest.raises(TypeError) as excinfo:
+        columnar.convert_rows(Volume, value)
+    assert message in str(excinfo.value)
+
+
+def test_typed_arrays():
+    columns = columnar.convert_columns(Reading, {
+        'sensor': ['s', 't'], 'value': [1, 2.5]}, arrays=True)
+    assert columns['value'] == array.array('d', [1.0, 2.5])
+    assert columns['sensor'] == ['s', 't']
+
+    columns = columnar.convert_columns(Pair, {'left': [1, 2 ** 70]},
+                                       arrays=True)
+    assert columns['left'] == [1, 2 ** 70]
+    assert columnar.convert_columns(Pair, {'left': [1, 2]}, arrays=True) == {
+        'left': array.array('q', [1, 2])}
+
+
+@pytest.mark.parametrize('mode', ['rows of dicts', 'columnar'])
+def test_benchmark_columnar(mode, benchmark):
+    from typebarrier import inline
+
+    count = 10000
+    value = {'id': [f'v{n}' for n in range(count)],
+             'size': list(range(count)),
+             'tags': [None] * count}
+    if mode == 'columnar':
+        benchmark(columnar.convert_rows, t.List[Volume], value)
+    else:
+        converter = inline.convert_value(t.List[Volume])
+        benchmark(lambda: converter(rows_of(value)))
@@ -0,0 +1,94 @@
+import pytest
+
+from typebarrier import dispatch
+from typebarrier import inline
+
+
+class Volume:
+    def __init__(self, id: str, size: int) -> None:
+        self.id = id
+        self.size = size
+
+
+def create_volume(name: str, size: int = 10) -> Volume:
+    return Volume(name, size)
+
+
+def resize_volume(volume: Volume, size: int) -> Volume:
+    return Volume(volume.id, size)
+
+
+def list_volumes() -> list:
+    return []
+
+
+HANDLERS = {
+    'create_volume': create_volume,
+    'resize_volume': resize_volume,
+    'list_volumes': list_volumes,
+}
+
+
+def test_dispatch():
+    d = dispatch.Dispatcher(HANDLERS)
+
+    volume = d({'method': 'create_volume', 'params': {'name': 'data'}})
+    assert (volume.id, volume.size) == ('data', 10)
+
+    volume = d({'method': 'create_volume', 'params': ['data', 20]})
+    assert (volume.id, volume.size) == ('data', 20)
+
+    volume = d({'method': 'resize_volume',
+                'params': {'volume': {'id': 'v', 'size': 1}, 'size': 5}})
+    assert (volume.id, volume.size) == ('v', 5)
+
+    assert d({'method': 'list_volumes'}) == []
+    assert d.call('list_volumes', {}) == []
+
+
+def test_custom_keys():
+    d = dispatch.Dispatcher(HANDLERS, method_key='op', params_key='args')
+    volume = d({'op': 'create_volume', 'args': ['data']})
+    assert volume.id == 'data'
+
+
+def test_errors():
+    d = dispatch.Dispatcher(HANDLERS)
+
+    with pytest.raises(LookupError) as excinfo:
+        d({'method': 'delete_everything', 'params': {}})
+    assert 'no handler for method "delete_everything"' in str(excinfo.value)
+
+    with pytest.raises(LookupError):
+        d({'method': ['create_volume'], 'params': {}})
+
+    with pytest.raises(TypeError) as excinfo:
+        d({'params': {}})
+    assert 'expected a dictionary with a "method" key' in str(excinfo.value)
+
+    with pytest.raises(TypeError):
+        d('create_volume')
+
+    with pytest.raises(TypeError):
+        d({'method': 'create_volume', 'params': {'name': 5}})
+
+
+def test_handlers_compile_lazily_and_once(monkeypatch):
+    compiled = []
+    real_compile_call = inline.compile_call
+
+    def compile_call(target, **kwargs):
+        compiled.append(target)
+        return real_compile_call(target, **kwargs)
+
+    monkeypatch.setattr(inline, 'compile_call', compile_call)
+
+    d = dispatch.Dispatcher(HANDLERS)
+    assert compiled == []
+
+    for size in range(3):
+        d({'method': 'create_volume', 'params': ['data', size]})
+    assert compiled == [create_volume]
+
+    d({'method': 'list_volumes'})
+    assert compiled == [create_volume, list_volumes]
@@ -1,3 +1,5 @@
+import collections.abc
+import itertools
 import os
 import typing as t
 
@@ -5,6 +7,7 @@ import pytest
 
 from typebarrier import dynamic
 from typebarrier import inline
+from typebarrier import iterative
 
 
 class DynamicCall:
@@ -20,6 +23,19 @@ class DynamicCall:
         return dynamic.convert_dictionary_to_kwargs(target, value)
 
 
+class IterativeCall:
+
+    @staticmethod
+    def convert_value(target: t.Type,
+                      value: t.Any) -> t.Callable[[t.Any], None]:
+        return iterative.convert_value(target, value)
+
+    @staticmethod
+    def convert_dictionary_to_kwargs(target: t.Type,
+                                     value: t.Any) -> dict:
+        return iterative.convert_dictionary_to_kwargs(target, value)
+
+
 class InlineCall:
 
     @staticmethod
@@ -33,8 +49,75 @@ class InlineCall:
         return inline.convert_dictionary_to_kwargs(target)(value)
 
 
+def _same(a: t.Any, b: t.Any) -> bool:
+    """Compares results, looking inside objects which don't define __eq__."""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(map(_same, a, b))
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    if type(a).__eq__ is object.__eq__ and hasattr(a, '__dict__'):
+        return _same(vars(a), vars(b))
+    return bool(a == b)
+
+
+def check_same_behavior(variant: t.Callable[[t.Any], t.Any],
+                        reference: t.Callable[[t.Any], t.Any],
+                        ) -> t.Callable[[t.Any], t.Any]:
+    """Runs a converter compiled by a variant of the engine and the
+    reference one, and checks they return or raise the same.
+
+    One-shot iterators are copied, so that both converters see every element.
+    """
+    def converter(value):
+        copy = value
+        if isinstance(value, collections.abc.Iterator):
+            value, copy = itertools.tee(value)
+        try:
+            expected = reference(copy)
+        except Exception as e:
+            with pytest.raises(type(e)) as excinfo:
+                variant(value)
+            assert str(excinfo.value) == str(e)
+            raise excinfo.value
+        result = variant(value)
+        assert _same(result, expected)
+        return result
+
+    return converter
+
+
+class OptimizerCheckCall:
+
+    @staticmethod
+    def convert_value(target: t.Type,
+                      value: t.Any) -> t.Callable[[t.Any], None]:
+        return OptimizerCheckProxy.convert_value(target)(value)
+
+    @staticmethod
+    def convert_dictionary_to_kwargs(target: t.Type,
+                                     value: t.Any) -> dict:
+        return OptimizerCheckProxy.convert_dictionary_to_kwargs(target)(value)
+
+
+class LazyCheckCall:
+
+    @staticmethod
+    def convert_value(target: t.Type,
+                      value: t.Any) -> t.Callable[[t.Any], None]:
+        return LazyCheckProxy.convert_value(target)(value)
+
+    @staticmethod
+    def convert_dictionary_to_kwargs(target: t.Type,
+                                     value: t.Any) -> dict:
+        return LazyCheckProxy.convert_dictionary_to_kwargs(target)(value)
+
+
 def everything(func):
-    return pytest.mark.parametrize('cnv', [DynamicCall, InlineCall])(func)
+    return pytest.mark.parametrize(
+        'cnv', [DynamicCall, IterativeCall, InlineCall,
+                OptimizerCheckCall, LazyCheckCall])(func)
 
 
 class DynamicProxyBM:
@@ -60,6 +143,29 @@ class DynamicProxyBM:
         return cb
 
 
+class IterativeProxyBM:
+
+    def __init__(self, benchmark):
+        self._benchmark = benchmark
+
+    def convert_value(self, target: t.Type) -> t.Callable[[t.Any], t.Any]:
+        def cb(value):
+            result = iterative.convert_value(target, value)
+            self._benchmark(iterative.convert_value, target, value)
+            return result
+
+        return cb
+
+    def convert_dictionary_to_kwargs(self, target: t.Type) -> dict:
+        def cb(value):
+            result = iterative.convert_dictionary_to_kwargs(target, value)
+            self._benchmark(
+                iterative.convert_dictionary_to_kwargs, target, value)
+            return result
+
+        return cb
+
+
 class InlineProxyBM:
 
     def __init__(self, benchmark):
@@ -98,6 +204,18 @@ class DynamicProxy:
             target, value)
 
 
+class IterativeProxy:
+
+    @staticmethod
+    def convert_value(target: t.Type) -> t.Callable[[t.Any], t.Any]:
+        return lambda value: iterative.convert_value(target, value)
+
+    @staticmethod
+    def convert_dictionary_to_kwargs(target: t.Type) -> dict:
+        return lambda value: iterative.convert_dictionary_to_kwargs(
+            target, value)
+
+
 class InlineProxy:
 
     @staticmethod
@@ -109,12 +227,46 @@ class InlineProxy:
         return inline.convert_dictionary_to_kwargs(target)
 
 
+class OptimizerCheckProxy:
+    """Compares inline converters with and without the optimizer."""
+
+    @staticmethod
+    def convert_value(target: t.Type) -> t.Callable[[t.Any], t.Any]:
+        return check_same_behavior(
+            inline.convert_value(target),
+            inline.convert_value(target, optimize=False))
+
+    @staticmethod
+    def convert_dictionary_to_kwargs(target: t.Type) -> dict:
+        return check_same_behavior(
+            inline.convert_dictionary_to_kwargs(target),
+            inline.convert_dictionary_to_kwargs(target, optimize=False))
+
+
+class LazyCheckProxy:
+    """Compares inline converters compiling branches lazily with those
+    compiling everything up front."""
+
+    @staticmethod
+    def convert_value(target: t.Type) -> t.Callable[[t.Any], t.Any]:
+        return check_same_behavior(inline.convert_value(target, lazy=True),
+                                   inline.convert_value(target))
+
+    @staticmethod
+    def convert_dictionary_to_kwargs(target: t.Type) -> dict:
+        return check_same_behavior(
+            inline.convert_dictionary_to_kwargs(target, lazy=True),
+            inline.convert_dictionary_to_kwargs(target))
+
+
 if os.environ.get('TYPIFY_BENCHMARK') == 'true':
     def do_both(func):
-        @pytest.mark.parametrize('cnv', ['dynamic', 'inline'])
+        @pytest.mark.parametrize('cnv', ['dynamic', 'iterative', 'inline'])
         def new_func(cnv, benchmark):
             if cnv == 'dynamic':
                 c = DynamicProxyBM(benchmark)
+            elif cnv == 'iterative':
+                c = IterativeProxyBM(benchmark)
             else:
                 c = InlineProxyBM(benchmark)
             return func(c)
@@ -122,12 +274,19 @@ if os.environ.get('TYPIFY_BENCHMARK') == 'true':
         return new_func
 else:
     def do_both(func):
-        @pytest.mark.parametrize('cnv', ['dynamic', 'inline'])
+        @pytest.mark.parametrize('cnv', ['dynamic', 'iterative', 'inline',
+                                         'optimizer', 'lazy'])
         def new_func(cnv):
             if cnv == 'dynamic':
                 c = DynamicProxy()
-            else:
+            elif cnv == 'iterative':
+                c = IterativeProxy()
+            elif cnv == 'inline':
                 c = InlineProxy()
+            elif cnv == 'optimizer':
+                c = OptimizerCheckProxy()
+            else:
+                c = LazyCheckProxy()
             return func(c)
 
         return new_func
@@ -342,6 +501,20 @@ def test_single_arg_class_init_from_wrong_type_fails(cnv):
             in str(excinfo.value))
 
 
+@do_both
+def test_unannotated_parameters_take_anything(cnv):
+
+    def some_func(value):
+        return f'value={value}'
+
+    def other_func(a, b):
+        return f'a={a}, b={b}'
+
+    assert cnv.convert_value(some_func)([1]) == 'value=[1]'
+    assert cnv.convert_value(some_func)({'value': 2}) == 'value=2'
+    assert cnv.convert_value(other_func)({'a': 1, 'b': 'x'}) == 'a=1, b=x'
+
+
 @everything
 def test_two_arg_func(cnv):
 
@@ -354,45 +527,47 @@ def test_two_arg_func(cnv):
     assert 'accepts 2 parameters, cannot create' in str(excinfo.value)
 
 
-def test_convert_list_to_kwargs():
-    cnv = dynamic
-
+@pytest.mark.parametrize('convert', [
+    dynamic.convert_list_to_kwargs,
+    lambda target, value: inline.convert_list_to_kwargs(target)(value),
+])
+def test_convert_list_to_kwargs(convert):
     def func(a: int, b: str) -> str:
         return f'a={a}, b={b}'
 
-    assert cnv.convert_list_to_kwargs(func, [1, 'a']) == {'a': 1, 'b': 'a'}
+    assert convert(func, [1, 'a']) == {'a': 1, 'b': 'a'}
 
     def func2(a: int, b: str, c: bool=False) -> str:
         return f'a={a}, b={b}, c={c}'
 
-    assert cnv.convert_list_to_kwargs(func2, [1, 'a', True]) == {
+    assert convert(func2, [1, 'a', True]) == {
         'a': 1, 'b': 'a', 'c': True}
 
-    assert cnv.convert_list_to_kwargs(func2, [1, 'a']) == {
+    assert convert(func2, [1, 'a']) == {
         'a': 1, 'b': 'a'}
 
     with pytest.raises(TypeError) as excinfo:
-        cnv.convert_list_to_kwargs(func2, [1])
+        convert(func2, [1])
 
     with pytest.raises(TypeError) as excinfo:
-        cnv.convert_list_to_kwargs(func2, [1, 'a', True, 4])
+        convert(func2, [1, 'a', True, 4])
 
     assert '3 positional argument(s) but 4 were given' in str(excinfo.value)
 
     def func3(*args) -> str:
         return ' '.join(args)
 
-    assert cnv.convert_list_to_kwargs(func3, []) == {'args': []}
+    assert convert(func3, []) == {'args': []}
 
-    assert cnv.convert_list_to_kwargs(func3, [1, 2, 3]) == {'args': [1, 2, 3]}
+    assert convert(func3, [1, 2, 3]) == {'args': [1, 2, 3]}
 
     def func4(*args: str) -> str:
         return ' '.join(args)
 
-    assert cnv.convert_list_to_kwargs(func4, []) == {'args': []}
+    assert convert(func4, []) == {'args': []}
 
     with pytest.raises(TypeError) as excinfo:
-        cnv.convert_list_to_kwargs(func4, [1, 2, 3])
+        convert(func4, [1, 2, 3])
 
     assert ('problem converting element 0 in a list of args for '
             in str(excinfo.value))
@@ -400,7 +575,7 @@ def test_convert_list_to_kwargs():
     def func0() -> str:
         return ':D'
 
-    assert cnv.convert_list_to_kwargs(func0, []) == {}
+    assert convert(func0, []) == {}
 
 
 @do_both
@@ -607,4 +782,49 @@ def test_convert_dict_to_class(cnv):
     assert disc.tracks[1].name == '2'
 
 
-# TODO: add a test for t.Optional types as well as Unions in general
+@everything
+@pytest.mark.parametrize('target, value, expected', [
+    (t.Optional[int], None, None),
+    (t.Optional[int], 3, 3),
+    (t.Union[float, int], 3, 3),
+    (t.Union[float, int], 2.5, 2.5),
+    (t.Union[NewTypeStr, t.List[str]], ('a', 'b'), ['a', 'b']),
+])
+def test_unions(cnv, target, value, expected):
+    result = cnv.convert_value(target, value)
+    assert result == expected
+    assert type(result) is type(expected)
+
+
+@everything
+def test_union_failures(cnv):
+    with pytest.raises(TypeError) as excinfo:
+        cnv.convert_value(t.Optional[int], 'three')
+    assert 'can\'t convert "three" (type <class \'str\'>) to ' in str(
+        excinfo.value)
+
+
+def test_handlers_are_resolved_once_per_value_type(monkeypatch):
+    dynamic.clear_cache()
+    resolved = []
+    real_resolve_handler = dynamic._resolve_handler
+
+    def resolve_handler(target, value_type):
+        resolved.append((target, value_type))
+        return real_resolve_handler(target, value_type)
+
+    monkeypatch.setattr(dynamic, '_resolve_handler', resolve_handler)
+
+    for name in ['a', 'b', 'c']:
+        assert dynamic.convert_value(Track, name) == Track(name)
+    assert resolved == [(Track, str), (str, str)]
+
+    assert dynamic.convert_value(Track, {'name': 'd'}) == Track('d')
+    assert resolved[2:] == [(Track, dict)]
+
+    # Failures depend on the value's type too, so they're remembered the
+    # same way.
+    for value in [1, 2]:
+        with pytest.raises(TypeError):
+            dynamic.convert_value(Track, value)
+    assert resolved[3:] == [(Track, int), (str, int)]
@@ -1,13 +1,22 @@
+import ast
+import inspect
+import threading
+import time
 import typing as t
 
 import pytest
 
+from typebarrier import budget
+from typebarrier import codegen as cg
+from typebarrier import dynamic
 from typebarrier import inline as i
 
 
 def test_convert_list():
     converter = i.convert_list(t.List[str])
     assert converter('123') == ['1', '2', '3']
+    with pytest.raises(ValueError, match='"<class \'int\'>" is not'):
+        i.convert_list(int)
 
 
 def test_noop():
@@ -34,3 +43,451 @@ def test_one_param_callable():
             in str(excinfo.value))
     assert ('accepts type <class \'int\'>; cannot be satisified with value 2'
             in str(excinfo.value))
+
+
+class Volume:
+    def __init__(self, id: str, size: int) -> None:
+        self.id = id
+        self.size = size
+
+
+class CountingLock:
+    """Wraps a lock and counts how often it is acquired."""
+
+    def __init__(self, lock):
+        self._lock = lock
+        self.acquired = 0
+
+    def __enter__(self):
+        self.acquired += 1
+        return self._lock.__enter__()
+
+    def __exit__(self, *args):
+        return self._lock.__exit__(*args)
+
+
+def test_threads_compile_once_and_read_without_locking(monkeypatch):
+    thread_count = 32
+    i.clear_cache()
+    compiled = []
+    real_compile_value = i._compile_value
+
+    def compile_value(target, *args):
+        compiled.append(target)
+        return real_compile_value(target, *args)
+
+    monkeypatch.setattr(i, '_compile_value', compile_value)
+
+    def convert_many(results, index):
+        barrier.wait()
+        for n in range(500):
+            volume = i.convert_value(Volume)({'id': f'{index}', 'size': n})
+            if volume.id != f'{index}' or volume.size != n:
+                results[index] = False
+                return
+        results[index] = True
+
+    def run_threads():
+        results = [None] * thread_count
+        threads = [threading.Thread(target=convert_many, args=(results, n))
+                   for n in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    # Cold start: every thread asks for the converter at the same moment.
+    barrier = threading.Barrier(thread_count)
+    assert run_threads() == [True] * thread_count
+    assert compiled == [Volume]
+
+    # Warm: the compiled converter must be found without touching a lock.
+    counting_lock = CountingLock(i._lock)
+    monkeypatch.setattr(i, '_lock', counting_lock)
+    barrier = threading.Barrier(thread_count)
+    assert run_threads() == [True] * thread_count
+    assert counting_lock.acquired == 0
+    assert compiled == [Volume]
+
+
+class TestCompileCall:
+
+    def test_dictionary(self):
+        def func(a: int, b: str, c: bool = False, *, d: int = 4) -> tuple:
+            return a, b, c, d
+
+        call = i.compile_call(func)
+        assert call({'a': 1, 'b': 'b'}) == (1, 'b', False, 4)
+        assert call({'a': 1, 'b': 'b', 'c': True, 'd': 5}) == (
+            1, 'b', True, 5)
+
+        with pytest.raises(TypeError) as excinfo:
+            call({'a': 1})
+        assert 'missing a required argument' in str(excinfo.value)
+        with pytest.raises(TypeError) as excinfo:
+            call({'a': 1, 'b': 'b', 'e': 5})
+        assert 'the following parameters not accepted for' in str(
+            excinfo.value)
+        with pytest.raises(TypeError):
+            call({'a': '1', 'b': 'b'})
+
+    def test_list(self):
+        def func(a: int, b: str = 'b', *, c: int = 3) -> tuple:
+            return a, b, c
+
+        call = i.compile_call(func)
+        assert call([1]) == (1, 'b', 3)
+        assert call((1, 'x')) == (1, 'x', 3)
+
+        with pytest.raises(TypeError) as excinfo:
+            call([1, 'x', 3])
+        assert '2 positional argument(s) but 3 were given' in str(
+            excinfo.value)
+        with pytest.raises(TypeError):
+            call([])
+        with pytest.raises(TypeError):
+            call(['1'])
+        with pytest.raises(TypeError) as excinfo:
+            call(1)
+        assert 'expected a dictionary or list' in str(excinfo.value)
+
+    def test_variable_args(self):
+        def func(a: int, *args: Volume, **kwargs: int) -> tuple:
+            return a, args, kwargs
+
+        call = i.compile_call(func)
+        a, args, kwargs = call([1, {'id': 'v', 'size': 2}])
+        assert a == 1
+        assert [(v.id, v.size) for v in args] == [('v', 2)]
+        assert kwargs == {}
+        assert call({'a': 1, 'b': 2}) == (1, (), {'b': 2})
+
+        with pytest.raises(TypeError) as excinfo:
+            call({'a': 1, 'b': '2'})
+        assert 'problem converting argument "b"' in str(excinfo.value)
+
+        def untyped(a, *args, **kwargs):
+            return a, args, kwargs
+
+        call = i.compile_call(untyped)
+        assert call([1, 2, 3]) == (1, (2, 3), {})
+        assert call({'a': 1, 'b': 2}) == (1, (), {'b': 2})
+
+    def test_barrier(self, monkeypatch):
+        @i.barrier
+        def create_volume(id: str, size: int) -> Volume:
+            """Creates a volume."""
+            return Volume(id, size)
+
+        assert create_volume.__name__ == 'create_volume'
+        assert create_volume.__doc__ == 'Creates a volume.'
+
+        # Calls after the barrier is compiled don't look at the signature.
+        def fail(*args, **kwargs):
+            raise AssertionError('signature should not be needed')
+
+        monkeypatch.setattr(inspect, 'signature', fail)
+        volume = create_volume({'id': 'a', 'size': 3})
+        assert (volume.id, volume.size) == ('a', 3)
+        volume = create_volume(['b', 4])
+        assert (volume.id, volume.size) == ('b', 4)
+
+
+def test_kwargs_code_builds_no_sets():
+    def func(a: int, b: str = 'b', **kwargs: int) -> None:
+        pass
+
+    code = cg.CodeGen()
+    cg.convert_dictionary_to_kwargs(code, func, ast.Name(id='value'))
+    assert 'set(' not in code.render()
+
+
+class TestSinglePassFields:
+    names = [f'f{n}' for n in range(cg.SINGLE_PASS_MIN_OPTIONAL_FIELDS)]
+
+    def make_func(self, var_keyword):
+        namespace = {'Volume': Volume}
+        params = ', '.join(['volume: Volume', 'size: int']
+                           + [f'{name}: int = 0' for name in self.names]
+                           + ([var_keyword] if var_keyword else []))
+        exec(f'def func({params}):\n    pass', namespace)
+        return namespace['func']
+
+    @pytest.mark.parametrize('var_keyword', [None, '**kwargs',
+                                             '**kwargs: int'])
+    def test_matches_default_strategy(self, var_keyword):
+        func = self.make_func(var_keyword)
+        default = i.convert_dictionary_to_kwargs(func)
+        single_pass = i.convert_dictionary_to_kwargs(func,
+                                                     single_pass_fields=True)
+        assert default is not single_pass
+
+        volume = {'id': 'a', 'size': 1}
+        values = [
+            {'volume': volume, 'size': 1},
+            {'volume': volume, 'size': 1, 'f0': 5, 'f7': 6},
+            {'volume': volume, 'size': 1, 'extra': 7},
+            {'volume': volume, 'size': 1, 'extra': 'seven'},
+            {'volume': volume, 'f0': 5},
+            {'volume': volume, 'size': 1, 'f0': 'five'},
+            {'volume': 'a', 'size': 1},
+        ]
+        for value in values:
+            try:
+                expected = default(value)
+            except TypeError as te:
+                with pytest.raises(TypeError) as excinfo:
+                    single_pass(value)
+                assert str(excinfo.value) == str(te)
+            else:
+                actual = single_pass(value)
+                assert actual.keys() == expected.keys()
+                assert actual['size'] == expected['size']
+
+    def test_named_tuples(self):
+        namespace = {'t': t}
+        fields = ''.join(f'    {name}: int = 0\n' for name in self.names)
+        exec(f'class Sparse(t.NamedTuple):\n    id: str\n{fields}', namespace)
+        sparse = namespace['Sparse']
+
+        converter = i.convert_value(sparse, single_pass_fields=True)
+        assert converter({'id': 'a', 'f2': 2}) == sparse('a', f2=2)
+        with pytest.raises(TypeError) as excinfo:
+            converter({'f2': 2})
+        assert 'missing a required argument: \'id\'' in str(excinfo.value)
+
+
+class QuotedMeta(type):
+    def __repr__(cls):
+        return '<{\'Quoted\'} "class">'
+
+
+class Quoted(metaclass=QuotedMeta):
+    def __init__(self, a: int, b: int) -> None:
+        pass
+
+
+def test_targets_are_only_referenced_by_closure_variables():
+    code = cg.CodeGen()
+    cg.convert_value(code, Quoted, ast.Name(id='value'))
+    assert 'Quoted' not in code.render()
+
+    with pytest.raises(TypeError) as excinfo:
+        i.convert_value(Quoted)(5)
+    assert str(excinfo.value) == ('<{\'Quoted\'} "class"> accepts 2 '
+                                  'parameters, cannot create from value "5".')
+
+
+class Shelf(t.NamedTuple):
+    volumes: t.List[Volume]
+    by_id: t.Dict[str, Volume]
+
+
+def test_nested_containers_link_to_shared_converters():
+    linked = []
+
+    def link(target):
+        linked.append(target)
+        return len
+
+    code = cg.CodeGen(link=link)
+    cg.convert_value(code, Shelf, ast.Name(id='value'))
+    assert set(linked) == {t.List[Volume], t.Dict[str, Volume]}
+    assert '.append(' not in code.render()
+
+
+def test_targets_share_compiled_converters():
+    i.clear_cache()
+    shelf = i.convert_value(Shelf)
+    volumes = i.convert_value(t.List[Volume])
+    assert volumes in [c.cell_contents for c in shelf.__closure__]
+    # Converters are only shared between the same options.
+    unoptimized = i.convert_value(Shelf, optimize=False)
+    assert volumes not in unoptimized.__globals__.values()
+    assert i.convert_value(t.List[Volume], optimize=False) in (
+        unoptimized.__globals__.values())
+
+
+class Artist:
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+
+class Track:
+    def __init__(self, title: str, artist: Artist) -> None:
+        self.title = title
+        self.artist = artist
+
+
+class Pair(t.NamedTuple):
+    first: Track
+    second: Track
+
+
+@pytest.mark.parametrize('optimize', [True, False])
+def test_dedup_shares_results_within_a_call(optimize):
+    artist = {'name': 'Nina'}
+    # Equal titles, built separately so they're different objects.
+    value = {'first': {'title': ''.join(['So', 'ng']), 'artist': artist},
+             'second': {'title': ''.join(['So', 'ng']), 'artist': artist}}
+
+    pair = i.convert_value(Pair, optimize=optimize)(value)
+    assert pair.first.artist is not pair.second.artist
+
+    converter = i.convert_value(Pair, dedup=True, optimize=optimize)
+    pair = converter(value)
+    assert pair.first.artist is pair.second.artist
+    assert pair.first.title is pair.second.title
+    assert pair.first is not pair.second
+    # Results aren't shared between calls.
+    assert converter(value).first.artist is not pair.first.artist
+
+    with pytest.raises(TypeError):
+        converter({'first': {'title': 'a', 'artist': artist},
+                   'second': {'title': 1, 'artist': artist}})
+
+
+@pytest.mark.parametrize('optimize', [True, False])
+def test_dedup_values_from_a_generator(optimize):
+    # Each dictionary is dropped once it's converted, so a later one can
+    # reuse its id.
+    artist = {'name': 'Nina'}
+
+    def tracks():
+        for number in range(6):
+            yield {'title': str(number), 'artist': artist}
+
+    converter = i.convert_value(t.List[Track], dedup=True, optimize=optimize)
+    assert [track.title for track in converter(tracks())] == [
+        '0', '1', '2', '3', '4', '5']
+
+
+class Node:
+    def __init__(self,
+                 name: str,
+                 children: 't.List[Node]',
+                 parent: 't.Optional[Node]' = None) -> None:
+        self.name = name
+        self.children = children
+        self.parent = parent
+
+
+def _names(node):
+    return (node.name, [_names(c) for c in node.children],
+            node.parent and _names(node.parent))
+
+
+@pytest.mark.parametrize('options', [
+    {}, {'optimize': False}, {'dedup': True}, {'lazy': True},
+])
+def test_recursive_targets(options):
+    i.clear_cache()
+    value = {'name': 'a', 'children': [
+        {'name': 'b', 'children': [{'name': 'c', 'children': []}]},
+        {'name': 'd', 'children': [],
+         'parent': {'name': 'e', 'children': []}}]}
+    node = i.convert_value(Node, **options)(value)
+    assert _names(node) == _names(dynamic.convert_value(Node, value))
+    assert isinstance(node.children[0].children[0], Node)
+
+    with pytest.raises(TypeError):
+        i.convert_value(Node, **options)(
+            {'name': 'a', 'children': [{'name': 'b', 'children': [1]}]})
+
+
+class Author:
+    def __init__(self, name: str, books: 't.List[Book]') -> None:
+        self.name = name
+        self.books = books
+
+
+class Book:
+    def __init__(self, title: str, authors: 't.List[Author]') -> None:
+        self.title = title
+        self.authors = authors
+
+
+def test_threads_compiling_targets_nested_in_each_other(monkeypatch):
+    i.clear_cache()
+    real_compile = i._compile
+
+    def slow_compile(*args):
+        # Gives the other thread time to start on its own target.
+        time.sleep(0.05)
+        return real_compile(*args)
+
+    monkeypatch.setattr(i, '_compile', slow_compile)
+    barrier = threading.Barrier(2)
+    converters = {}
+
+    def compile_for(target):
+        barrier.wait()
+        converters[target] = i.convert_value(target)
+
+    threads = [threading.Thread(target=compile_for, args=(target,),
+                                daemon=True)
+               for target in [t.List[Author], t.List[Book]]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    assert not any(thread.is_alive() for thread in threads)
+
+    [author] = converters[t.List[Author]]([{'name': 'a', 'books': [
+        {'title': 'b', 'authors': []}]}])
+    assert isinstance(author.books[0], Book)
+
+
+def _stubs(converter):
+    return [c.cell_contents for c in converter.__closure__
+            if isinstance(c.cell_contents, cg.Stub)]
+
+
+def test_lazy_branches_compile_when_first_taken():
+    i.clear_cache()
+    converter = i.convert_value(Pair, lazy=True)
+    stubs = _stubs(converter)
+    # The dictionary and sole argument branches of Track.
+    assert len(stubs) == 4
+    assert not any(stub.compiled for stub in stubs)
+
+    artist = {'name': 'Nina'}
+    pair = converter({'first': {'title': 'a', 'artist': artist},
+                      'second': {'title': 'b', 'artist': artist}})
+    assert (pair.first.title, pair.second.artist.name) == ('a', 'Nina')
+    assert [stub.compiled for stub in stubs] == [True, True, False, False]
+    # Both stubs for Track's dictionary branch share one compiled function.
+    assert stubs[0].convert is stubs[1].convert
+
+    with pytest.raises(TypeError) as excinfo:
+        converter({'first': {'title': 1, 'artist': artist},
+                   'second': {'title': 'b', 'artist': artist}})
+    assert str(excinfo.value) == ('can\'t convert "1" (type <class \'int\'>) '
+                                  'to <class \'str\'>.')
+
+
+def test_lazy_branches_are_not_used_with_a_budget():
+    converter = i.convert_value(Pair, lazy=True, budget=budget.Budget())
+    assert converter.__closure__ is None or not _stubs(converter)
+
+
+@pytest.mark.parametrize('lazy', [False, True])
+def test_benchmark_cold_compile(lazy, benchmark):
+    namespace = {'t': t}
+    # A wide schema of which each value only uses one field.
+    for index in range(30):
+        exec(f'class Leaf{index}:\n'
+             f'    def __init__(self, name: str, size: int = 0) -> None:\n'
+             f'        self.name = name\n', namespace)
+    params = ', '.join(f'leaf{index}: t.Optional[Leaf{index}] = None'
+                       for index in range(30))
+    exec(f'class Root:\n    def __init__(self, {params}) -> None:\n'
+         f'        pass\n', namespace)
+    root = namespace['Root']
+
+    def compile_and_convert():
+        i.clear_cache()
+        return i.convert_value(root, lazy=lazy)({'leaf3': {'name': 'x'}})
+
+    benchmark(compile_and_convert)
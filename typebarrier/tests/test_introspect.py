@@ -0,0 +1,80 @@
+import sys
+import typing as t
+
+import pytest
+
+from typebarrier import introspect
+
+
+UserId = t.NewType('UserId', int)
+
+
+class Names(list):
+    pass
+
+
+@pytest.mark.parametrize('target, expected', [
+    (t.Any, introspect.TypeInfo(introspect.ANY)),
+    (UserId, introspect.TypeInfo(introspect.NEW_TYPE, args=(int,))),
+    (t.Optional[int], introspect.TypeInfo(introspect.UNION,
+                                          args=(int, type(None)))),
+    (t.List[int], introspect.TypeInfo(introspect.LIST, list, (int,))),
+    (t.List, introspect.TypeInfo(introspect.LIST, list, (t.Any,))),
+    (Names, introspect.TypeInfo(introspect.LIST, Names, (t.Any,))),
+    (t.Dict[str, int], introspect.TypeInfo(introspect.DICT, dict,
+                                           (str, int))),
+    (t.Tuple[int, str], introspect.TypeInfo(introspect.CLASS, tuple)),
+    (str, introspect.TypeInfo(introspect.CLASS, str)),
+    (len, introspect.TypeInfo(introspect.CALLABLE)),
+])
+def test_describe(target, expected):
+    assert introspect.describe(target) == expected
+
+
+@pytest.mark.skipif(sys.version_info < (3, 10),
+                    reason='PEP 585 and 604 need Python 3.10')
+def test_describe_builtin_generics():
+    assert introspect.describe(eval('list[int]')) == introspect.describe(
+        t.List[int])
+    assert introspect.describe(eval('dict[str, int]')) == introspect.describe(
+        t.Dict[str, int])
+    assert introspect.describe(eval('int | None')).args == (int, type(None))
+
+
+class Later:
+    def __init__(self, size: 'int', child: 'Later') -> None:
+        pass
+
+
+def test_signature_resolves_strings():
+    params = introspect.signature(Later).parameters
+    assert params['size'].annotation is int
+    assert params['child'].annotation is Later
+
+
+class Tree:
+    def __init__(self,
+                 children: t.List['Tree'],
+                 lost: 'Missing',  # NOQA
+                 parent: t.Optional['Tree'] = None) -> None:
+        pass
+
+
+def test_signature_resolves_nested_forward_references():
+    params = introspect.signature(Tree).parameters
+    assert params['children'].annotation == t.List[Tree]
+    assert params['parent'].annotation == t.Optional[Tree]
+    # Annotations which can't be resolved are left as they are.
+    assert params['lost'].annotation == 'Missing'
+
+
+def test_signature_errors():
+    with pytest.raises(ValueError):
+        introspect.signature(42)
+
+
+def test_instance_member():
+    members = (float, int, type(None))
+    assert introspect.instance_member(members, int) is int
+    assert introspect.instance_member(members, bool) is int
+    assert introspect.instance_member(members, str) is None
@@ -0,0 +1,80 @@
+import sys
+
+import pytest
+
+from typebarrier import dynamic
+from typebarrier import iterative
+
+
+class Node:
+    def __init__(self, value: int, **children: 'Node') -> None:
+        self.value = value
+        self.children = children
+
+
+def chain(depth):
+    """Returns a node with a single child, nested `depth` times."""
+    value = {'value': 0}
+    for n in range(depth):
+        value = {'value': n + 1, 'next': value}
+    return value
+
+
+def depth_of(node):
+    depth = 0
+    while node.children:
+        node = node.children['next']
+        depth += 1
+    return depth
+
+
+def test_converts_inputs_deeper_than_the_recursion_limit():
+    depth = sys.getrecursionlimit() * 10
+    node = iterative.convert_value(Node, chain(depth))
+    assert depth_of(node) == depth
+    assert node.value == depth
+
+
+def test_errors_deep_inside_are_raised_like_dynamic():
+    value = chain(50)
+    leaf = value
+    for _ in range(40):
+        leaf = leaf['next']
+    leaf['value'] = 'forty'
+
+    with pytest.raises(TypeError) as expected:
+        dynamic.convert_value(Node, value)
+    with pytest.raises(TypeError) as excinfo:
+        iterative.convert_value(Node, value)
+    assert str(excinfo.value) == str(expected.value)
+
+    cause, expected_cause = excinfo.value, expected.value
+    while expected_cause is not None:
+        assert str(cause) == str(expected_cause)
+        cause = cause.__cause__ or cause.__context__
+        expected_cause = (expected_cause.__cause__
+                          or expected_cause.__context__)
+
+
+def test_errors_deeper_than_the_recursion_limit():
+    value = chain(sys.getrecursionlimit() * 2)
+    value['next']['value'] = 'one'
+    with pytest.raises(TypeError) as excinfo:
+        iterative.convert_value(Node, value)
+    assert 'problem converting argument "next"' in str(excinfo.value)
+
+
+@pytest.mark.parametrize('engine', ['dynamic', 'iterative'])
+def test_benchmark_depth_1000(engine, benchmark):
+    value = chain(1000)
+    if engine == 'dynamic':
+        # The recursive engine needs several frames for each level.
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(10000)
+        try:
+            node = benchmark(dynamic.convert_value, Node, value)
+        finally:
+            sys.setrecursionlimit(limit)
+    else:
+        node = benchmark(iterative.convert_value, Node, value)
+    assert depth_of(node) == 1000
@@ -0,0 +1,119 @@
+import typing as t
+
+import pytest
+
+from typebarrier import memo
+
+
+@memo.immutable
+class Flag(t.NamedTuple):
+    name: str
+    enabled: bool
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_returns_earlier_result_for_equal_input():
+    converter = memo.memoize(Flag)
+    flag = converter({'name': 'beta', 'enabled': True})
+    assert flag == Flag('beta', True)
+    assert converter({'enabled': True, 'name': 'beta'}) is flag
+    assert converter({'name': 'beta', 'enabled': False}) != flag
+    assert converter.stats() == memo.CacheStats(
+        hits=1, misses=2, uncached=0, evictions=0, size=2)
+    assert converter.stats().hit_rate == pytest.approx(1 / 3)
+
+
+@pytest.mark.parametrize('left, right', [
+    ({1: 'a'}, {'1': 'a'}),
+    ({True: 'a'}, {'true': 'a'}),
+    ([1, 2], (1, 2)),
+    (1, True),
+    (1, 1.0),
+    (0.0, -0.0),
+    ({'a': [1]}, {'a': [True]}),
+    ('null', None),
+])
+def test_fingerprints_keep_types(left, right):
+    assert memo.fingerprint(left) != memo.fingerprint(right)
+
+
+def test_equal_input_has_the_same_fingerprint():
+    assert memo.fingerprint({'a': [1, 2.5], 'b': None}) == memo.fingerprint(
+        {'b': None, 'a': [1, 2.5]})
+    assert memo.fingerprint(float('nan')) == memo.fingerprint(float('nan'))
+
+
+def test_different_types_are_converted_separately():
+    converter = memo.Memoized(lambda value: [value])
+    assert converter({1: 'a'}) == [{1: 'a'}]
+    assert converter({'1': 'a'}) == [{'1': 'a'}]
+    assert converter.stats().misses == 2
+
+
+def test_errors_are_not_cached():
+    converter = memo.memoize(Flag)
+    for _ in range(2):
+        with pytest.raises(TypeError):
+            converter({'name': 'beta', 'enabled': 'yes'})
+    assert converter.stats().size == 0
+
+
+def test_uncacheable_input_is_converted():
+    converter = memo.Memoized(lambda value: [value])
+    value = object()
+    assert converter(value) == [value]
+    assert converter(value) == [value]
+    assert converter.stats().uncached == 2
+
+
+def test_evicts_least_recently_used():
+    converter = memo.Memoized(str, maxsize=2)
+    converter(1)
+    converter(2)
+    converter(1)
+    converter(3)  # evicts 2
+    converter(1)
+    converter(2)
+    stats = converter.stats()
+    assert (stats.hits, stats.misses, stats.evictions) == (2, 4, 2)
+
+
+def test_results_expire():
+    clock = Clock()
+    converter = memo.Memoized(lambda value: [value], ttl=10, clock=clock)
+    first = converter(1)
+    clock.now = 9
+    assert converter(1) is first
+    clock.now = 10
+    assert converter(1) is not first
+    assert converter.stats().evictions == 1
+
+
+def test_targets_must_be_marked_immutable():
+    class Mutable(t.NamedTuple):
+        name: str
+
+    with pytest.raises(ValueError):
+        memo.memoize(Mutable)
+
+    @memo.immutable
+    class Base:
+        def __init__(self, name: str) -> None:
+            self.name = name
+
+    class Derived(Base):
+        pass
+
+    with pytest.raises(ValueError):
+        memo.memoize(Derived)
+
+    assert not memo.is_immutable(t.Dict[str, Flag])
+    memo.mark_immutable(t.Dict[str, Flag])
+    assert memo.is_immutable(t.Dict[str, Flag])
@@ -0,0 +1,140 @@
+import ast
+import textwrap
+
+from typebarrier import inline as i
+from typebarrier import optimize
+
+
+def optimized(source: str, **namespace) -> str:
+    module = ast.parse(textwrap.dedent(source))
+    return ast.unparse(optimize.optimize(module, namespace))
+
+
+def body(source: str) -> str:
+    """Returns the optimized function, without the globals binding."""
+    return optimized(source).split('\n    return ')[0]
+
+
+def test_drops_try_whose_error_is_replaced():
+    result = body('''
+        def f(value):
+            try:
+                try:
+                    x = int(value)
+                except TypeError as e:
+                    raise TypeError('inner') from e
+            except TypeError as e:
+                raise TypeError('outer') from e
+            return x
+    ''')
+    assert 'inner' not in result
+    assert 'outer' in result
+
+
+def test_keeps_try_when_outer_error_uses_it():
+    result = body('''
+        def f(value):
+            try:
+                try:
+                    x = int(value)
+                except TypeError as e:
+                    raise TypeError('inner') from e
+            except TypeError as e:
+                raise TypeError(f'outer: {e}') from e
+            return x
+    ''')
+    assert 'inner' in result
+
+
+def test_keeps_try_inside_other_handlers():
+    result = body('''
+        def f(value):
+            try:
+                try:
+                    x = value[0]
+                except TypeError:
+                    raise TypeError('inner')
+            except (KeyError, TypeError):
+                x = None
+            return x
+    ''')
+    assert 'inner' in result
+
+
+def test_flattens_if_else_raise_and_removes_temporaries():
+    result = body('''
+        def f(value):
+            if isinstance(value, str):
+                v1 = value
+            else:
+                raise TypeError('not a string')
+            return v1
+    ''')
+    assert 'else' not in result
+    assert 'v1' not in result
+    assert 'return value' in result
+
+
+def test_builds_comprehensions():
+    result = body('''
+        def f(value):
+            v1 = []
+            for v2 in value:
+                v3 = str(v2)
+                v1.append(v3)
+            v4 = {}
+            for v5, v6 in value:
+                v4[v5] = str(v6)
+            return (v1, v4)
+    ''')
+    assert 'v1 = [str(v2) for v2 in value]' in result
+    assert 'v4 = {v5: str(v6) for v5, v6 in value}' in result
+
+
+def test_keeps_loop_if_both_key_and_value_may_raise():
+    result = body('''
+        def f(value):
+            v1 = {}
+            for v2, v3 in value:
+                v1[int(v2)] = int(v3)
+            return v1
+    ''')
+    assert 'for v2, v3 in value:' in result
+
+
+def test_computes_type_once():
+    result = body('''
+        def f(value):
+            if type(value) is int:
+                return 1
+            if type(value) is str:
+                return 2
+            raise TypeError(f'bad {type(value)}')
+    ''')
+    assert result.count('type(value)') == 1
+    assert 'value_type = type(value)' in result
+
+
+def test_binds_globals():
+    result = optimized('''
+        def f(value):
+            return isinstance(value, cv1)
+    ''', cv1=int)
+    namespace = {'cv1': int}
+    exec(result, namespace)
+    assert set(namespace['f'].__code__.co_freevars) == {'isinstance', 'cv1'}
+    assert namespace['f'](1)
+
+
+def test_optimize_is_an_option():
+    class Point:
+        def __init__(self, x: int, y: int) -> None:
+            self.x = x
+            self.y = y
+
+    fast = i.convert_value(Point)
+    slow = i.convert_value(Point, optimize=False)
+    assert fast is not slow
+    assert fast.__code__.co_freevars
+    assert not slow.__code__.co_freevars
+    assert vars(fast({'x': 1, 'y': 2})) == vars(slow({'x': 1, 'y': 2}))
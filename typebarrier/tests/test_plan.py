@@ -0,0 +1,103 @@
+import dataclasses
+import datetime
+import enum
+import typing as t
+
+import pytest
+
+from typebarrier import plan
+from typebarrier import records
+
+
+UserId = t.NewType('UserId', int)
+
+
+class Color(enum.Enum):
+    RED = 'red'
+
+
+class Pair(t.NamedTuple):
+    left: int
+    right: int
+
+
+class Movie(t.TypedDict):
+    title: str
+
+
+class Tree:
+    def __init__(self, child: 'Tree') -> None:
+        pass
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    y: int = 0
+
+
+@pytest.mark.parametrize('target, kind', [
+    (t.Any, plan.ANY),
+    (datetime.date, plan.CONVERTER),
+    (Color, plan.ENUM),
+    (t.Literal['a', 'b'], plan.LITERAL),
+    (Movie, plan.TYPED_DICT),
+    (Pair, plan.NAMED_TUPLE),
+    (UserId, plan.NEW_TYPE),
+    (t.Optional[int], plan.UNION),
+    (t.List[int], plan.LIST),
+    (t.Dict[str, int], plan.DICT),
+    (Point, plan.INSTANCE),
+    (str, plan.INSTANCE),
+    (len, plan.CALL),
+])
+def test_kinds(target, kind):
+    assert plan.plan(target).kind == kind
+
+
+def test_plans_are_cached():
+    assert plan.plan(t.List[int]) is plan.plan(t.List[int])
+
+
+def test_dataclasses_keep_their_record():
+    p = plan.plan(Point)
+    assert p.cls is Point
+    assert p.record == records.record_info(Point)
+    assert [f.name for f in p.call.fields.fields] == ['x', 'y']
+
+
+def test_call():
+    def func(a: int, b, *rest: str, c: bool = False, **extra: float) -> None:
+        pass
+
+    call = plan.call(func)
+    assert [(f.name, f.annotation) for f in call.fields.fields] == [
+        ('a', int), ('b', t.Any), ('c', bool)]
+    assert call.positional == 2
+    assert call.var_positional == records.Field('rest', str)
+    assert call.extras is float
+
+
+@pytest.mark.parametrize('func, sole', [
+    (lambda value: value, t.Any),
+    (lambda *, value: value, t.Any),
+    (lambda a, b: a, t.Any),
+])
+def test_unannotated_sole_parameters_take_anything(func, sole):
+    assert plan.call(func).sole == sole
+
+
+def test_sole_parameter():
+    class Name:
+        def __init__(self, value: str) -> None:
+            pass
+
+    assert plan.call(Name).sole is str
+    # Converting to the target itself would never end.
+    assert plan.call(Tree).sole == t.Any
+
+
+def test_no_signature():
+    assert plan.plan(42).call is None
+    with pytest.raises(ValueError):
+        plan.call(42)
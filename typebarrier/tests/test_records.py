@@ -0,0 +1,188 @@
+import dataclasses
+import typing as t
+
+import pytest
+
+from typebarrier import dynamic
+from typebarrier import inline
+from typebarrier import records
+from typebarrier import trusted
+
+
+def inline_convert(target, value):
+    return inline.convert_value(target)(value)
+
+
+def trusted_convert(target, value):
+    return inline.convert_value(target, trusted_constructors=True)(value)
+
+
+engines = pytest.mark.parametrize(
+    'convert', [dynamic.convert_value, inline_convert, trusted_convert],
+    ids=['dynamic', 'inline', 'trusted'])
+
+
+class Track:
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __eq__(self, other):
+        return isinstance(other, Track) and self.name == other.name
+
+
+@dataclasses.dataclass
+class Volume:
+    id: str
+    size: int = 10
+
+
+@dataclasses.dataclass(slots=True)
+class SlottedVolume:
+    id: str
+    track: Track
+
+
+@dataclasses.dataclass
+class Guid:
+    value: str
+
+
+class Point(t.NamedTuple):
+    x: int
+    y: int
+    label: str = 'origin'
+
+
+class Movie(t.TypedDict):
+    title: str
+    track: Track
+
+
+class Partial(t.TypedDict, total=False):
+    title: str
+    year: int
+
+
+def test_record_info_is_read_once():
+    assert records.record_info(Point) is records.record_info(Point)
+    assert records.record_info(Track) is None
+    assert records.record_info(dict) is None
+
+    assert records.record_info(Volume).kind == records.DATACLASS
+    assert records.record_info(Point).kind == records.NAMED_TUPLE
+    assert records.record_info(Point).fast_new
+    assert records.record_info(Movie).kind == records.TYPED_DICT
+    assert [f.required for f in records.record_info(Point).fields] == [
+        True, True, False]
+    assert [f.required for f in records.record_info(Partial).fields] == [
+        False, False]
+
+
+@engines
+def test_dataclass(convert):
+    assert convert(Volume, {'id': 'a', 'size': 5}) == Volume('a', 5)
+    assert convert(Volume, {'id': 'a'}) == Volume('a')
+    slotted = convert(SlottedVolume, {'id': 'a', 'track': 'b'})
+    assert slotted == SlottedVolume('a', Track('b'))
+    assert convert(Guid, 'some-guid') == Guid('some-guid')
+
+    with pytest.raises(TypeError):
+        convert(Volume, {'id': 'a', 'size': 'big'})
+    with pytest.raises(TypeError) as excinfo:
+        convert(Volume, {'size': 5})
+    assert 'missing a required argument' in str(excinfo.value)
+    with pytest.raises(TypeError) as excinfo:
+        convert(Volume, {'id': 'a', 'colour': 'blue'})
+    assert 'the following parameters not accepted' in str(excinfo.value)
+
+
+def test_trusted_dataclasses():
+    assert trusted.trusted_init(Volume) is not None
+    assert trusted.trusted_init(SlottedVolume).slots.keys() == {'id', 'track'}
+
+    @dataclasses.dataclass
+    class PostInit:
+        id: str
+
+        def __post_init__(self):
+            self.id = self.id.upper()
+
+    @dataclasses.dataclass(frozen=True)
+    class Frozen:
+        id: str
+
+    @dataclasses.dataclass
+    class Factory:
+        ids: t.List[str] = dataclasses.field(default_factory=list)
+
+    for cls in [PostInit, Frozen, Factory]:
+        assert trusted.trusted_init(cls) is None
+
+    assert trusted_convert(PostInit, {'id': 'a'}).id == 'A'
+
+
+@engines
+def test_named_tuple(convert):
+    assert convert(Point, {'x': 1, 'y': 2}) == (1, 2, 'origin')
+    assert convert(Point, {'x': 1, 'y': 2, 'label': 'a'}) == (1, 2, 'a')
+    assert convert(Point, [1, 2]) == (1, 2, 'origin')
+    assert convert(Point, (1, 2, 'a')) == (1, 2, 'a')
+    assert type(convert(Point, [1, 2])) is Point
+
+    point = Point(3, 4)
+    assert convert(Point, point) is point
+
+    with pytest.raises(TypeError):
+        convert(Point, {'x': 1, 'y': 'two'})
+    with pytest.raises(TypeError):
+        convert(Point, ['1', 2])
+    with pytest.raises(TypeError) as excinfo:
+        convert(Point, [1])
+    assert 'takes 3 positional argument(s) but 1 were given' in str(
+        excinfo.value)
+    with pytest.raises(TypeError) as excinfo:
+        convert(Point, {'x': 1})
+    assert 'missing a required argument' in str(excinfo.value)
+    with pytest.raises(TypeError) as excinfo:
+        convert(Point, {'x': 1, 'y': 2, 'z': 3})
+    assert 'the following parameters not accepted' in str(excinfo.value)
+    with pytest.raises(TypeError) as excinfo:
+        convert(Point, 42)
+    assert 'can\'t convert "42"' in str(excinfo.value)
+
+
+@engines
+def test_named_tuple_with_custom_new(convert):
+    class Pair(t.NamedTuple):
+        a: int
+        b: int
+
+    class OrderedPair(Pair):
+        def __new__(cls, a, b):
+            return super().__new__(cls, min(a, b), max(a, b))
+
+    assert not records.record_info(OrderedPair).fast_new
+    assert convert(OrderedPair, [2, 1]) == (1, 2)
+
+
+@engines
+def test_typed_dict(convert):
+    movie = convert(Movie, {'title': 'Blade Runner', 'track': 'Main Titles'})
+    assert type(movie) is dict
+    assert movie == {'title': 'Blade Runner', 'track': Track('Main Titles')}
+
+    assert convert(Partial, {}) == {}
+    assert convert(Partial, {'year': 1982}) == {'year': 1982}
+
+    with pytest.raises(TypeError):
+        convert(Partial, {'year': '1982'})
+    with pytest.raises(TypeError) as excinfo:
+        convert(Movie, {'title': 'Blade Runner'})
+    assert 'missing a required argument' in str(excinfo.value)
+    with pytest.raises(TypeError) as excinfo:
+        convert(Partial, {'year': 1982, 'rating': 5})
+    assert 'the following parameters not accepted' in str(excinfo.value)
+    assert '[\'rating\']' in str(excinfo.value)
+    with pytest.raises(TypeError) as excinfo:
+        convert(Movie, ['Blade Runner'])
+    assert 'can\'t convert' in str(excinfo.value)
@@ -0,0 +1,181 @@
+import datetime
+import decimal
+import typing as t
+import uuid
+
+import pytest
+
+from typebarrier import dynamic
+from typebarrier import inline
+from typebarrier import iterative
+from typebarrier import registry
+
+
+def inline_convert(target, value):
+    return inline.convert_value(target)(value)
+
+
+engines = pytest.mark.parametrize(
+    'convert', [dynamic.convert_value, inline_convert],
+    ids=['dynamic', 'inline'])
+
+all_engines = pytest.mark.parametrize(
+    'convert', [dynamic.convert_value, iterative.convert_value,
+                inline_convert],
+    ids=['dynamic', 'iterative', 'inline'])
+
+
+class Money:
+    def __init__(self, cents: int) -> None:
+        self.cents = cents
+
+    def __eq__(self, other):
+        return isinstance(other, Money) and self.cents == other.cents
+
+
+@registry.register(Money)
+def parse_money(value):
+    if isinstance(value, Money):
+        return value
+    if not isinstance(value, str):
+        raise TypeError('expected a string')
+    dollars, cents = value.split('.')
+    return Money(int(dollars) * 100 + int(cents))
+
+
+class Celsius:
+    def __init__(self, degrees: float) -> None:
+        self.degrees = degrees
+
+    @classmethod
+    def __typebarrier_convert__(cls, value):
+        if not value.endswith('C'):
+            raise ValueError('not in celsius')
+        return cls(float(value[:-1]))
+
+
+class Tag(str):
+    pass
+
+
+class Colour(Tag):
+    pass
+
+
+registry.register_predicate(
+    lambda target: isinstance(target, type) and issubclass(target, Tag),
+    lambda target: lambda value: target(value.lower()))
+
+
+class Order:
+    def __init__(self, id: uuid.UUID, placed: datetime.datetime,
+                 total: Money, shipped: datetime.date) -> None:
+        self.id = id
+        self.placed = placed
+        self.total = total
+        self.shipped = shipped
+
+
+@engines
+def test_builtins(convert):
+    assert convert(datetime.datetime, '2018-03-04T05:06:07') == (
+        datetime.datetime(2018, 3, 4, 5, 6, 7))
+    assert convert(datetime.date, '2018-03-04') == datetime.date(2018, 3, 4)
+    guid = '12345678-1234-5678-1234-567812345678'
+    assert convert(uuid.UUID, guid) == uuid.UUID(guid)
+    assert convert(decimal.Decimal, '1.10') == decimal.Decimal('1.10')
+    assert convert(decimal.Decimal, 0.1) == decimal.Decimal('0.1')
+    assert convert(decimal.Decimal, 3) == decimal.Decimal(3)
+
+    now = datetime.datetime.now()
+    assert convert(datetime.datetime, now) is now
+
+    for target, value in [(datetime.datetime, 'yesterday'),
+                          (datetime.date, 20180304),
+                          (uuid.UUID, 'not-a-guid'),
+                          (decimal.Decimal, 'one'),
+                          (decimal.Decimal, True)]:
+        with pytest.raises(TypeError) as excinfo:
+            convert(target, value)
+        assert f'can\'t convert "{value}"' in str(excinfo.value)
+
+
+@engines
+def test_registered_type(convert):
+    assert convert(Money, '1.25') == Money(125)
+    with pytest.raises(TypeError):
+        convert(Money, 125)
+
+
+@engines
+def test_protocol(convert):
+    assert convert(Celsius, '21.5C').degrees == 21.5
+    with pytest.raises(TypeError):
+        convert(Celsius, '70F')
+
+
+@engines
+def test_predicate(convert):
+    colour = convert(Colour, 'RED')
+    assert type(colour) is Colour
+    assert colour == 'red'
+
+
+@engines
+def test_nested(convert):
+    order = convert(Order, {
+        'id': '12345678-1234-5678-1234-567812345678',
+        'placed': '2018-03-04T05:06:07+00:00',
+        'total': '10.50',
+        'shipped': '2018-03-05',
+    })
+    assert order.placed.tzinfo == datetime.timezone.utc
+    assert order.total == Money(1050)
+    assert order.shipped == datetime.date(2018, 3, 5)
+
+
+def test_lookups_are_resolved_once():
+    reg = registry.Registry()
+    calls = []
+
+    def predicate(target):
+        calls.append(target)
+        return True
+
+    reg.register_predicate(predicate, lambda target: target)
+    assert reg.lookup(int) is int
+    assert reg.lookup(int) is int
+    assert calls == [int]
+    assert reg.lookup(str) is str
+    assert reg.lookup(Celsius) == Celsius.__typebarrier_convert__
+    assert calls == [int, str]
+
+
+def test_generated_code_calls_converter_directly(monkeypatch):
+    converter = inline.convert_value(Money)
+
+    def fail(target):
+        raise AssertionError('should be resolved when compiling')
+
+    monkeypatch.setattr(registry, 'lookup', fail)
+    assert converter('2.00') == Money(200)
+
+
+@all_engines
+def test_registering_late(convert):
+    class Label:
+        def __init__(self, text: str) -> None:
+            self.text = text
+
+    class Box:
+        def __init__(self, labels: t.List[Label]) -> None:
+            self.labels = labels
+
+    value = {'labels': [{'text': 'a'}]}
+    assert convert(Box, value).labels[0].text == 'a'
+    with pytest.raises(TypeError):
+        convert(Box, {'labels': [7]})
+
+    registry.register(Label, lambda value: Label(str(value)))
+    # Plans and converters built before registering are forgotten.
+    assert convert(Box, {'labels': [7]}).labels[0].text == '7'
@@ -0,0 +1,130 @@
+import dataclasses
+import math
+import typing as t
+
+import pytest
+
+from typebarrier import dynamic
+from typebarrier import inline
+from typebarrier import shadow
+
+
+class Point:
+    def __init__(self, x: int, y: int) -> None:
+        self.x = x
+        self.y = y
+
+
+@dataclasses.dataclass
+class Size:
+    width: float
+    height: float
+
+
+class Slotted:
+    __slots__ = ('a',)
+
+    def __init__(self, a):
+        self.a = a
+
+
+@pytest.mark.parametrize('left, right, expected', [
+    (Point(1, 2), Point(1, 2), True),
+    (Point(1, 2), Point(1, 3), False),
+    ({'a': [Size(1.0, 2.0)]}, {'a': [Size(1.0, 2.0)]}, True),
+    ({'a': [Size(1.0, 2.0)]}, {'a': [Size(1, 2.0)]}, False),
+    ([1, 2], (1, 2), False),
+    (math.nan, math.nan, True),
+    (Slotted(1), Slotted(1), True),
+    (Slotted(1), Slotted(2), False),
+])
+def test_same(left, right, expected):
+    assert shadow.same(left, right) is expected
+
+
+def test_zero_rate_returns_the_compiled_converter():
+    assert shadow.shadow(Point, 0, print) is inline.convert_value(Point)
+
+
+def test_agreeing_engines_report_nothing():
+    mismatches = []
+    convert = shadow.shadow(Point, 1, mismatches.append)
+    assert convert({'x': 1, 'y': 2}).y == 2
+    with pytest.raises(TypeError):
+        convert({'x': 'one', 'y': 2})
+    assert mismatches == []
+    assert convert.stats() == shadow.ShadowStats(sampled=2, mismatches=0)
+
+
+def test_reports_mismatches():
+    def broken(value):
+        return Point(value['y'], value['x'])
+
+    mismatches = []
+    samples = iter([0.9, 0.1])
+    convert = shadow.Shadowed(
+        Point, broken, 0.5, mismatches.append,
+        lambda value: dynamic.convert_value(Point, value),
+        sample=lambda: next(samples))
+    # The first call isn't sampled, the second is.
+    for _ in range(2):
+        assert convert({'x': 1, 'y': 2}).x == 2
+
+    [mismatch] = mismatches
+    assert mismatch.target is Point
+    assert mismatch.compiled.result.x == 2
+    assert mismatch.reference.result.x == 1
+    assert convert.stats() == shadow.ShadowStats(sampled=1, mismatches=1)
+
+
+def test_reports_different_errors():
+    def broken(value):
+        raise ValueError('no')
+
+    mismatches = []
+    convert = shadow.Shadowed(
+        Point, broken, 1, mismatches.append,
+        lambda value: dynamic.convert_value(Point, value))
+    with pytest.raises(ValueError):
+        convert({'x': 1})
+    [mismatch] = mismatches
+    assert isinstance(mismatch.reference.error, TypeError)
+
+
+class Path:
+    def __init__(self, points: t.List[Point]) -> None:
+        self.points = points
+
+
+def test_iterators_are_read_once():
+    mismatches = []
+    convert = shadow.shadow(t.List[Point], 1, mismatches.append)
+    points = convert({'x': n, 'y': n} for n in range(3))
+    assert [p.x for p in points] == [0, 1, 2]
+    assert mismatches == []
+    assert convert.stats() == shadow.ShadowStats(sampled=1, mismatches=0)
+
+    # Iterators within the value aren't copied, so it isn't sampled.
+    convert = shadow.shadow(Path, 1, mismatches.append)
+    path = convert({'points': ({'x': n, 'y': n} for n in range(3))})
+    assert [p.x for p in path.points] == [0, 1, 2]
+    assert mismatches == []
+    assert convert.stats() == shadow.ShadowStats(sampled=0, mismatches=0)
+
+
+def test_functions_are_not_shadowed():
+    calls = []
+
+    def record(x: int) -> int:
+        calls.append(x)
+        return x
+
+    convert = shadow.shadow(record, 1, print)
+    assert convert is inline.convert_value(record)
+    convert({'x': 1})
+    assert calls == [1]
+
+
+@pytest.mark.parametrize('rate', [0, 0.01, 1])
+def test_benchmark_shadow(rate, benchmark):
+    benchmark(shadow.shadow(Point, rate, print), {'x': 1, 'y': 2})
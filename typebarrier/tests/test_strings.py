@@ -0,0 +1,196 @@
+import csv
+import dataclasses
+import datetime
+import enum
+import io
+import typing as t
+
+import pytest
+
+from typebarrier import inline
+from typebarrier import strings
+
+
+class Kind(enum.Enum):
+    SSD = 'ssd'
+    HDD = 'hdd'
+
+
+class Level(enum.IntEnum):
+    LOW = 1
+    HIGH = 2
+
+
+@dataclasses.dataclass
+class Volume:
+    id: str
+    size: int
+    ratio: float
+    kind: Kind = Kind.SSD
+    made: t.Optional[datetime.date] = None
+    ok: bool = True
+
+
+class Pair(t.NamedTuple):
+    left: int
+    right: int = 0
+
+
+class Movie(t.TypedDict):
+    title: str
+    year: int
+
+
+class Labelled:
+    def __init__(self, name: str, *, size: int = 0, **labels: int) -> None:
+        self.name = name
+        self.size = size
+        self.labels = labels
+
+
+def rows(text):
+    return csv.reader(io.StringIO(text))
+
+
+@pytest.mark.parametrize('target, cell, expected', [
+    (int, '42', 42),
+    (float, '2.5', 2.5),
+    (bool, 'yes', True),
+    (bool, ' False ', False),
+    (bool, '0', False),
+    (datetime.date, '2020-01-02', datetime.date(2020, 1, 2)),
+    (datetime.datetime, '2020-01-02T03:04:05',
+     datetime.datetime(2020, 1, 2, 3, 4, 5)),
+    (Kind, 'hdd', Kind.HDD),
+    (Kind, 'HDD', Kind.HDD),
+    (Level, '2', Level.HIGH),
+    (t.Literal['a', 1], '1', 1),
+    (t.Optional[int], '', None),
+    (t.Optional[int], '3', 3),
+    (t.Optional[str], '', None),
+    (t.NewType('Size', int), '7', 7),
+])
+def test_parsers(target, cell, expected):
+    parsed = strings.parser(target)(cell)
+    assert parsed == expected
+    assert type(parsed) is type(expected)
+
+
+@pytest.mark.parametrize('target', [str, t.Any])
+def test_cells_used_as_they_are(target):
+    assert strings.parser(target) is None
+
+
+@pytest.mark.parametrize('target, cell', [
+    (int, 'two'),
+    (bool, 'maybe'),
+    (Kind, 'tape'),
+    (t.Literal['a'], 'b'),
+])
+def test_parsers_reject(target, cell):
+    with pytest.raises(ValueError):
+        strings.parser(target)(cell)
+
+
+def test_convert_rows():
+    text = ('id,size,ratio,kind,made,ok\n'
+            'a,1,0.5,hdd,2020-01-02,no\n'
+            'b,2,1,SSD,,true\n')
+    assert list(strings.convert_rows(Volume, rows(text))) == [
+        Volume('a', 1, 0.5, Kind.HDD, datetime.date(2020, 1, 2), False),
+        Volume('b', 2, 1.0, Kind.SSD, None, True),
+    ]
+
+
+def test_columns_in_any_order_with_defaults():
+    text = 'ok,ratio,id,size\nf,1.5,a,3\n'
+    assert list(strings.convert_rows(Volume, rows(text))) == [
+        Volume('a', 3, 1.5, ok=False)]
+    assert list(strings.convert_rows(Pair, rows('right,left\n2,1\n'))) == [
+        Pair(1, 2)]
+
+
+def test_typed_dicts():
+    assert list(strings.convert_rows(Movie, rows('title,year\nHeat,1995\n'))
+                ) == [{'title': 'Heat', 'year': 1995}]
+
+
+def test_keywords_and_extras():
+    text = 'size,name,red\n3,a,5\n'
+    [labelled] = strings.convert_rows(Labelled, rows(text))
+    assert (labelled.name, labelled.size, labelled.labels) == (
+        'a', 3, {'red': 5})
+
+
+def test_header_argument():
+    result = strings.convert_rows(Pair, [['1', '2']], header=['left', 'right'])
+    assert list(result) == [Pair(1, 2)]
+
+
+def test_empty_input():
+    assert list(strings.convert_rows(Pair, [])) == []
+
+
+def test_row_converters_are_cached():
+    assert (strings.row_converter(Pair, ('left',))
+            is strings.row_converter(Pair, ('left',)))
+
+
+@pytest.mark.parametrize('text, message', [
+    ('id,size\na,1\n', 'missing a required argument: ratio'),
+    ('id,size,ratio,colour\na,1,1,red\n', 'not accepted'),
+    ('id,size,ratio\na,1,1\nb,two,1\n',
+     'row 3: column "size": can\'t convert "two"'),
+    ('id,size,ratio,made\na,1,1,yesterday\n',
+     'row 2: column "made": can\'t convert "yesterday"'),
+    ('id,size,ratio\na,1\n', 'row 2: expected 3 cells, got 2'),
+])
+def test_errors(text, message):
+    with pytest.raises(TypeError) as excinfo:
+        list(strings.convert_rows(Volume, rows(text)))
+    assert message in str(excinfo.value)
+
+
+def test_error_rows_count_from_the_first_row_without_a_header():
+    with pytest.raises(TypeError) as excinfo:
+        list(strings.convert_rows(Pair, [['1'], ['x']], header=['left']))
+    assert str(excinfo.value).startswith('row 2: column "left"')
+
+
+def test_errors_reading_rows_pass_through():
+    def rows():
+        raise ValueError('unreadable')
+        yield ['1']
+
+    with pytest.raises(ValueError, match='unreadable'):
+        list(strings.convert_rows(Pair, rows(), header=['left']))
+
+
+def test_row_converters_are_compiled_once_per_header():
+    converter = strings.row_converter(Pair, ('right', 'left'))
+    assert converter(['2', '1']) == Pair(1, 2)
+    inline.clear_cache()
+    assert strings.row_converter(Pair, ('right', 'left')) is not converter
+
+
+def test_read_csv(tmp_path):
+    path = tmp_path / 'pairs.csv'
+    path.write_text('left;right\n1;2\n3;4\n')
+    assert list(strings.read_csv(Pair, str(path), delimiter=';')) == [
+        Pair(1, 2), Pair(3, 4)]
+
+
+def test_benchmark_read_csv(tmp_path, benchmark):
+    path = tmp_path / 'volumes.csv'
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'size', 'ratio', 'kind', 'made', 'ok'])
+        for i in range(2_000_000):
+            writer.writerow([f'v{i}', i, i / 3, 'ssd' if i % 2 else 'hdd',
+                             '2020-01-02' if i % 3 else '', i % 2])
+
+    def read():
+        for _ in strings.read_csv(Volume, str(path)):
+            pass
+
+    benchmark.pedantic(read, rounds=1)
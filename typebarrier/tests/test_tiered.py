@@ -0,0 +1,86 @@
+
+import pytest
+
+from typebarrier import dynamic
+from typebarrier import inline
+from typebarrier import tiered
+
+
+class Point:
+    def __init__(self, x: int, y: int) -> None:
+        self.x = x
+        self.y = y
+
+
+class Shape:
+    def __init__(self, name: str, **points: Point) -> None:
+        self.name = name
+        self.points = points
+
+
+def square():
+    return {'name': 'square', 'a': {'x': 0, 'y': 0}, 'b': {'x': 1, 'y': 0},
+            'c': {'x': 1, 'y': 1}, 'd': {'x': 0, 'y': 1}}
+
+
+def test_promotes_after_threshold():
+    engine = tiered.Tiered(threshold=3, clock=lambda: 42.0)
+    for _ in range(2):
+        assert engine.convert(Shape, square()).points['c'].x == 1
+    assert engine.promotions() == []
+
+    assert engine.convert(Shape, square()).name == 'square'
+    [promotion] = engine.promotions()
+    assert promotion.target is Shape
+    assert promotion.calls == 3
+    assert promotion.at == 42.0
+    assert promotion.error is None
+
+    engine.convert(Shape, square())
+    assert engine.calls(Shape) == 3
+    assert len(engine.promotions()) == 1
+
+
+def test_thresholds_per_target():
+    engine = tiered.Tiered(threshold=1000, thresholds={Point: 1})
+    convert = engine.converter(Point)
+    assert convert({'x': 1, 'y': 2}).y == 2
+    engine.convert(Shape, square())
+    assert [p.target for p in engine.promotions()] == [Point]
+
+
+def test_compiles_in_the_background():
+    engine = tiered.Tiered(threshold=1, background=True)
+    try:
+        assert engine.convert(Shape, square()).points['b'].x == 1
+        engine.wait()
+        [promotion] = engine.promotions()
+        assert promotion.target is Shape
+        assert engine.convert(Shape, square()).points['b'].x == 1
+        assert engine.calls(Shape) == 1
+    finally:
+        engine.close()
+
+
+def test_stays_dynamic_if_compiling_fails(monkeypatch):
+    def fail(target, **options):
+        raise RuntimeError('cannot compile')
+    monkeypatch.setattr(inline, 'convert_value', fail)
+
+    engine = tiered.Tiered(threshold=1)
+    for _ in range(3):
+        assert engine.convert(Point, {'x': 3, 'y': 4}).x == 3
+    [promotion] = engine.promotions()
+    assert isinstance(promotion.error, RuntimeError)
+    assert engine.calls(Point) == 3
+
+
+@pytest.mark.parametrize('engine', ['dynamic', 'inline', 'tiered'])
+def test_benchmark_tiered(engine, benchmark):
+    value = square()
+    if engine == 'dynamic':
+        benchmark(dynamic.convert_value, Shape, value)
+    elif engine == 'inline':
+        benchmark(inline.convert_value(Shape), value)
+    else:
+        benchmark(tiered.Tiered(threshold=10).converter(Shape), value)
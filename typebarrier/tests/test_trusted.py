@@ -0,0 +1,157 @@
+import pytest
+
+from typebarrier import inline
+from typebarrier import trusted
+
+
+class Track:
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+
+class Volume:
+    """A volume."""
+
+    def __init__(self, id: str, size: int = 10) -> None:
+        """Docstrings are fine."""
+        self.id = id
+        self.size = size
+
+
+class Renamed:
+    def __init__(self, id: str, size: int = 10) -> None:
+        self._id = id
+        self.volume_size: int = size
+
+
+class Slotted:
+    __slots__ = ('id', 'size')
+
+    def __init__(self, id: str, size: int) -> None:
+        self.id = id
+        self.size = size
+
+
+class DoesWork:
+    def __init__(self, name: str) -> None:
+        self.name = name.upper()
+
+
+class SkipsArg:
+    def __init__(self, name: str, size: int) -> None:
+        self.name = name
+
+
+class HasProperty:
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @name.setter
+    def name(self, value: str) -> None:
+        self._name = value.upper()
+
+
+class HasNew:
+    def __new__(cls, name: str) -> 'HasNew':
+        return super().__new__(cls)
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+
+# Not verifiable, since the source does more than assign, but the decorator
+# promises it's fine.
+@trusted.trusted_constructor
+class Promised:
+    def __init__(self, name: str) -> None:
+        self.name = name  # type: str
+        if False:
+            pass
+
+
+@pytest.mark.parametrize('cls', [Track, Volume, Renamed, Slotted])
+def test_detects_simple_classes(cls):
+    assert trusted.trusted_init(cls) is not None
+
+
+@pytest.mark.parametrize('cls',
+                         [DoesWork, SkipsArg, HasProperty, HasNew, int])
+def test_rejects_other_classes(cls):
+    assert trusted.trusted_init(cls) is None
+
+
+def test_detection_is_opt_in():
+    assert trusted.trusted_init(Track, False) is None
+    assert trusted.trusted_init(Promised, False) is not None
+
+
+def test_describes_fields():
+    info = trusted.trusted_init(Renamed)
+    assert info.fields == {'id': '_id', 'size': 'volume_size'}
+    assert info.defaults == {'volume_size': 10}
+    assert info.slots == {}
+
+    assert set(trusted.trusted_init(Slotted).slots) == {'id', 'size'}
+
+
+def convert(target, value):
+    return inline.convert_value(target, trusted_constructors=True)(value)
+
+
+def test_builds_without_calling_init(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('__init__ should not be called')
+
+    # The converter is compiled before __init__ is replaced, as the source
+    # of the replacement obviously wouldn't be trusted.
+    converter = inline.convert_value(Volume, trusted_constructors=True)
+    monkeypatch.setattr(Volume, '__init__', fail)
+
+    volume = converter({'id': 'a', 'size': 5})
+    assert type(volume) is Volume
+    assert volume.__dict__ == {'id': 'a', 'size': 5}
+
+    volume = converter({'id': 'b'})
+    assert volume.__dict__ == {'id': 'b', 'size': 10}
+
+
+def test_builds_renamed_and_slotted_attributes():
+    renamed = convert(Renamed, {'id': 'a'})
+    assert renamed.__dict__ == {'_id': 'a', 'volume_size': 10}
+
+    slotted = convert(Slotted, {'id': 'a', 'size': 3})
+    assert (slotted.id, slotted.size) == ('a', 3)
+
+
+def test_builds_from_single_argument():
+    track = convert(Track, 'Legend of Gaseous Duck')
+    assert track.__dict__ == {'name': 'Legend of Gaseous Duck'}
+
+
+def test_falls_back_to_init():
+    assert convert(DoesWork, {'name': 'a'}).name == 'A'
+    assert convert(HasProperty, 'a').name == 'A'
+
+
+def test_still_checks_types():
+    with pytest.raises(TypeError):
+        convert(Volume, {'id': 'a', 'size': 'big'})
+    with pytest.raises(TypeError):
+        convert(Volume, {'size': 3})
+    with pytest.raises(TypeError):
+        convert(Volume, {'id': 'a', 'colour': 'blue'})
+
+
+def test_matches_normal_conversion():
+    for target, value in [(Volume, {'id': 'a'}),
+                          (Track, 'b'),
+                          (dict, {'a': 1})]:
+        normal = inline.convert_value(target)(value)
+        fast = convert(target, value)
+        assert type(normal) is type(fast)
+        assert getattr(normal, '__dict__', normal) == getattr(
+            fast, '__dict__', fast)
@@ -0,0 +1,141 @@
+import dataclasses
+import enum
+import typing as t
+
+import pytest
+
+from typebarrier import dynamic
+from typebarrier import inline
+from typebarrier import validation
+
+
+class Genre(enum.Enum):
+    JAZZ = 'jazz'
+    ROCK = 'rock'
+
+
+class Track:
+    def __init__(self, title: str, length: int,
+                 genre: Genre = Genre.JAZZ) -> None:
+        raise AssertionError('validating should never build a Track')
+
+
+class Album:
+    def __init__(self, name: str, **tracks: Track) -> None:
+        raise AssertionError('validating should never build an Album')
+
+
+@dataclasses.dataclass
+class Point:
+    x: int
+    y: int = 0
+
+
+class Line(t.NamedTuple):
+    start: Point
+    end: Point
+
+
+def test_valid_values_have_no_problems(engine):
+    validate = engine.validator(Album)
+    assert validate({'name': 'Kind of Blue',
+                     'so what': {'title': 'So What', 'length': 562},
+                     'blue': {'title': 'Blue', 'length': 337,
+                              'genre': 'jazz'}}) == []
+
+
+def test_reports_every_problem_with_its_path(engine):
+    problems = engine.validator(Album)({
+        'name': 1959,
+        'so what': {'title': 'So What', 'length': 'long', 'genre': 'funk'},
+        'blue': {'name': 'Blue'},
+        'green': 'Flamenco Sketches',
+    })
+    assert problems == [
+        validation.wrong_type(('name',), str, 1959),
+        validation.wrong_type(('so what', 'length'), int, 'long'),
+        validation.wrong_type(('so what', 'genre'), Genre, 'funk'),
+        validation.missing(('blue', 'title')),
+        validation.missing(('blue', 'length')),
+        validation.not_accepted(('blue', 'name'), Track),
+        validation.wrong_type(('green',), Track, 'Flamenco Sketches'),
+    ]
+
+
+@pytest.mark.parametrize('value, problems', [
+    ([{'x': 1}, {'x': 2, 'y': 3}], []),
+    (Line(Point(1), Point(2)), []),
+    ({'start': {'x': 1}, 'end': {'x': 2}}, []),
+    ([{'x': 1}], [validation.wrong_length((), Line, 2, [None])]),
+    ({'start': {'x': 'one', 'z': 0}}, [
+        validation.wrong_type(('start', 'x'), int, 'one'),
+        validation.not_accepted(('start', 'z'), Point),
+        validation.missing(('end',)),
+    ]),
+    ([{'x': 1}, 2], [validation.wrong_type((1,), Point, 2)]),
+    (7, [validation.wrong_type((), Line, 7)]),
+])
+def test_records(engine, value, problems):
+    assert engine.validator(Line)(value) == problems
+
+
+@pytest.mark.parametrize('value, problems', [
+    (None, []),
+    ({'x': 1}, []),
+    ('1', [validation.wrong_type((), t.Optional[Point], '1')]),
+])
+def test_unions(engine, value, problems):
+    assert engine.validator(t.Optional[Point])(value) == problems
+
+
+class Node:
+    def __init__(self, name: str, children: 't.List[Node]') -> None:
+        raise AssertionError('validating should never build a Node')
+
+
+@pytest.mark.parametrize('target', [Node, t.List[Node]])
+def test_recursive_targets(engine, target):
+    value = {'name': 'a', 'children': [
+        {'name': 'b', 'children': []},
+        {'name': 'c', 'children': [{'name': 1, 'children': [{}]}]}]}
+    path = ('children', 1, 'children', 0)
+    problems = [validation.wrong_type(path + ('name',), str, 1),
+                validation.missing(path + ('children', 0, 'name')),
+                validation.missing(path + ('children', 0, 'children'))]
+    if target is Node:
+        assert engine.validator(target)(value) == problems
+    else:
+        validate = engine.validator(target)
+        assert validate([{'name': 'z', 'children': []}, value]) == [
+            validation.Problem((1,) + p.path, p.message) for p in problems]
+
+
+def test_engines_agree():
+    value = {'name': 'Bad', 't': {'length': [], 'genre': None}, 'u': {}}
+    assert dynamic.validate(Album, value) == inline.validate(Album)(value)
+
+
+@pytest.mark.parametrize('engine', ['dynamic', 'inline'])
+@pytest.mark.parametrize('mode', ['convert', 'validate'])
+def test_benchmark_validate(engine, mode, benchmark):
+    class Song:
+        def __init__(self, title: str, length: int) -> None:
+            self.title = title
+            self.length = length
+
+    class Record:
+        def __init__(self, name: str, **songs: Song) -> None:
+            self.name = name
+            self.songs = songs
+
+    value = {'name': 'Album'}
+    for n in range(100):
+        value[f's{n}'] = {'title': f'Song {n}', 'length': n}
+    if engine == 'dynamic' and mode == 'convert':
+        benchmark(dynamic.convert_value, Record, value)
+    elif engine == 'dynamic':
+        assert benchmark(dynamic.validate, Record, value) == []
+    elif mode == 'convert':
+        benchmark(inline.convert_value(Record), value)
+    else:
+        assert benchmark(inline.validate(Record), value) == []
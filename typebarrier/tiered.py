@@ -0,0 +1,159 @@
+"""
+Converts with the dynamic engine until a target proves hot, then compiles it.
+
+Compiling a converter with `inline.convert_value` costs far more than one
+dynamic conversion, which is wasted on targets converted only a handful of
+times, while targets converted constantly are much faster compiled. A
+`Tiered` engine counts the calls for each target and promotes it to a
+compiled converter once it reaches a threshold, either compiling in the
+calling thread or in the background while the dynamic engine carries on.
+
+Every promotion is recorded, so `Tiered.promotions` shows which targets
+were compiled, when and after how many calls.
+"""
+import concurrent.futures
+import threading
+import time
+import typing as t
+
+from . import dynamic
+from . import inline
+
+
+class Promotion(t.NamedTuple):
+    target: t.Any
+    # Calls made on the dynamic engine before compiling started.
+    calls: int
+    # When the compiled converter took over, by the engine's clock.
+    at: float
+    # How long compiling took, in seconds.
+    seconds: float
+    # If compiling failed, what it raised. The target then stays on the
+    # dynamic engine.
+    error: t.Optional[Exception] = None
+
+
+class Tiered:
+    """Converts values, moving each target from the dynamic engine to a
+    compiled converter after `threshold` calls.
+
+    `thresholds` overrides `threshold` for particular targets. If
+    `background` is set, converters are compiled by a worker thread and
+    calls keep using the dynamic engine until it's done; otherwise the call
+    reaching the threshold compiles it. Options are passed to
+    `inline.convert_value`, and a `budget` is also kept to by the dynamic
+    engine.
+
+    Calls are counted without a lock, so under concurrent use promotion may
+    come a few calls late, but each target is only ever compiled once.
+    """
+
+    def __init__(self,
+                 threshold: int = 100,
+                 thresholds: t.Optional[t.Mapping[t.Any, int]] = None,
+                 background: bool = False,
+                 clock: t.Callable[[], float] = time.time,
+                 **options: t.Any) -> None:
+        self._threshold = threshold
+        self._thresholds = dict(thresholds or {})
+        self._background = background
+        self._clock = clock
+        self._options = options
+        self._budget = options.get('budget')
+        # Compiled converters by target. Like inline's cache this is read
+        # without locking, and each entry is written once.
+        self._compiled: t.Dict[t.Any, inline.Converter] = {}
+        self._calls: t.Dict[t.Any, int] = {}
+        # Targets being compiled, or which have been, guarded by `_lock`.
+        self._promoting: t.Set[t.Any] = set()
+        self._promotions: t.List[Promotion] = []
+        self._pending: t.List[concurrent.futures.Future] = []
+        self._executor: t.Optional[concurrent.futures.Executor] = None
+        self._lock = threading.Lock()
+
+    def convert(self, target: t.Any, value: t.Any) -> t.Any:
+        """Converts `value` to `target` with whichever engine it's on."""
+        compiled = self._compiled.get(target)
+        if compiled is not None:
+            return compiled(value)
+
+        calls = self._calls.get(target, 0) + 1
+        self._calls[target] = calls
+        # Once promotion has begun this is checked without the lock, so
+        # calls made while compiling in the background don't wait on it.
+        if (calls >= self._thresholds.get(target, self._threshold)
+                and target not in self._promoting):
+            compiled = self._promote(target, calls)
+            if compiled is not None:
+                return compiled(value)
+        if self._budget is not None:
+            return dynamic.convert_within(target, value, self._budget)
+        return dynamic.convert_value(target, value)
+
+    def converter(self, target: t.Any) -> inline.Converter:
+        """Returns a function converting values to `target` through this
+        engine."""
+        return lambda value: self.convert(target, value)
+
+    def _promote(self,
+                 target: t.Any,
+                 calls: int) -> t.Optional[inline.Converter]:
+        """Starts compiling `target` unless that's already begun.
+
+        Returns the compiled converter if it was compiled right away.
+        """
+        with self._lock:
+            if target in self._promoting:
+                return None
+            self._promoting.add(target)
+            if self._background:
+                if self._executor is None:
+                    self._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=1,
+                        thread_name_prefix='typebarrier-tiered')
+                self._pending.append(
+                    self._executor.submit(self._compile, target, calls))
+                return None
+        return self._compile(target, calls)
+
+    def _compile(self,
+                 target: t.Any,
+                 calls: int) -> t.Optional[inline.Converter]:
+        started = time.perf_counter()
+        compiled: t.Optional[inline.Converter] = None
+        error: t.Optional[Exception] = None
+        try:
+            compiled = self._compiled[target] = inline.convert_value(
+                target, **self._options)
+        except Exception as e:
+            error = e
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self._promotions.append(
+                Promotion(target, calls, self._clock(), seconds, error))
+        return compiled
+
+    def wait(self, timeout: t.Optional[float] = None) -> None:
+        """Waits for converters being compiled in the background."""
+        with self._lock:
+            pending = list(self._pending)
+        concurrent.futures.wait(pending, timeout)
+        with self._lock:
+            self._pending = [f for f in self._pending if not f.done()]
+
+    def promotions(self) -> t.List[Promotion]:
+        """Returns every promotion so far, oldest first."""
+        with self._lock:
+            return list(self._promotions)
+
+    def calls(self, target: t.Any) -> int:
+        """Returns how many calls for `target` were counted, which stops
+        once it's compiled."""
+        return self._calls.get(target, 0)
+
+    def close(self) -> None:
+        """Stops the background worker, once it's finished compiling."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -0,0 +1,189 @@
+"""
+Finds classes which can be built without calling their `__init__` method.
+
+Many classes have initializers that do nothing but copy each argument onto
+`self`. For these, generated code can create the instance with
+`object.__new__` and fill in its attributes directly, which is much faster
+than a Python level call to `__init__`. Anything which can't be verified to
+behave that way falls back to calling the class normally.
+"""
+import ast
+import dataclasses
+import functools
+import inspect
+import textwrap
+import typing as t
+
+
+TRUSTED_ATTR = '__typebarrier_trusted_init__'
+
+T = t.TypeVar('T')
+
+
+class TrustedInit(t.NamedTuple):
+    """Describes how to build a class without calling `__init__`."""
+
+    # Maps each parameter of `__init__` to the attribute it's stored in.
+    fields: t.Dict[str, str]
+    # Maps attribute names to the default of the matching parameter.
+    defaults: t.Dict[str, t.Any]
+    # Maps attribute names stored in `__slots__` to their member descriptor.
+    slots: t.Dict[str, t.Any]
+
+
+def trusted_constructor(cls: t.Type[T]) -> t.Type[T]:
+    """Class decorator promising `__init__` only does `self.x = x`.
+
+    Decorated classes are built without calling `__init__` whenever the
+    rest of the class allows it, even if the source of `__init__` can't be
+    inspected.
+    """
+    setattr(cls, TRUSTED_ATTR, True)
+    return cls
+
+
+def _init_assignments(init: t.Any) -> t.Optional[t.Dict[str, str]]:
+    """Reads the source of `init`, returns parameter to attribute names.
+
+    Returns None unless the body is only made of `self.<attr> = <param>`
+    statements (plus an optional docstring or `pass`) assigning every
+    parameter exactly once.
+    """
+    try:
+        source = inspect.getsource(init)
+    except (OSError, TypeError):
+        return None
+    try:
+        module = ast.parse(textwrap.dedent(source))
+    except SyntaxError:
+        return None
+    if len(module.body) != 1:
+        return None
+    func = module.body[0]
+    if not isinstance(func, ast.FunctionDef) or func.decorator_list:
+        return None
+    args = func.args
+    if args.vararg or args.kwarg or args.posonlyargs or not args.args:
+        return None
+    self_name = args.args[0].arg
+    params = [a.arg for a in args.args[1:] + args.kwonlyargs]
+
+    fields: t.Dict[str, str] = {}
+    for index, statement in enumerate(func.body):
+        if isinstance(statement, ast.Pass):
+            continue
+        if (index == 0 and isinstance(statement, ast.Expr)
+                and isinstance(statement.value, ast.Constant)
+                and isinstance(statement.value.value, str)):
+            continue  # docstring
+        if isinstance(statement, ast.Assign):
+            if len(statement.targets) != 1:
+                return None
+            target = statement.targets[0]
+        elif isinstance(statement, ast.AnnAssign):
+            target = statement.target
+        else:
+            return None
+        value = statement.value
+        if not (isinstance(target, ast.Attribute)
+                and isinstance(target.value, ast.Name)
+                and target.value.id == self_name
+                and isinstance(value, ast.Name)
+                and value.id in params
+                and value.id not in fields):
+            return None
+        fields[value.id] = target.attr
+
+    if sorted(fields) != sorted(params):
+        return None
+    if len(set(fields.values())) != len(fields):
+        return None
+    return fields
+
+
+def _dataclass_assignments(cls: t.Any) -> t.Optional[t.Dict[str, str]]:
+    """Returns parameter to attribute names for dataclass initializers.
+
+    The `__init__` generated by `dataclasses` only assigns its fields, unless
+    there is a `__post_init__`, a default factory, a field left out of
+    `__init__` or an `InitVar`.
+    """
+    owner = next(c for c in cls.__mro__ if '__init__' in c.__dict__)
+    params = owner.__dict__.get('__dataclass_params__')
+    if params is None or not params.init:
+        return None  # `__init__` was written by hand
+    if hasattr(cls, '__post_init__'):
+        return None
+    names = []
+    for f in dataclasses.fields(cls):
+        if not f.init or f.default_factory is not dataclasses.MISSING:
+            return None
+        names.append(f.name)
+    if names != list(inspect.signature(cls.__init__).parameters)[1:]:
+        return None
+    return {name: name for name in names}
+
+
+@functools.lru_cache(maxsize=None)
+def trusted_init(cls: t.Any, detect: bool = True) -> t.Optional[TrustedInit]:
+    """Returns how to build `cls` directly, or None if it isn't safe.
+
+    Classes marked with `trusted_constructor` are always considered. Others
+    are only considered if `detect` is set, in which case the source of
+    `__init__` must prove that it only assigns its arguments.
+    """
+    if not inspect.isclass(cls):
+        return None
+    # Anything customizing instance creation or attribute assignment can't
+    # be bypassed.
+    if type(cls).__call__ is not type.__call__:
+        return None
+    if cls.__new__ is not object.__new__:
+        return None
+    if cls.__setattr__ is not object.__setattr__:
+        return None
+    init = cls.__init__
+    if not inspect.isfunction(init) or hasattr(init, '__wrapped__'):
+        return None
+
+    if cls.__dict__.get(TRUSTED_ATTR, False):
+        sig = inspect.signature(init)
+        params = list(sig.parameters.values())[1:]
+        if any(p.kind in (inspect.Parameter.VAR_POSITIONAL,
+                          inspect.Parameter.VAR_KEYWORD,
+                          inspect.Parameter.POSITIONAL_ONLY)
+               for p in params):
+            return None
+        fields: t.Optional[t.Dict[str, str]] = {p.name: p.name
+                                                for p in params}
+    elif detect:
+        fields = None
+        if dataclasses.is_dataclass(cls):
+            fields = _dataclass_assignments(cls)
+        if fields is None:
+            fields = _init_assignments(init)
+    else:
+        return None
+    if fields is None:
+        return None
+
+    defaults: t.Dict[str, t.Any] = {}
+    for p in inspect.signature(init).parameters.values():
+        if p.name in fields and p.default is not p.empty:
+            defaults[fields[p.name]] = p.default
+
+    has_dict = False
+    slots: t.Dict[str, t.Any] = {}
+    for attr in fields.values():
+        descriptor = inspect.getattr_static(cls, attr, None)
+        if inspect.ismemberdescriptor(descriptor):
+            slots[attr] = descriptor
+        elif hasattr(type(descriptor), '__set__'):
+            # A property or other data descriptor would be skipped.
+            return None
+        else:
+            has_dict = True
+    if has_dict and not cls.__dictoffset__:
+        return None
+
+    return TrustedInit(fields=fields, defaults=defaults, slots=slots)
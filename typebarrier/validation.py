@@ -0,0 +1,50 @@
+"""
+Problems found by checking a value without converting it.
+
+`dynamic.validate` and the validators from `inline.validate` walk a value
+the same way the converters would, but only check types, that required
+fields are present and that no unexpected keys are given. Nothing is built
+and no `__init__` is called, so they suit a service which only needs to
+reject bad requests. Converters from the registry, enums and literals are
+still called, as their rules aren't known otherwise.
+
+Each problem is reported with the path to the value it's about, and every
+problem is reported rather than only the first. An empty list means the
+value is valid.
+"""
+import typing as t
+
+
+# A key or index, from the outermost value inwards.
+Path = t.Tuple[t.Any, ...]
+
+MISSING = 'required but missing'
+
+
+class Problem(t.NamedTuple):
+    path: Path
+    message: str
+
+
+def wrong_type(path: Path, target: t.Any, value: t.Any) -> Problem:
+    return Problem(path, f'expected {target}, got {type(value)}')
+
+
+def missing(path: Path) -> Problem:
+    return Problem(path, MISSING)
+
+
+def not_accepted(path: Path, target: t.Any) -> Problem:
+    return Problem(path, f'not accepted by {target}')
+
+
+def wrong_length(path: Path, target: t.Any, count: int,
+                 value: t.Sized) -> Problem:
+    return Problem(path, f'{target} takes {count} positional argument(s) '
+                         f'but {len(value)} were given')
+
+
+def within(path: Path, problems: t.List[Problem]) -> t.List[Problem]:
+    """Returns `problems` found in the value at `path`, with paths from the
+    outermost value."""
+    return [Problem(path + p.path, p.message) for p in problems]